@@ -0,0 +1,151 @@
+"""
+Codec micro-benchmarks over the payloads of bench.payloads.
+
+    python -m pyfox2x.bench.codec --json results.json
+    python -m pyfox2x.bench.codec --compare results.json --threshold 0.1
+
+Every operation reports its best per-op latency, throughput (MB/s of encoded payload and ops/s) and the peak
+number of bytes allocated by one call. With --compare the run fails when an operation got slower than the baseline
+by more than the threshold.
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+
+from ..sfs_client import SFSClient
+from ..sfs_types.SFSObject import SFSObject
+from .payloads import PAYLOADS
+
+
+def _packet(payload: SFSObject) -> SFSObject:
+    # Extension response envelope around payload, the way the server sends it
+    request = SFSObject()
+    request.putUtfString("c", "bench")
+    request.putSFSObject("p", payload)
+    packet = SFSObject()
+    packet.putByte("c", 1)
+    packet.putShort("a", 12)
+    packet.putSFSObject("p", request)
+    return packet
+
+
+def operations(payload: SFSObject) -> dict:
+    """
+    Returns operation name -> zero argument callable for payload
+    """
+    data = payload.compile()
+    packet = _packet(payload)
+
+    def init_from_python_object(python_object=json.loads(payload.getJsonDump())):
+        return SFSObject.initFromPythonObject(python_object)
+
+    return {
+        "compile": payload.compile,
+        "decompile": lambda: SFSObject.decompile(data),
+        "decompile_conn": lambda: SFSObject.decompile_conn(io.BytesIO(data)),
+        "getJsonDump": payload.getJsonDump,
+        "initFromPythonObject": init_from_python_object,
+        "compile_packet": lambda: SFSClient.compile_packet(packet),
+    }
+
+
+def measure(function, size: int, repeat: int = 5) -> dict:
+    """
+    Times function with timeit and records the peak allocation of a single call
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    timings = [seconds / number for seconds in timer.repeat(repeat, number)]
+    best = min(timings)
+
+    tracemalloc.start()
+    try:
+        function()
+        allocated = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": best,
+        "mean_seconds": sum(timings) / len(timings),
+        "ops_per_second": 1 / best,
+        "mb_per_second": size / best / 1e6,
+        "allocated_bytes": allocated,
+    }
+
+
+def run(payloads: list = None, repeat: int = 5, log=None) -> dict:
+    """
+    Benchmarks every operation on the named payloads (all of them by default).
+    Returns "payload.operation" -> measurement, failing operations get an "error" entry instead.
+    """
+    results = {}
+    for name in payloads or PAYLOADS:
+        payload = PAYLOADS[name]()
+        size = len(payload.compile())
+        for operation, function in operations(payload).items():
+            key = f"{name}.{operation}"
+            try:
+                results[key] = {"payload_bytes": size, **measure(function, size, repeat)}
+            except Exception as error:
+                results[key] = {"payload_bytes": size, "error": f"{type(error).__name__}: {error}"}
+            if log is not None:
+                log(key, results[key])
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.1) -> list:
+    """
+    Returns (key, baseline seconds, seconds) for every operation more than threshold slower than in baseline
+    """
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None or "seconds" not in before or "seconds" not in result:
+            continue
+        if result["seconds"] > before["seconds"] * (1 + threshold):
+            regressions.append((key, before["seconds"], result["seconds"]))
+    return regressions
+
+
+def _log(key: str, result: dict):
+    if "error" in result:
+        print(f"{key:40} {result['error']}")
+    else:
+        print(f"{key:40} {result['seconds'] * 1e3:10.3f} ms {result['mb_per_second']:9.2f} MB/s "
+              f"{result['ops_per_second']:10.1f} ops/s {result['allocated_bytes'] / 1024:10.1f} KiB")
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m pyfox2x.bench.codec", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--payload", action="append", choices=sorted(PAYLOADS), help="payloads to run, all by default")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="baseline results file of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args.payload, args.repeat, _log)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"python": platform.python_version(), "time": time.time(), "results": results}, file,
+                      indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for key, before, after in regressions:
+            print(f"REGRESSION {key}: {before * 1e3:.3f} ms -> {after * 1e3:.3f} ms ({after / before - 1:+.0%})")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+End-to-end load generator: N simulated clients log in and run a scripted scenario of extension requests.
+
+    python -m pyfox2x.bench --host 10.0.0.5 --port 9933 --clients 200 --scenario scenario.json
+    python -m pyfox2x.bench --mock --clients 50
+
+A scenario is a JSON object:
+
+    {"zone": "Game", "username": "bot{index}", "password": "", "auth_params": {}, "timeout": 10,
+     "requests": [{"command": "collect", "params": {"user_monster_id": ["long", 199]}, "repeat": 20}]}
+
+Params are given in the SFSObject.getValue() form, key -> [type name, value]. A response that does not arrive within
+timeout seconds counts as an error of its command. The report has the request rate, p50 / p95 / p99 latency per
+command, bytes sent and received and error counts.
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+import threading
+import time
+
+from ..sfs_client import SFSClient
+from ..sfs_types.SFSObject import SFSObject
+
+DEFAULT_SCENARIO = {
+    "zone": "Game",
+    "username": "bot{index}",
+    "password": "",
+    "auth_params": {},
+    "timeout": 10,
+    "requests": [{"command": "ping", "params": {"time": ["long", 0]}, "repeat": 100}],
+}
+
+
+class _CountingSocket:
+    # Counts the bytes going through the client socket, everything else is passed on to it
+    def __init__(self, connection):
+        self.connection = connection
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def recv(self, size: int, *args) -> bytes:
+        data = self.connection.recv(size, *args)
+        self.bytes_in += len(data)
+        return data
+
+    def recv_into(self, buffer, *args) -> int:
+        received = self.connection.recv_into(buffer, *args)
+        self.bytes_in += received
+        return received
+
+    def sendall(self, data, *args):
+        self.bytes_out += len(data)
+        return self.connection.sendall(data, *args)
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+
+def run_session(host: str, port: int, scenario: dict, index: int) -> dict:
+    """
+    Runs the scenario with one client, returns its latencies per command, error counts and traffic.
+    Any error that ends the session early is counted as a "session" error, so every session has a result.
+    """
+    result = {"latencies": {}, "errors": {}, "bytes_in": 0, "bytes_out": 0}
+    timeout = scenario.get("timeout")
+    client = SFSClient()
+    client.connection = connection = _CountingSocket(client.connection)
+    try:
+        client.connect(host, port)
+        client.send_login_request(scenario["zone"], scenario["username"].format(index=index), scenario["password"],
+                                  SFSObject("", scenario["auth_params"]))
+        # the login response, read_response itself can not give up on a server that never answers
+        client.dispatcher.expect().result(timeout)
+
+        for step in scenario["requests"]:
+            command = step["command"]
+            params = SFSObject("", step.get("params", {}))
+            latencies = result["latencies"].setdefault(command, [])
+            for _ in range(step.get("repeat", 1)):
+                start = time.perf_counter()
+                try:
+                    client.send_extension_request(command, params)
+                    response = client.wait_extension_response(command, timeout=timeout)
+                except Exception:
+                    response = None
+                if response is None:
+                    result["errors"][command] = result["errors"].get(command, 0) + 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+    except Exception:
+        result["errors"]["session"] = result["errors"].get("session", 0) + 1
+    finally:
+        client.close()
+        result["bytes_in"], result["bytes_out"] = connection.bytes_in, connection.bytes_out
+    return result
+
+
+def _run_threads(host: str, port: int, scenario: dict, indexes: list) -> list:
+    results = [None] * len(indexes)
+
+    def target(position: int):
+        results[position] = run_session(host, port, scenario, indexes[position])
+
+    threads = [threading.Thread(target=target, args=(position,), daemon=True) for position in range(len(indexes))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _run_process(args) -> list:
+    return _run_threads(*args)
+
+
+def percentile(values: list, fraction: float) -> float:
+    """
+    Nearest-rank percentile of sorted values
+    """
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+def summarize(results: list, elapsed: float) -> dict:
+    latencies, errors = {}, {}
+    for result in results:
+        for command, values in result["latencies"].items():
+            latencies.setdefault(command, []).extend(values)
+        for command, count in result["errors"].items():
+            errors[command] = errors.get(command, 0) + count
+
+    commands = {}
+    for command, values in latencies.items():
+        values.sort()
+        commands[command] = {
+            "requests": len(values),
+            "errors": errors.get(command, 0),
+            "rate": len(values) / elapsed,
+            "p50": percentile(values, 0.5) if values else None,
+            "p95": percentile(values, 0.95) if values else None,
+            "p99": percentile(values, 0.99) if values else None,
+        }
+    return {
+        "clients": len(results),
+        "seconds": elapsed,
+        "requests": sum(command["requests"] for command in commands.values()),
+        "rate": sum(command["requests"] for command in commands.values()) / elapsed,
+        "bytes_in": sum(result["bytes_in"] for result in results),
+        "bytes_out": sum(result["bytes_out"] for result in results),
+        "errors": errors,
+        "commands": commands,
+    }
+
+
+def run(host: str, port: int, scenario: dict, clients: int = 10, processes: int = 1) -> dict:
+    """
+    Runs clients sessions at once, as threads spread over processes worker processes, and summarizes them
+    """
+    start = time.perf_counter()
+    if processes <= 1:
+        results = _run_threads(host, port, scenario, list(range(clients)))
+    else:
+        batches = [(host, port, scenario, list(range(clients))[worker::processes]) for worker in range(processes)]
+        with multiprocessing.Pool(processes) as pool:
+            results = [result for batch in pool.map(_run_process, batches) for result in batch]
+    return summarize(results, time.perf_counter() - start)
+
+
+def _start_mock(scenario: dict):
+    from ..sfs_server import SFSMockServer
+
+    server = SFSMockServer()
+    for step in scenario["requests"]:
+        server.handlers[step["command"]] = lambda session, params: params
+    return server, server.start_in_thread()
+
+
+def _print(summary: dict):
+    print(f"{summary['clients']} clients, {summary['requests']} requests in {summary['seconds']:.2f} s "
+          f"({summary['rate']:.1f} req/s), {summary['bytes_out']} bytes out, {summary['bytes_in']} bytes in")
+    for command, stats in summary["commands"].items():
+        if stats["requests"] == 0:
+            print(f"{command:24} no responses, {stats['errors']} errors")
+            continue
+        print(f"{command:24} {stats['requests']:8} req {stats['rate']:10.1f} req/s "
+              f"p50 {stats['p50'] * 1e3:8.2f} ms p95 {stats['p95'] * 1e3:8.2f} ms p99 {stats['p99'] * 1e3:8.2f} ms "
+              f"{stats['errors']} errors")
+    if summary["errors"]:
+        print("errors:", summary["errors"])
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m pyfox2x.bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9933)
+    parser.add_argument("--mock", action="store_true", help="run against a local SFSMockServer echoing the params")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--processes", type=int, default=1, help="worker processes the client threads are spread over")
+    parser.add_argument("--scenario", help="scenario JSON file, a single ping command by default")
+    parser.add_argument("--timeout", type=float, help="seconds to wait for each response, overrides the scenario")
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args(argv)
+
+    scenario = dict(DEFAULT_SCENARIO)
+    if args.scenario:
+        with open(args.scenario) as file:
+            scenario.update(json.load(file))
+    if args.timeout is not None:
+        scenario["timeout"] = args.timeout
+
+    server = None
+    host, port = args.host, args.port
+    if args.mock:
+        server, port = _start_mock(scenario)
+        host = "127.0.0.1"
+    try:
+        summary = run(host, port, scenario, args.clients, args.processes)
+    finally:
+        if server is not None:
+            server.stop_thread()
+
+    _print(summary)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(summary, file, indent=2)
+    return 1 if summary["errors"] else 0
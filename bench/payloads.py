@@ -0,0 +1,86 @@
+import random
+
+from ..sfs_types.SFSArray import SFSArray
+from ..sfs_types.SFSObject import SFSObject
+
+_names = ["Fire Dragon", "Ice Golem", "Shadow Wolf", "Storm Eagle", "Stone Titan", "Sea Serpent", "Sun Phoenix"]
+
+
+def monster(rng: random.Random, user_monster_id: int) -> SFSObject:
+    sfsObject = SFSObject()
+    sfsObject.putLong("user_monster_id", user_monster_id)
+    sfsObject.putInt("monster_id", rng.randrange(1, 5000))
+    sfsObject.putShort("level", rng.randrange(1, 100))
+    sfsObject.putLong("xp", rng.randrange(0, 10 ** 9))
+    sfsObject.putUtfString("name", rng.choice(_names))
+    sfsObject.putBool("is_favorite", rng.random() < 0.1)
+    sfsObject.putDouble("last_collected", 1.7e9 + rng.random() * 1e6)
+    sfsObject.putIntArray("stats", [rng.randrange(0, 10000) for _ in range(6)])
+    return sfsObject
+
+
+def monster_array(count: int = 10000, seed: int = 0) -> SFSObject:
+    """
+    Player inventory: a count long sfs_array of monster objects
+    """
+    rng = random.Random(seed)
+    monsters = SFSArray()
+    for user_monster_id in range(count):
+        monsters.addSFSObject(monster(rng, 10 ** 9 + user_monster_id))
+    sfsObject = SFSObject()
+    sfsObject.putSFSArray("monsters", monsters)
+    sfsObject.putLong("server_time", 1700000000000)
+    return sfsObject
+
+
+def nested_object(depth: int = 6, width: int = 4, seed: int = 0) -> SFSObject:
+    """
+    Tree of objects width wide and depth deep with a few scalar fields on every level
+    """
+    rng = random.Random(seed)
+
+    def build(level: int) -> SFSObject:
+        sfsObject = SFSObject()
+        sfsObject.putInt("id", rng.randrange(0, 2 ** 31))
+        sfsObject.putUtfString("type", rng.choice(_names))
+        sfsObject.putBool("active", rng.random() < 0.5)
+        if level < depth:
+            for child in range(width):
+                sfsObject.putSFSObject(f"child_{child}", build(level + 1))
+        return sfsObject
+
+    return build(1)
+
+
+def numeric_arrays(length: int = 50000, seed: int = 0) -> SFSObject:
+    """
+    Large int, long and double arrays like map tiles, timestamps and coordinates
+    """
+    rng = random.Random(seed)
+    sfsObject = SFSObject()
+    sfsObject.putIntArray("tiles", [rng.randrange(-2 ** 31, 2 ** 31) for _ in range(length)])
+    sfsObject.putLongArray("timestamps", [1700000000000 + rng.randrange(0, 10 ** 9) for _ in range(length)])
+    sfsObject.putDoubleArray("coordinates", [rng.uniform(-180, 180) for _ in range(length)])
+    return sfsObject
+
+
+def short_strings(count: int = 5000, seed: int = 0) -> SFSObject:
+    """
+    Localization table: many short keys and UTF strings, a part of them non-ASCII
+    """
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyzабвгдежзийклмнопрстуфхцчшщэюя"
+    sfsObject = SFSObject()
+    for index in range(count):
+        sfsObject.putUtfString(f"s{index}", "".join(rng.choice(alphabet) for _ in range(rng.randrange(3, 16))))
+    sfsObject.putUtfStringArray("tags", [f"tag_{index}" for index in range(count)])
+    return sfsObject
+
+
+# name -> payload factory, every factory returns the same payload for the same arguments
+PAYLOADS = {
+    "monster_array": monster_array,
+    "nested_object": nested_object,
+    "numeric_arrays": numeric_arrays,
+    "short_strings": short_strings,
+}
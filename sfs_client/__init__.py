@@ -1,22 +1,58 @@
+import collections
 import io
-import json
-import os
 import socket
-import multiprocessing.connection, time
 import copy
-
+import itertools
+import threading
+from concurrent.futures import Future
+
+from .capture import INBOUND, OUTBOUND, SFSCaptureWriter
+from .dispatcher import SFSDispatcher
+from .framer import SFSFramer
+from .prepared import PreparedRequest
 from .task import SFSTask
-from ..sfs_types import SFSArray
 from ..sfs_types import SFSObject
 
-import time
-
 
 class SFSClient:
     connection = None
+    numpy_arrays = False
+    lazy = False
+    compression_threshold = None
+    capture = None
+    dispatcher = None
 
     def __init__(self, proxy_host: str = None, proxy_port: int = None, proxy_login: str = None,
-                 proxy_password: str = None):
+                 proxy_password: str = None, numpy_arrays: bool = False, lazy: bool = False,
+                 compression_threshold: int = None, capture_path: str = None, dispatch: bool = True,
+                 correlation_key: str = None, receive_buffer_size: int = 1 << 16, socket_receive_buffer: int = None):
+        # pip install numpy
+        # numeric arrays in responses are returned as read-only NumPy views over the received packet
+        self.numpy_arrays = numpy_arrays
+        # responses are LazySFSObject instances that decode fields on first access
+        self.lazy = lazy
+        # outgoing packets larger than this many bytes are sent zlib compressed, None disables compression
+        self.compression_threshold = compression_threshold
+        # extension command -> SFSSchema of its params, see register_schema
+        self.request_schemas = {}
+        self.response_schemas = {}
+        # bytes are received into the reusable buffer of the framer (receive_buffer_size bytes) and split into
+        # packets there, packets beyond the one being read wait in the queue
+        self.framer = SFSFramer(buffer_size=receive_buffer_size)
+        self.packets = collections.deque()
+        # after connect a dispatcher thread reads every packet and routes it to the waiting calls, see SFSDispatcher
+        self.dispatch = dispatch
+        # sends from several threads must not interleave their bytes, request holds it to register its waiter too
+        self.send_lock = threading.RLock()
+        # params key a server echoes back in its responses: request puts a sequence id under it and takes the response
+        # with the same id, otherwise responses are matched to requests first in, first out per command.
+        # "r" of the request is the room id in SFS2X, so ids can not go there.
+        self.correlation_key = correlation_key
+        self.request_ids = itertools.count(1)
+        # every packet sent and received is recorded to this file, see capture.SFSCaptureReader
+        if capture_path is not None:
+            self.capture = SFSCaptureWriter(capture_path)
+
         if proxy_host is None or proxy_port is None:
             self.connection = socket.socket()
         else:
@@ -36,33 +72,96 @@ class SFSClient:
             copy_socket.create_connection = create_connection
             self.connection = copy_socket.socket()
 
-        # self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024 * 1024 * 4)
+        # kernel receive buffer (SO_RCVBUF), set before connect so that it also sizes the TCP window
+        if socket_receive_buffer is not None:
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, socket_receive_buffer)
 
     def __del__(self):
+        # shutdown wakes the dispatcher thread blocked in recv, close alone does not
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
         self.connection.close()
+        if self.capture is not None:
+            self.capture.close()
 
     def connect(self, host: str, port: int = 9933):
         self.connection.connect((host, port))
         self.send_handshake_request()
+        if self.dispatch:
+            self.dispatcher = SFSDispatcher(self)
+            self.dispatcher.start()
+
+    def close(self):
+        """
+        Closes the connection and waits for the dispatcher thread, pending futures fail with ConnectionError
+        """
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        if self.dispatcher is not None:
+            self.dispatcher.join()
+        self.connection.close()
+        if self.capture is not None:
+            self.capture.close()
 
     @staticmethod
-    def compile_packet(packet) -> bytes:
-        compiled_packet = packet.compile()
-        if len(compiled_packet) < 65535:
-            return b'\x80' + (len(compiled_packet)).to_bytes(2, "big") + compiled_packet
-        else:
-            return b'\x88' + (len(compiled_packet)).to_bytes(4, "big") + compiled_packet
+    def compile_packet(packet, compression_threshold: int = None) -> bytes:
+        from ..sfs_types.encoder import compile_packet_into
+
+        return bytes(compile_packet_into(bytearray(), packet, compression_threshold))
 
     @staticmethod
-    def decompile_packet(packet: bytes) -> SFSObject:
-        return SFSObject.decompile(packet).get("p")
+    def decompile_packet(packet: bytes, numpy_arrays: bool = False, lazy: bool = False,
+                         only: list = None) -> SFSObject:
+        # only holds key paths relative to the returned object, e.g. ["c", "p.player_object.coins"]
+        if only is not None:
+            only = ["p." + path for path in only]
+        return SFSObject.decompile(packet, numpy_arrays=numpy_arrays, lazy=lazy, only=only).get("p")
 
     @staticmethod
     def decompile_packet_conn(conn: io.BytesIO) -> SFSObject:
         return SFSObject.decompile_conn(conn).get("p")
 
+    def decompile_schema_packet(self, packet: bytes) -> SFSObject:
+        return self._schema_response(SFSObject.decompile(packet, lazy=True).get("p"))
+
+    def _schema_response(self, response) -> SFSObject:
+        from ..sfs_types.lazy import LazySFSObject
+
+        if not isinstance(response, LazySFSObject) or "p" not in response:
+            return response
+        schema = self.response_schemas.get(response.get("c"))
+        if schema is None:
+            return response
+
+        result = SFSObject()
+        for key in response:
+            if key == "p" and response.getIndex()[key][0] == 18:
+                params, _ = schema.decompile_body(response.getBuffer(), response.getIndex()[key][2])
+                result.putSFSObject(key, params)
+            else:
+                result.getValue()[key] = response.getItem(key)
+        return result
+
+    def register_schema(self, command: str, request=None, response=None):
+        """
+        Registers SFSSchema instances for the params of an extension command,
+        its requests and responses are then compiled with the generated codecs
+        """
+        if request is not None:
+            self.request_schemas[command] = request
+        if response is not None:
+            self.response_schemas[command] = response
+
     def send_raw(self, packet: bytes):
-        self.connection.sendall(packet)
+        # recorded under the send lock, so the capture has the packets in the order they went out
+        with self.send_lock:
+            self.connection.sendall(packet)
+            if self.capture is not None:
+                self.capture.write_frame(OUTBOUND, packet)
 
 
     def send_packet(self, c: int, a: int, params: SFSObject):
@@ -71,15 +170,18 @@ class SFSClient:
         packet.putShort("a", a)
         packet.putSFSObject("p", params)
 
-        self.send_raw(SFSClient.compile_packet(packet))
+        self.send_raw(SFSClient.compile_packet(packet, self.compression_threshold))
 
-    def send_handshake_request(self):
+    @staticmethod
+    def handshake_params() -> SFSObject:
         session_info = SFSObject()
         session_info.putUtfString("api", "1.0.3")
         session_info.putUtfString("cl", "UnityPlayer::")
         session_info.putBool("bin", True)
+        return session_info
 
-        self.send_packet(0, 0, session_info)
+    def send_handshake_request(self):
+        self.send_packet(0, 0, SFSClient.handshake_params())
         self.read_response()
 
     def send_login_request(self, zone: str, username: str, password: str, auth_params: SFSObject):
@@ -91,44 +193,93 @@ class SFSClient:
 
         self.send_packet(0, 1, auth_info)
 
-    def send_extension_request(self, command: str, params: SFSObject):
+    def compile_extension_request(self, command: str, params: SFSObject, request_id: int = None) -> bytes:
+        """
+        Compiles the packet of an extension request, request_id is added to a copy of params under correlation_key
+        """
+        if request_id is not None:
+            values, codes = params._storage()
+            params = SFSObject._fromStorage(params.getName(), dict(values), bytearray(codes))
+            params.putLong(self.correlation_key, request_id)
+
         request = SFSObject()
         request.putUtfString("c", command)
         request.putInt("r", -1)
-        request.putSFSObject("p", params)
-
-        self.send_packet(1, 12, request)
+        if command in self.request_schemas:
+            request.putSFSObject("p", self.request_schemas[command].bind(params))
+        else:
+            request.putSFSObject("p", params)
 
-    def read_response(self):
-        response = b''
-        packet_size = b''
+        packet = SFSObject()
+        packet.putByte("c", 1)
+        packet.putShort("a", 12)
+        packet.putSFSObject("p", request)
+        return SFSClient.compile_packet(packet, self.compression_threshold)
 
-        packet_type = self.connection.recv(1)
-        if packet_type == b'\x88':
-            packet_size_len = 4
-        elif packet_type == b'\x80':
-            packet_size_len = 2
+    def send_extension_request(self, command: str, params: SFSObject):
+        self.send_raw(self.compile_extension_request(command, params))
+
+    def prepare_extension_request(self, command: str, params: SFSObject = None) -> PreparedRequest:
+        """
+        Returns a PreparedRequest for command, compiled with the request schema registered for it if any
+        """
+        return PreparedRequest(command, params, self.request_schemas.get(command))
+
+    def send_prepared_request(self, prepared: PreparedRequest, params: SFSObject = None):
+        self.send_raw(prepared.compile(params, self.compression_threshold))
+
+    def read_packet(self):
+        """
+        Reads the next packet body from the socket, None when the connection is closed or the stream is broken
+        """
+        while not self.packets:
+            try:
+                packets = self.framer.receive(self.connection)
+            except ValueError:
+                self.framer.reset()
+                return None
+            if packets is None:
+                return None
+            self.packets.extend(packets)
+        packet = self.packets.popleft()
+        if self.capture is not None:
+            self.capture.write(INBOUND, packet)
+        return packet
+
+    def decompile_response(self, packet: bytes, only: list = None) -> (int, int, SFSObject):
+        """
+        Decodes a received packet body with the options of this client, returns its c, a and params
+        """
+        if self.response_schemas and only is None:
+            outer = SFSObject.decompile(packet, numpy_arrays=self.numpy_arrays, lazy=True)
+            response = outer.get("p")
+            params = self._schema_response(response)
+            if params is not response or self.lazy:
+                return outer.get("c"), outer.get("a"), params
+            # responses of commands without a schema are decoded as usual
+        if self.numpy_arrays or self.lazy or only is not None:
+            if only is not None:
+                only = ["c", "a"] + ["p." + path for path in only]
+            outer = SFSObject.decompile(packet, numpy_arrays=self.numpy_arrays, lazy=self.lazy, only=only)
         else:
+            outer = SFSObject.decompile(packet)
+        return outer.get("c"), outer.get("a"), outer.get("p")
+
+    def read_response(self, only: list = None):
+        # With a running dispatcher this is the next packet nobody waits for, decoded again when only is given
+        if self.dispatcher is not None:
+            try:
+                item = self.dispatcher.expect().result()
+            except OSError:
+                return SFSObject(), b""
+            if only is not None:
+                return self.decompile_response(item.packet, only)[2], item.packet
+            return item.response, item.packet
+
+        packet = self.read_packet()
+        if packet is None:
             return SFSObject(), b""
-
-        while packet_size_len > 0:
-            new = self.connection.recv(packet_size_len)
-            packet_size += new
-            packet_size_len -= len(new)
-
-        packet_size = int.from_bytes(packet_size, 'big')
-
-        while len(response) < packet_size:
-            chunk_size = min(packet_size - len(response), 4096*4)
-            response += self.connection.recv(chunk_size)
-
-        packet_bytes = io.BytesIO(response)
-
-        response = self.decompile_packet_conn(packet_bytes)
-
-        return response, b"TODO: Fix bytes"
-
-        # return self.decompile_packet(response), response
+        return self.decompile_response(packet, only)[2], packet
 
     def wait_extension_response(self, command: str, binary=None, timeout=None):
         if binary is None:
@@ -141,6 +292,15 @@ class SFSClient:
         if binary is None:
             binary = False
 
+        if self.dispatcher is not None:
+            try:
+                item = self.dispatcher.expect(*commands).result()
+            except OSError:
+                return
+            if binary:
+                return item.key, item.packet
+            return item.key, item.response.get("p")
+
         cmd, params = '', SFSObject()
         bin_packet = bytes()
         fuck_counter = 0
@@ -156,34 +316,93 @@ class SFSClient:
                 self.connection.close()
                 return
 
-            if 'c' in response.getValue():
+            if 'c' in response:
                 cmd, params = response.get("c"), response.get("p")
-        print("OK")
         if binary:
             return cmd, bin_packet
-        print(json.dumps(params.getValue(), indent=2))
         return cmd, params
 
-    def request(self, command: str, params: SFSObject, binary=None, parse_chunks=None):
+    def request(self, command: str, params: SFSObject, binary=None, parse_chunks=None) -> Future:
+        """
+        Sends an extension request and returns a Future of its response params (the packet bytes with binary),
+        with parse_chunks of the list of all chunks of a chunked response (numChunks).
+        The future is registered before the request is sent, so the response can not be taken by another waiter.
+        """
         if binary is None:
             binary = False
         if parse_chunks is None:
             parse_chunks = False
 
-        self.send_extension_request(command, params)
-        response = self.wait_extension_response(command, binary)
-
-        print(response)
+        result = Future()
+        if self.dispatcher is None:
+            self.send_extension_request(command, params)
+            response = self.wait_extension_response(command, binary)
+            chunks = [response]
+            if parse_chunks and not binary and response is not None and response.get("numChunks") is not None:
+                for _ in range(response.get("numChunks") - 1):
+                    chunks.append(self.wait_extension_response(command))
+                result.set_result(chunks)
+            else:
+                result.set_result(response)
+            return result
+
+        with self.send_lock:
+            packet = self.__expect_response(result, command, params, binary, parse_chunks)
+            self.send_raw(packet)
+        return result
+
+    def request_many(self, requests: list, binary=None, parse_chunks=None) -> list:
+        """
+        Pipelines extension requests: all (command, params) pairs are written back to back in one send without
+        waiting for any response, and the list of their Futures (see request) is returned in the same order.
+        Without a dispatcher the requests are made one after another.
+        """
+        if binary is None:
+            binary = False
+        if parse_chunks is None:
+            parse_chunks = False
 
-        if response is None:
-            return self.request(command, params, binary, parse_chunks)
+        results = [Future() for _ in requests]
+        if self.dispatcher is None:
+            for result, (command, params) in zip(results, requests):
+                result.set_result(self.request(command, params, binary, parse_chunks).result())
+            return results
+
+        with self.send_lock:
+            packets = [self.__expect_response(result, command, params, binary, parse_chunks)
+                       for result, (command, params) in zip(results, requests)]
+            self.send_raw(b"".join(packets))
+        return results
+
+    def __expect_response(self, result: Future, command: str, params: SFSObject, binary: bool,
+                          parse_chunks: bool) -> bytes:
+        # Registers the waiter completing result and returns the request packet, which the caller sends while still
+        # holding send_lock: waiters are registered in the order their requests go out. A chunked response is taken
+        # by one waiter, which keeps its place until the last chunk, so chunks of concurrent requests are not mixed.
+        key, request_id = command, None
+        if self.correlation_key is not None:
+            request_id = next(self.request_ids)
+            key = command, request_id
+
+        def complete(future: Future):
+            try:
+                result.set_result(SFSClient._response_result(future.result(), binary, parse_chunks))
+            except BaseException as error:
+                result.set_exception(error)
+
+        packet = self.compile_extension_request(command, params, request_id)
+        self.dispatcher.expect(key, chunks=parse_chunks).add_done_callback(complete)
+        return packet
 
-        if response.get("numChunks") is None or not parse_chunks:
-            return response
-        packets = [response]
-        for _ in range(response.get("numChunks") - 1):
-            packets.append(self.wait_extension_response(command))
-        return packets
+    @staticmethod
+    def _response_result(received, binary: bool, parse_chunks: bool):
+        # The DispatchedPacket (the list of them with parse_chunks) of a response as request returns it: its params or
+        # packet bytes, a list of them for the chunks of a chunked response
+        items = received if parse_chunks else [received]
+        results = [item.packet if binary else item.response.get("p") for item in items]
+        if parse_chunks and items[0].response.get("p").get("numChunks") is not None:
+            return results
+        return results[0]
 
     def get_connection(self):
         return self.connection
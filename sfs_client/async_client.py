@@ -0,0 +1,210 @@
+import asyncio
+import itertools
+
+from . import SFSClient
+from .capture import INBOUND, OUTBOUND, SFSCaptureWriter
+from .dispatcher import PacketRouter
+from .framer import SFSFramer
+from .prepared import PreparedRequest
+from ..sfs_types.SFSObject import SFSObject
+
+
+class AsyncSFSClient:
+    """
+    asyncio counterpart of SFSClient: same requests, schemas and codec, but every session is a pair of streams and
+    a reader task on the running event loop instead of a socket and threads, so thousands of sessions fit in one
+    process. The reader task routes packets with a PacketRouter like SFSDispatcher: to the oldest expect future of
+    their key (the command of an extension response or (c, a)), to subscribed callbacks, or to a backlog for later
+    waits.
+    Awaiting calls can be cancelled and wrapped in asyncio.wait_for, a cancelled wait leaves its packet to the next.
+    """
+
+    # Schemas and response decoding work exactly like in SFSClient
+    register_schema = SFSClient.register_schema
+    prepare_extension_request = SFSClient.prepare_extension_request
+    compile_extension_request = SFSClient.compile_extension_request
+    decompile_schema_packet = SFSClient.decompile_schema_packet
+    decompile_response = SFSClient.decompile_response
+    _schema_response = SFSClient._schema_response
+
+    def __init__(self, numpy_arrays: bool = False, lazy: bool = False, compression_threshold: int = None,
+                 capture_path: str = None, backlog: int = 1024, correlation_key: str = None):
+        self.numpy_arrays = numpy_arrays
+        self.lazy = lazy
+        self.compression_threshold = compression_threshold
+        self.request_schemas = {}
+        self.response_schemas = {}
+        # see SFSClient
+        self.correlation_key = correlation_key
+        self.request_ids = itertools.count(1)
+        self.capture = SFSCaptureWriter(capture_path) if capture_path is not None else None
+        self.reader = None
+        self.writer = None
+        self.__reader_task = None
+        self.__router = PacketRouter(backlog, correlation_key)
+
+    async def connect(self, host: str, port: int = 9933):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.__reader_task = asyncio.ensure_future(self.__read_loop())
+        await self.send_handshake_request()
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        if self.__reader_task is not None:
+            await self.__reader_task
+        if self.capture is not None:
+            self.capture.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def expect(self, *keys, chunks: bool = False) -> asyncio.Future:
+        """
+        Returns a future of the next DispatchedPacket routed to one of keys (to any key without them), with chunks of
+        the list of all chunks of a chunked response, see SFSDispatcher.expect
+        """
+        return self.__router.add_waiter(asyncio.get_running_loop().create_future(), keys, chunks)
+
+    def subscribe(self, key, callback):
+        """
+        Calls callback(DispatchedPacket) for every packet routed to key (every packet with key None),
+        e.g. asyncio.Queue.put_nowait
+        """
+        self.__router.subscribe(key, callback)
+
+    def unsubscribe(self, key, callback):
+        self.__router.unsubscribe(key, callback)
+
+    async def __read_loop(self):
+        framer = SFSFramer()
+        error = ConnectionError("SFS connection closed")
+        try:
+            while True:
+                data = await self.reader.read(65536)
+                if data == b"":
+                    break
+                try:
+                    packets = framer.feed(data)
+                except ValueError as exception:
+                    error = ConnectionError(f"SFS stream broken: {exception}")
+                    break
+                for packet in packets:
+                    self.__dispatch(packet)
+        except OSError as exception:
+            error = exception
+        self.__router.close(error)
+
+    def __dispatch(self, packet: bytes):
+        if self.capture is not None:
+            self.capture.write(INBOUND, packet)
+        item = self.__router.decode(packet, self.decompile_response)
+        if item is not None:
+            self.__router.route(item)
+
+    async def send_raw(self, packet: bytes):
+        self.writer.write(packet)
+        if self.capture is not None:
+            self.capture.write_frame(OUTBOUND, packet)
+        await self.writer.drain()
+
+    async def send_packet(self, c: int, a: int, params: SFSObject):
+        packet = SFSObject()
+        packet.putByte("c", c)
+        packet.putShort("a", a)
+        packet.putSFSObject("p", params)
+
+        await self.send_raw(SFSClient.compile_packet(packet, self.compression_threshold))
+
+    async def send_handshake_request(self):
+        response = self.expect((0, 0))
+        await self.send_packet(0, 0, SFSClient.handshake_params())
+        return (await response).response
+
+    async def send_login_request(self, zone: str, username: str, password: str, auth_params: SFSObject):
+        auth_info = SFSObject()
+        auth_info.putUtfString("zn", zone)
+        auth_info.putUtfString("un", username)
+        auth_info.putUtfString("pw", password)
+        auth_info.putSFSObject("p", auth_params)
+
+        await self.send_packet(0, 1, auth_info)
+
+    async def send_extension_request(self, command: str, params: SFSObject):
+        await self.send_raw(self.compile_extension_request(command, params))
+
+    async def send_prepared_request(self, prepared: PreparedRequest, params: SFSObject = None):
+        await self.send_raw(prepared.compile(params, self.compression_threshold))
+
+    async def read_response(self, only: list = None):
+        """
+        Next packet nobody waits for as (params, packet bytes), (SFSObject(), b"") once the connection is closed,
+        decoded again with only (see SFSClient.decompile_packet) when it is given
+        """
+        try:
+            item = await self.expect()
+        except OSError:
+            return SFSObject(), b""
+        if only is not None:
+            return self.decompile_response(item.packet, only)[2], item.packet
+        return item.response, item.packet
+
+    async def wait_extension_response(self, command: str, binary: bool = False, timeout: float = None):
+        """
+        Response params of command (the packet bytes with binary), None on timeout or a closed connection
+        """
+        try:
+            item = await asyncio.wait_for(self.expect(command), timeout)
+        except (asyncio.TimeoutError, OSError):
+            return None
+        return item.packet if binary else item.response.get("p")
+
+    async def wait_requests(self, commands: list, binary: bool = False):
+        try:
+            item = await self.expect(*commands)
+        except OSError:
+            return None
+        return item.key, item.packet if binary else item.response.get("p")
+
+    async def request(self, command: str, params: SFSObject, binary: bool = False, parse_chunks: bool = False):
+        """
+        Sends an extension request and returns its response params (the packet bytes with binary), with
+        parse_chunks the list of all chunks of a chunked response (numChunks).
+        Raises ConnectionError when the connection is closed first, time it out with asyncio.wait_for.
+        """
+        key, packet = self.__prepare_request(command, params)
+        response = self.expect(key, chunks=parse_chunks)
+        try:
+            await self.send_raw(packet)
+            return SFSClient._response_result(await response, binary, parse_chunks)
+        finally:
+            # a no-op once the response arrived, otherwise it must not take the packet of a later wait
+            response.cancel()
+
+    async def request_many(self, requests: list, binary: bool = False, parse_chunks: bool = False) -> list:
+        """
+        Pipelines extension requests: all (command, params) pairs are written back to back before any response is
+        awaited, returns their responses (see request) in the same order
+        """
+        prepared = [self.__prepare_request(command, params) for command, params in requests]
+        responses = [self.expect(key, chunks=parse_chunks) for key, _ in prepared]
+        try:
+            await self.send_raw(b"".join(packet for _, packet in prepared))
+            return [SFSClient._response_result(await response, binary, parse_chunks) for response in responses]
+        finally:
+            for response in responses:
+                response.cancel()
+
+    def __prepare_request(self, command: str, params: SFSObject) -> (object, bytes):
+        # Routing key of the response and the request packet, with a request id when responses are correlated
+        if self.correlation_key is None:
+            return command, self.compile_extension_request(command, params)
+        request_id = next(self.request_ids)
+        return (command, request_id), self.compile_extension_request(command, params, request_id)
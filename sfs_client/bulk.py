@@ -0,0 +1,138 @@
+import collections
+import itertools
+import multiprocessing
+import os
+import queue
+
+from .capture import SFSCaptureReader
+from .framer import split_frames
+from ..sfs_types.SFSObject import SFSObject
+
+# Capture files opened by a pool worker, kept open for the chunks that follow
+_captures = {}
+
+
+def _decode_body(body, options: tuple):
+    python, only, numpy_arrays, transform = options
+    packet = SFSObject.decompile(body, numpy_arrays=numpy_arrays, only=only)
+    if python:
+        packet = packet.toPython()
+    return packet if transform is None else transform(packet)
+
+
+def _decode_buffers(task: tuple, captures: dict = None) -> list:
+    start, buffers, framed, options = task
+    results = []
+    for index, buffer in enumerate(buffers, start):
+        if framed:
+            for body in split_frames(buffer):
+                results.append((index, _decode_body(body, options)))
+        else:
+            results.append((index, _decode_body(buffer, options)))
+    return results
+
+
+def _decode_capture(task: tuple, captures: dict = _captures) -> list:
+    path, start, stop, direction, options = task
+    reader = captures.get(path)
+    if reader is None:
+        reader = captures[path] = SFSCaptureReader(path)
+    results = []
+    for index in range(start, stop):
+        packet = reader[index]
+        if direction is None or packet.direction == direction:
+            results.append((index, _decode_body(packet.data, options)))
+    return results
+
+
+def _capture_tasks(path: str, chunk_size: int, direction: int, options: tuple):
+    with SFSCaptureReader(path) as reader:
+        count = len(reader)
+    for start in range(0, count, chunk_size):
+        yield path, start, min(start + chunk_size, count), direction, options
+
+
+def _buffer_tasks(buffers, chunk_size: int, framed: bool, options: tuple, copy: bool):
+    buffers = iter(buffers)
+    start = 0
+    while True:
+        chunk = list(itertools.islice(buffers, chunk_size))
+        if not chunk:
+            return
+        if copy:
+            # memoryviews and mmap slices can not be pickled
+            chunk = [buffer if type(buffer) is bytes else bytes(buffer) for buffer in chunk]
+        yield start, chunk, framed, options
+        start += len(chunk)
+
+
+def _checked(result) -> list:
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+
+def _run_pool(function, tasks, processes: int, ordered: bool):
+    # At most two chunks per worker are queued, so neither the input nor the results pile up in memory
+    window = processes * 2
+    with multiprocessing.Pool(processes) as pool:
+        if ordered:
+            pending = collections.deque()
+            for task in tasks:
+                pending.append(pool.apply_async(function, (task,)))
+                if len(pending) >= window:
+                    yield from pending.popleft().get()
+            while pending:
+                yield from pending.popleft().get()
+        else:
+            done = queue.SimpleQueue()
+            running = 0
+            for task in tasks:
+                pool.apply_async(function, (task,), callback=done.put, error_callback=done.put)
+                running += 1
+                if running >= window:
+                    yield from _checked(done.get())
+                    running -= 1
+            for _ in range(running):
+                yield from _checked(done.get())
+
+
+def _run_here(function, tasks):
+    captures = {}
+    try:
+        for task in tasks:
+            yield from function(task, captures)
+    finally:
+        for reader in captures.values():
+            reader.close()
+
+
+def decode_bulk(source, processes: int = None, chunk_size: int = 1024, ordered: bool = True, framed: bool = False,
+                python: bool = True, only: list = None, numpy_arrays: bool = False, transform=None,
+                direction: int = None, indexed: bool = False):
+    """
+    Decodes a large number of packets over a pool of processes and yields the results as they are ready.
+    source is the path of a capture file (see SFSCaptureWriter) or an iterable of packet bodies, with framed
+    of raw frames as sent on the wire (each buffer may hold several whole frames, their results follow each other).
+    Work is sent to the workers in chunks of chunk_size packets; for a capture file only the record range is sent
+    and every worker maps the file itself. With ordered False results come in the order chunks finish.
+    Results are the whole decoded packets (c, a and p) as plain Python values (to_python), which are much cheaper
+    to send back than SFSObjects, or SFSObjects with python False. transform, a picklable function, is applied to
+    every result inside the worker, so only what it returns is sent back. only and numpy_arrays are passed on to
+    SFSObject.decompile, direction (INBOUND / OUTBOUND) filters the packets of a capture file.
+    With indexed (index, result) pairs are yielded, index being the record number or the position of the buffer.
+    processes defaults to the number of CPUs, with 1 everything is decoded in this process.
+    """
+    options = (python, only, numpy_arrays, transform)
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    if isinstance(source, (str, os.PathLike)):
+        function, tasks = _decode_capture, _capture_tasks(os.fspath(source), chunk_size, direction, options)
+    else:
+        function, tasks = _decode_buffers, _buffer_tasks(source, chunk_size, framed, options, processes > 1)
+
+    results = _run_pool(function, tasks, processes, ordered) if processes > 1 else _run_here(function, tasks)
+    if indexed:
+        return results
+    return (result for _, result in results)
@@ -0,0 +1,153 @@
+import collections
+import mmap
+import os
+import struct
+import threading
+import time
+
+from .framer import split_frames
+from ..sfs_types.SFSObject import SFSObject
+
+INBOUND = 0
+OUTBOUND = 1
+
+# File layout: MAGIC, then one record per packet: direction (1 byte), time in ns (8), body size (4) and the body.
+# path + ".idx" holds the 8-byte offset of every record, so the reader can jump to a packet without scanning.
+MAGIC = b"SFSCAP\x00\x01"
+_record = struct.Struct(">BQI")
+_offset = struct.Struct(">Q")
+
+CapturedPacket = collections.namedtuple("CapturedPacket", ("direction", "timestamp_ns", "data"))
+
+
+class SFSCaptureWriter:
+    """
+    Appends packet bodies (uncompressed, without the frame header) to a capture file and its offset index.
+    Used by SFSClient(capture_path=...) for everything read_response returns and send_raw sends.
+    """
+
+    def __init__(self, path: str):
+        self.__file = open(path, "ab")
+        self.__index = open(path + ".idx", "ab")
+        self.__lock = threading.Lock()
+        if self.__file.tell() == 0:
+            self.__file.write(MAGIC)
+        self.__offset = self.__file.tell()
+
+    def write(self, direction: int, body, timestamp_ns: int = None):
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        with self.__lock:
+            self.__file.write(_record.pack(direction, timestamp_ns, len(body)))
+            self.__file.write(body)
+            self.__index.write(_offset.pack(self.__offset))
+            self.__offset += _record.size + len(body)
+
+    def write_frame(self, direction: int, frame: bytes, timestamp_ns: int = None):
+        """
+        Records the bodies of framed packets as sent on the wire, compressed ones are inflated
+        """
+        for body in split_frames(frame):
+            self.write(direction, body, timestamp_ns)
+
+    def flush(self):
+        with self.__lock:
+            self.__file.flush()
+            self.__index.flush()
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+            self.__index.close()
+
+
+class SFSCaptureReader:
+    """
+    Random access to a capture file through mmap, packets are read on demand and never copied:
+    data of every CapturedPacket is a memoryview into the mapped file, valid until close.
+    A missing or incomplete index (e.g. after a crash) is rebuilt in memory by scanning the records.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__view = memoryview(self.__map)
+        if self.__view[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an SFS capture file")
+        self.__offsets = self.__load_index(path + ".idx")
+
+    def __load_index(self, path: str):
+        size = len(self.__map)
+        if os.path.exists(path) and os.path.getsize(path) > 0 and os.path.getsize(path) % _offset.size == 0:
+            with open(path, "rb") as file:
+                index = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            # The index is complete when its last record ends exactly at the end of the capture file
+            last = _offset.unpack_from(index, len(index) - _offset.size)[0]
+            if last + _record.size <= size and last + _record.size + _record.unpack_from(self.__map, last)[2] == size:
+                return _IndexOffsets(index)
+            index.close()
+
+        offsets = []
+        offset = len(MAGIC)
+        while offset + _record.size <= size:
+            length = _record.unpack_from(self.__map, offset)[2]
+            if offset + _record.size + length > size:
+                break
+            offsets.append(offset)
+            offset += _record.size + length
+        return offsets
+
+    def __len__(self):
+        return len(self.__offsets)
+
+    def __getitem__(self, index: int) -> CapturedPacket:
+        offset = self.__offsets[index]
+        direction, timestamp_ns, length = _record.unpack_from(self.__map, offset)
+        start = offset + _record.size
+        return CapturedPacket(direction, timestamp_ns, self.__view[start:start + length])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def decode(self, index: int, **kwargs) -> SFSObject:
+        """
+        Decodes a packet, keyword arguments are passed on to SFSObject.decompile (numpy_arrays, lazy, only)
+        """
+        return SFSObject.decompile(self[index].data, **kwargs)
+
+    def close(self):
+        if isinstance(self.__offsets, _IndexOffsets):
+            self.__offsets.close()
+        self.__view.release()
+        try:
+            self.__map.close()
+        except BufferError:
+            # data views handed out are still alive, the map is closed once they are collected
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _IndexOffsets:
+    # Read-only sequence over the mapped 8-byte big-endian offsets of an index file
+    def __init__(self, index: mmap.mmap):
+        self.__index = index
+        self.__length = len(index) // _offset.size
+
+    def __len__(self):
+        return self.__length
+
+    def __getitem__(self, position: int) -> int:
+        if position < 0:
+            position += self.__length
+        if not 0 <= position < self.__length:
+            raise IndexError("capture index out of range")
+        return _offset.unpack_from(self.__index, position * _offset.size)[0]
+
+    def close(self):
+        self.__index.close()
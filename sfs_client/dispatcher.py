@@ -0,0 +1,305 @@
+import collections
+import contextlib
+import logging
+import threading
+import weakref
+from concurrent.futures import Future
+
+from ..sfs_types.SFSObject import SFSObject
+
+logger = logging.getLogger(__name__)
+
+# key is the command of an extension response or (c, a) of any other packet, response its decoded params
+DispatchedPacket = collections.namedtuple("DispatchedPacket", ("key", "response", "packet"))
+
+
+def route_key(c: int, a: int, response, correlation_key: str = None):
+    # Extension responses (controller 1) carry their command in the params, system messages are told apart by c and a.
+    # A response echoing the request id under correlation_key is routed to (command, request id).
+    if c == 1 and response is not None and "c" in response:
+        params = response.get("p")
+        if correlation_key is not None and params is not None and correlation_key in params:
+            return response.get("c"), params.get(correlation_key)
+        return response.get("c")
+    return c, a
+
+
+class _Waiter:
+    # A concurrent.futures or asyncio future waiting for the next packet of one of keys, empty keys match every packet.
+    # With chunks it takes every chunk of a chunked response (numChunks of the first one) before it is done and keeps
+    # its place in the queue meanwhile, so the chunks of two responses to one command are not mixed up.
+    __slots__ = ("keys", "future", "chunks", "items", "running")
+
+    def __init__(self, keys: tuple, future, chunks: bool):
+        self.keys = keys
+        self.future = future
+        self.chunks = chunks
+        self.items = []
+        self.running = False
+
+    def matches(self, key, correlated: bool) -> bool:
+        if not self.keys or key in self.keys:
+            return True
+        # A response that does not echo the request id under correlation_key goes to the oldest request of its command
+        return correlated and type(key) is str and any(type(item) is tuple and item[0] == key for item in self.keys)
+
+    def add(self, item) -> bool:
+        # True once the last packet the waiter takes arrived
+        items = self.items
+        items.append(item)
+        if not self.chunks:
+            return True
+        params = items[0].response.get("p") if items[0].response is not None else None
+        total = params.get("numChunks") if params is not None else None
+        return total is None or len(items) >= total
+
+    def result(self):
+        return self.items if self.chunks else self.items[0]
+
+    def claim(self) -> bool:
+        # False for a cancelled future, a concurrent Future can not be cancelled any more once running
+        future = self.future
+        if not isinstance(future, Future):
+            return not future.done()
+        if not self.running:
+            self.running = future.set_running_or_notify_cancel()
+        return self.running
+
+
+class PacketRouter:
+    """
+    Routes decoded packets by their key, shared by SFSDispatcher, AsyncSFSClient and SFSSession: to the oldest future
+    waiting for the key (see add_waiter), to the callbacks subscribed to it, or when nobody asked for it yet to a
+    backlog the next waiter takes it from, so pushes arriving while another response is awaited are kept. The backlog
+    holds at most backlog packets, the oldest are dropped beyond that.
+    Futures are concurrent.futures or asyncio ones, with a lock (threading.Lock) the router is shared by threads.
+    """
+
+    def __init__(self, backlog: int = 1024, correlation_key: str = None, lock=None):
+        self.correlation_key = correlation_key
+        self.backlog = collections.deque(maxlen=backlog)
+        # the error that ended the connection, later waiters fail with it
+        self.error = None
+        self.__lock = lock if lock is not None else contextlib.nullcontext()
+        # _Waiter instances in the order they were added
+        self.__waiters = []
+        # key -> tuple of callbacks, None subscribes to every packet
+        self.__subscribers = {}
+
+    def add_waiter(self, future, keys: tuple = (), chunks: bool = False):
+        """
+        Completes future with the next DispatchedPacket routed to one of keys, taken from the backlog when one is
+        there already. Without keys it takes the next packet that no waiter naming its key takes, waiters added after
+        it included. With chunks the result is the list of all chunks of a chunked response (numChunks), a single
+        packet without numChunks included.
+        Cancelling the future gives the packet to the next waiter. Once the connection is closed the future fails with
+        the ConnectionError / OSError that ended it.
+        """
+        waiter = _Waiter(keys, future, chunks)
+        correlated = self.correlation_key is not None
+        done = False
+        with self.__lock:
+            backlog = self.backlog
+            position = 0
+            while position < len(backlog) and not done:
+                if waiter.matches(backlog[position].key, correlated):
+                    done = waiter.add(backlog[position])
+                    del backlog[position]
+                else:
+                    position += 1
+            error = self.error
+            if not done and error is None:
+                self.__waiters.append(waiter)
+        if done:
+            future.set_result(waiter.result())
+        elif error is not None:
+            future.set_exception(error)
+        return future
+
+    def subscribe(self, key, callback):
+        """
+        Calls callback(DispatchedPacket) for every packet routed to key (every packet with key None), e.g. queue.put
+        to collect them in a queue. Subscribed packets are not kept in the backlog.
+        """
+        with self.__lock:
+            self.__subscribers[key] = self.__subscribers.get(key, ()) + (callback,)
+
+    def unsubscribe(self, key, callback):
+        with self.__lock:
+            callbacks = tuple(item for item in self.__subscribers.get(key, ()) if item != callback)
+            if callbacks:
+                self.__subscribers[key] = callbacks
+            else:
+                self.__subscribers.pop(key, None)
+
+    def decode(self, packet: bytes, decompile_response):
+        """
+        Decodes a packet body with decompile_response (see SFSClient.decompile_response) into a DispatchedPacket.
+        A packet that can not be decoded is skipped, the framing of the ones after it is intact: the waiter it would
+        have gone to fails with the error when its key can still be read, otherwise the error is logged. None then.
+        """
+        try:
+            c, a, response = decompile_response(packet)
+        except Exception as error:
+            self.__skip(packet, error)
+            return None
+        return DispatchedPacket(route_key(c, a, response, self.correlation_key), response, packet)
+
+    def route(self, item: DispatchedPacket):
+        done = False
+        with self.__lock:
+            waiter = self.__find_waiter(item.key)
+            if waiter is not None:
+                done = waiter.add(item)
+                if done:
+                    self.__waiters.remove(waiter)
+            callbacks = self.__subscribers.get(item.key, ()) + self.__subscribers.get(None, ())
+            if waiter is None and not callbacks:
+                self.backlog.append(item)
+
+        # Outside the lock, callbacks of the future may add waiters again
+        if done and not waiter.future.done():
+            waiter.future.set_result(waiter.result())
+        for callback in callbacks:
+            callback(item)
+
+    def fail(self, key, error: Exception) -> bool:
+        """
+        Fails the oldest waiter of key with error, False when nobody waits for it
+        """
+        with self.__lock:
+            waiter = self.__find_waiter(key)
+            if waiter is not None:
+                self.__waiters.remove(waiter)
+        if waiter is None:
+            return False
+        if not waiter.future.done():
+            waiter.future.set_exception(error)
+        return True
+
+    def close(self, error: Exception):
+        with self.__lock:
+            self.error = error
+            waiters, self.__waiters = self.__waiters, []
+        for waiter in waiters:
+            if waiter.claim():
+                waiter.future.set_exception(error)
+
+    def __find_waiter(self, key):
+        # The oldest waiter of key, cancelled ones on the way are dropped. Waiters for any key only come after those
+        # naming it, so read_response does not take a response a request registered for later. Called with the lock
+        # held
+        correlated = self.correlation_key is not None
+        waiters = self.__waiters
+        keyless = []
+        position = 0
+        while position < len(waiters):
+            waiter = waiters[position]
+            if waiter.future.cancelled() and not waiter.items:
+                del waiters[position]
+            elif not waiter.matches(key, correlated):
+                position += 1
+            elif not waiter.keys and not waiter.items:
+                keyless.append(waiter)
+                position += 1
+            elif waiter.items or waiter.claim():
+                # in the middle of a chunked response it takes the rest even when its future was cancelled meanwhile
+                return waiter
+            else:
+                del waiters[position]
+        for waiter in keyless:
+            if waiter.claim():
+                return waiter
+            waiters.remove(waiter)
+        return None
+
+    def __skip(self, packet: bytes, error: Exception):
+        # Only the fields the key is made of are read again, they are usually intact when a value further on is not
+        key = None
+        paths = ["c", "a", "p.c"]
+        if self.correlation_key is not None:
+            paths.append("p.p." + self.correlation_key)
+        try:
+            outer = SFSObject.decompile(packet, only=paths)
+            key = route_key(outer.get("c"), outer.get("a"), outer.get("p"), self.correlation_key)
+        except Exception:
+            pass
+        if key is None or not self.fail(key, error):
+            logger.warning("Skipped an SFS packet that can not be decoded (key %r)", key, exc_info=error)
+
+
+class SFSDispatcher:
+    """
+    Owns the reading side of an SFSClient connection. A thread reads and decodes every packet once and routes it with
+    a PacketRouter: to the oldest future waiting for its key (see expect), to the callbacks subscribed to it, or to a
+    backlog the next expect takes it from.
+    Any number of threads can wait on one connection this way, none of them reads the socket itself.
+    The thread only holds a weak reference to the client while it waits for data, so a client dropped without close
+    is still collected, its __del__ closes the connection and the thread ends with it.
+    """
+
+    def __init__(self, client, backlog: int = 1024):
+        self.__client = weakref.ref(client)
+        self.router = PacketRouter(backlog, client.correlation_key, threading.Lock())
+        self.thread = None
+
+    @property
+    def client(self):
+        # None once the client was collected
+        return self.__client()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.__run, name="sfs-dispatcher", daemon=True)
+        self.thread.start()
+
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def join(self, timeout: float = None):
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def expect(self, *keys, chunks: bool = False) -> Future:
+        """
+        Returns a Future of the next DispatchedPacket routed to one of keys (without them of the next one nobody else
+        waits for), with chunks of the list of all chunks of a chunked response, see PacketRouter.add_waiter
+        """
+        return self.router.add_waiter(Future(), keys, chunks)
+
+    def subscribe(self, key, callback):
+        """
+        Calls callback(DispatchedPacket) on the dispatcher thread for every packet routed to key (every packet with
+        key None), see PacketRouter.subscribe
+        """
+        self.router.subscribe(key, callback)
+
+    def unsubscribe(self, key, callback):
+        self.router.unsubscribe(key, callback)
+
+    def __run(self):
+        error = ConnectionError("SFS connection closed")
+        router = self.router
+        try:
+            while True:
+                client = self.__client()
+                if client is None:
+                    break
+                if not client.packets:
+                    connection, framer = client.connection, client.framer
+                    client = None
+                    try:
+                        packets = framer.receive(connection)
+                    except ValueError as exception:
+                        error = ConnectionError(f"SFS stream broken: {exception}")
+                        break
+                    client = self.__client()
+                    if packets is None or client is None:
+                        break
+                    client.packets.extend(packets)
+                while client.packets:
+                    item = router.decode(client.read_packet(), client.decompile_response)
+                    if item is not None:
+                        router.route(item)
+        except OSError as exception:
+            error = exception
+        router.close(error)
@@ -0,0 +1,235 @@
+import struct
+import zlib
+
+# Header byte flags
+BINARY = 0x80
+ENCRYPTED = 0x40
+COMPRESSED = 0x20
+BLUE_BOXED = 0x10
+BIG_SIZE = 0x08
+
+_unpack_ushort = struct.Struct(">H").unpack_from
+_unpack_uint = struct.Struct(">I").unpack_from
+
+
+def _inflate_into(inflated: bytearray, inflater, data, max_size: int = None, last: bool = False):
+    # Appends what data inflates to, never more than max_size bytes in total: a body inflating beyond that raises
+    # ValueError once max_size + 1 bytes are out, so a compression bomb costs no more memory than the cap
+    try:
+        if max_size is None:
+            inflated += inflater.decompress(data)
+        else:
+            inflated += inflater.decompress(data, max_size - len(inflated) + 1)
+            if inflater.unconsumed_tail:
+                raise ValueError(f"Inflated packet is larger than {max_size} bytes")
+        if last:
+            inflated += inflater.flush()
+    except zlib.error as error:
+        raise ValueError(f"Broken compressed packet: {error}") from error
+    if max_size is not None and len(inflated) > max_size:
+        raise ValueError(f"Inflated packet is larger than {max_size} bytes")
+
+
+def split_frames(data, max_packet_size: int = None) -> list:
+    """
+    Returns the bodies of the whole frames in data (a bytes-like object), compressed ones inflated. For complete
+    frames at hand, e.g. a packet as sent, without the receive buffer of an SFSFramer. An incomplete frame at the end
+    is left out, a header SFSFramer would reject raises ValueError. Like there max_packet_size caps the size of a
+    body before and after inflating.
+    """
+    bodies = []
+    with memoryview(data) as view:
+        offset, length = 0, len(view)
+        while offset < length:
+            header = view[offset]
+            if not header & BINARY:
+                raise ValueError(f"Unexpected packet header 0x{header:02x}")
+            if header & ENCRYPTED:
+                raise ValueError(f"Encrypted packets are not supported (header 0x{header:02x})")
+            if header & BIG_SIZE:
+                if length < offset + 5:
+                    break
+                size, start = _unpack_uint(view, offset + 1)[0], offset + 5
+            else:
+                if length < offset + 3:
+                    break
+                size, start = _unpack_ushort(view, offset + 1)[0], offset + 3
+            if max_packet_size is not None and size > max_packet_size:
+                raise ValueError(f"Packet of {size} bytes is larger than {max_packet_size}")
+            offset = start + size
+            if offset > length:
+                break
+            if header & COMPRESSED:
+                body = bytearray()
+                _inflate_into(body, zlib.decompressobj(), view[start:offset], max_packet_size, True)
+                bodies.append(bytes(body))
+            else:
+                bodies.append(bytes(view[start:offset]))
+    return bodies
+
+
+class SFSFramer:
+    """
+    Incremental parser of the SFS2X framing layer (header byte, 2 or 4 byte size, body).
+    Byte chunks of any size are passed to feed, or read straight from a socket with receive, which return the
+    packets completed by them. Received bytes go to one preallocated buffer of buffer_size bytes that is reused
+    for every read; partial headers and bodies stay in it until the rest arrives (it grows for packets larger than
+    it), so the framer can be driven by blocking or non-blocking sockets, asyncio protocols or captured traffic.
+    Compressed packets are inflated while their body arrives, so only the inflated body is kept in memory.
+    max_packet_size caps the size of a body as sent and once inflated, larger ones raise ValueError.
+    With decode (e.g. SFSClient.decompile_packet) every body is decoded before it is returned. With views decode
+    gets a memoryview of the body in the receive buffer instead of a copy, valid only during the call: use it with
+    decoders that copy what they keep (not lazy or numpy_arrays ones).
+    """
+
+    def __init__(self, decode=None, max_packet_size: int = None, buffer_size: int = 1 << 16, views: bool = False):
+        self.__buffer_size = buffer_size
+        self.__buffer = bytearray(buffer_size)
+        # received bytes not parsed yet are buffer[start:end]
+        self.__start = 0
+        self.__end = 0
+        # bytes still missing for the packet at start, so the next read makes room for all of them
+        self.__missing = 0
+        self.__decode = decode
+        self.__views = views and decode is not None
+        self.__max_packet_size = max_packet_size
+        # state of the compressed packet being received
+        self.__inflater = None
+        self.__inflated = None
+        self.__remaining = 0
+
+    def feed(self, data) -> list:
+        """
+        Appends a chunk of received bytes and returns the packets it completed, in order.
+        Raises ValueError on a header this framer can not handle, call reset before reusing it after that.
+        """
+        length = len(data)
+        self.__reserve(length)
+        self.__buffer[self.__end:self.__end + length] = data
+        self.__end += length
+        return self.__parse()
+
+    def receive(self, connection):
+        """
+        Reads what a socket has for the free space of the receive buffer with a single recv_into call and returns
+        the packets it completed like feed, None when the connection was closed.
+        Socket errors (BlockingIOError of non-blocking sockets included) are raised as they are.
+        """
+        self.__reserve(max(self.__missing, self.__buffer_size // 4))
+        received = connection.recv_into(memoryview(self.__buffer)[self.__end:])
+        if received == 0:
+            return None
+        self.__end += received
+        return self.__parse()
+
+    def __reserve(self, size: int):
+        # Makes room for size bytes after the received ones, moving these to the front or into a larger buffer.
+        # The buffer is never resized in place, views handed to decode can not block that.
+        buffer, start, end = self.__buffer, self.__start, self.__end
+        if len(buffer) - end >= size:
+            return
+        used = end - start
+        if used + size > len(buffer):
+            capacity = max(self.__buffer_size, used + size)
+            self.__buffer = bytearray(capacity)
+        self.__buffer[:used] = buffer[start:end]
+        self.__start, self.__end = 0, used
+
+    def __parse(self) -> list:
+        buffer = self.__buffer
+        decode = self.__decode
+        packets = []
+        with memoryview(buffer) as view:
+            while True:
+                if self.__inflater is not None:
+                    body = self.__inflate(view)
+                    if body is None:
+                        break
+                    packets.append(body if decode is None else decode(body))
+                    continue
+
+                position = self.__next(buffer)
+                if position is None:
+                    if self.__inflater is not None:
+                        # a compressed packet starts, its body follows the header
+                        continue
+                    break
+                start, end = position
+                if self.__views:
+                    packets.append(decode(view[start:end]))
+                else:
+                    body = bytes(view[start:end])
+                    packets.append(body if decode is None else decode(body))
+                self.__start = end
+
+        if self.__start == self.__end:
+            # Nothing left over, the next read starts at the front of a buffer of the configured size again
+            self.__start = self.__end = 0
+            if len(buffer) > self.__buffer_size:
+                self.__buffer = bytearray(self.__buffer_size)
+        return packets
+
+    def __next(self, buffer: bytearray) -> (int, int):
+        # Returns the start and end of the next complete body, None when it is not complete yet
+        offset = self.__start
+        available = self.__end - offset
+        self.__missing = 0
+        if available < 1:
+            return None
+
+        header = buffer[offset]
+        if not header & BINARY:
+            raise ValueError(f"Unexpected packet header 0x{header:02x}")
+        if header & ENCRYPTED:
+            raise ValueError(f"Encrypted packets are not supported (header 0x{header:02x})")
+
+        if header & BIG_SIZE:
+            if available < 5:
+                self.__missing = 5 - available
+                return None
+            size, start = _unpack_uint(buffer, offset + 1)[0], offset + 5
+        else:
+            if available < 3:
+                self.__missing = 3 - available
+                return None
+            size, start = _unpack_ushort(buffer, offset + 1)[0], offset + 3
+
+        if self.__max_packet_size is not None and size > self.__max_packet_size:
+            raise ValueError(f"Packet of {size} bytes is larger than {self.__max_packet_size}")
+        if header & COMPRESSED:
+            # The body is consumed chunk by chunk from here on, see __inflate
+            self.__inflater = zlib.decompressobj()
+            self.__inflated = bytearray()
+            self.__remaining = size
+            self.__start = start
+            return None
+        if self.__end < start + size:
+            self.__missing = start + size - self.__end
+            return None
+        return start, start + size
+
+    def __inflate(self, view: memoryview) -> bytes:
+        offset = self.__start
+        length = min(self.__remaining, self.__end - offset)
+        last = length == self.__remaining
+        _inflate_into(self.__inflated, self.__inflater, view[offset:offset + length], self.__max_packet_size, last)
+        self.__start += length
+        self.__remaining -= length
+        if not last:
+            return None
+
+        body = bytes(self.__inflated)
+        self.__inflater = self.__inflated = None
+        return body
+
+    def pending(self) -> int:
+        """
+        Returns the number of buffered bytes that do not form a complete packet yet
+        """
+        return self.__end - self.__start
+
+    def reset(self):
+        self.__buffer = bytearray(self.__buffer_size)
+        self.__start = self.__end = self.__missing = 0
+        self.__inflater = self.__inflated = None
+        self.__remaining = 0
@@ -0,0 +1,101 @@
+import struct
+
+from ..sfs_types.SFSObject import SFSObject
+from ..sfs_types.decoder import TYPE_NAMES
+from ..sfs_types.encoder import HEADER_RESERVE, finish_packet_into, write_object_body
+from ..sfs_types.lazy import LazySFSObject
+
+# pack functions of the fixed-width types, indexed by type code
+_packers = (
+    None,
+    struct.Struct(">?").pack,
+    struct.Struct(">b").pack,
+    struct.Struct(">h").pack,
+    struct.Struct(">i").pack,
+    struct.Struct(">q").pack,
+    struct.Struct(">f").pack,
+    struct.Struct(">d").pack,
+)
+
+
+class PreparedRequest:
+    """
+    Extension request for a fixed command with its envelope (c, a, p / c, r, p) encoded once.
+    compile only encodes the params passed to it and writes the size header. Params given to set_params are
+    encoded once as well, their top level fixed-width fields (bool, byte, short, int, long, float, double)
+    can then be overwritten in place with set_param, so resending them needs no encoding at all.
+    """
+
+    def __init__(self, command: str, params: SFSObject = None, schema=None):
+        request = SFSObject()
+        request.putUtfString("c", command)
+        request.putInt("r", -1)
+        request.putSFSObject("p", SFSObject())
+        envelope = SFSObject()
+        envelope.putByte("c", 1)
+        envelope.putShort("a", 12)
+        envelope.putSFSObject("p", request)
+
+        # p is the last field on both levels, so the envelope ends with the field count of the empty params
+        self.__command = command
+        self.__prefix = envelope.compile()[:-2]
+        self.__schema = schema
+        self.__packet = None
+        self.__slots = {}
+        if params is not None:
+            self.set_params(params)
+
+    def get_command(self) -> str:
+        return self.__command
+
+    def __write_params(self, buffer: bytearray, params: SFSObject):
+        if self.__schema is not None:
+            self.__schema.compile_body_into(buffer, params)
+        else:
+            write_object_body(buffer, params)
+
+    def set_params(self, params: SFSObject):
+        """
+        Encodes the whole packet for params and indexes its fixed-width fields for set_param
+        """
+        buffer = bytearray(HEADER_RESERVE)
+        buffer += self.__prefix
+        self.__write_params(buffer, params)
+        self.__packet = finish_packet_into(buffer, 0)
+
+        header_size = 5 if self.__packet[0] & 0x08 else 3
+        index = LazySFSObject(self.__packet, header_size + len(self.__prefix)).getIndex()
+        self.__slots = {key: (code, start) for key, (code, _, start, _) in index.items() if 0 < code < len(_packers)}
+
+    def set_param(self, key: str, value):
+        """
+        Overwrites a fixed-width field of the params given to set_params, its type stays the same.
+        Raises KeyError for other keys and ValueError for a value that does not fit the type, the packet is unchanged
+        """
+        if key not in self.__slots:
+            raise KeyError(f"{key!r} is not a fixed-width field of the prepared params")
+        code, offset = self.__slots[key]
+        try:
+            # packed apart first, pack_into can leave a partly written value behind when it fails
+            packed = _packers[code](value)
+        except struct.error as error:
+            raise ValueError(f"{value!r} does not fit the {TYPE_NAMES[code]} field {key!r}: {error}") from error
+        self.__packet[offset:offset + len(packed)] = packed
+
+    def compile(self, params: SFSObject = None, compression_threshold: int = None) -> bytes:
+        """
+        Returns the framed packet for params, or for the params given to set_params when params is None
+        """
+        if params is None:
+            if self.__packet is None:
+                raise ValueError(f"No params were prepared for {self.__command!r}")
+            body_size = len(self.__packet) - (5 if self.__packet[0] & 0x08 else 3)
+            if compression_threshold is None or body_size <= compression_threshold:
+                return bytes(self.__packet)
+            buffer = bytearray(HEADER_RESERVE)
+            buffer += memoryview(self.__packet)[-body_size:]
+        else:
+            buffer = bytearray(HEADER_RESERVE)
+            buffer += self.__prefix
+            self.__write_params(buffer, params)
+        return bytes(finish_packet_into(buffer, 0, compression_threshold))
@@ -0,0 +1,218 @@
+import errno
+import selectors
+import socket
+
+from . import SFSClient
+from .capture import INBOUND, OUTBOUND
+from .dispatcher import PacketRouter
+
+_READ = selectors.EVENT_READ
+_WRITE = selectors.EVENT_WRITE
+_DELIVERED = "SFSSession packets are delivered by its SessionManager, blocking reads are not available"
+
+
+class SFSSession(SFSClient):
+    """
+    An SFSClient whose non-blocking socket is driven by a SessionManager. The send_* methods (login, extension and
+    prepared requests) work as usual but only append to the write buffer of the session, which the manager flushes.
+    Received packets are decoded once and passed, by their key (see route_key), to handlers[key], then to the
+    on_packet callback of the manager, otherwise they are kept in backlog. Blocking reads (read_response,
+    wait_extension_response, wait_requests, request, request_many) raise RuntimeError, the manager owns the socket.
+    """
+
+    def __init__(self, manager, backlog: int = 1024, receive_buffer_size: int = 1 << 14, **options):
+        # a smaller receive buffer than SFSClient by default, there is one per session and it grows for large packets
+        super().__init__(dispatch=False, receive_buffer_size=receive_buffer_size, **options)
+        self.manager = manager
+        self.connection.setblocking(False)
+        self.address = None
+        # connected once the non-blocking connect finished, ready once the handshake response arrived
+        self.connected = False
+        self.ready = False
+        self.closed = False
+        # key -> callback(session, DispatchedPacket)
+        self.handlers = {}
+        # decodes the packets, the ones nobody handles are kept in its backlog
+        self.router = PacketRouter(backlog, self.correlation_key)
+        self.backlog = self.router.backlog
+        # free for the owner to keep per-session state in
+        self.data = {}
+        self.out = bytearray()
+        self.__writing = False
+
+    def connect(self, host: str, port: int = 9933):
+        self.address = (host, port)
+        error = self.connection.connect_ex(self.address)
+        if error not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            raise OSError(error, errno.errorcode.get(error, "connect failed"))
+        # writable once connected, the handshake queued first goes out then with whatever was sent meanwhile
+        self.manager.selector.register(self.connection, _WRITE, self)
+        self.__writing = True
+        self.send_handshake_request()
+
+    def send_handshake_request(self):
+        self.send_packet(0, 0, SFSClient.handshake_params())
+
+    def send_raw(self, packet: bytes):
+        if self.closed:
+            raise ConnectionError("SFS session closed")
+        self.out += packet
+        if self.capture is not None:
+            self.capture.write_frame(OUTBOUND, packet)
+        if self.connected:
+            self.flush()
+
+    def read_packet(self):
+        raise RuntimeError(_DELIVERED)
+
+    # The blocking reads of SFSClient would wait for packets only the manager receives
+    def read_response(self, only: list = None):
+        raise RuntimeError(_DELIVERED)
+
+    def wait_extension_response(self, command: str, binary=None, timeout=None):
+        raise RuntimeError(_DELIVERED)
+
+    def wait_requests(self, commands: list, binary=None):
+        raise RuntimeError(_DELIVERED)
+
+    def request(self, command: str, params, binary=None, parse_chunks=None):
+        raise RuntimeError(_DELIVERED)
+
+    def request_many(self, requests: list, binary=None, parse_chunks=None):
+        raise RuntimeError(_DELIVERED)
+
+    def flush(self):
+        """
+        Sends as much of the write buffer as the socket takes, the manager waits for the socket to be writable for
+        the rest
+        """
+        out = self.out
+        try:
+            while out:
+                sent = self.connection.send(out)
+                del out[:sent]
+        except (BlockingIOError, InterruptedError):
+            pass
+        # Write events are only asked for while data is left over
+        if bool(out) != self.__writing:
+            self.__writing = bool(out)
+            self.manager.selector.modify(self.connection, _READ | _WRITE if out else _READ, self)
+
+    def close(self):
+        self.manager.close_session(self)
+
+
+class SessionManager:
+    """
+    Drives any number of SFSSession connections from one thread with selectors (epoll on Linux), instead of one
+    thread per SFSClient. Everything, callbacks included, runs in the thread calling poll / run; sessions must not
+    be used from other threads.
+    on_connect(session) is called when the handshake response of a session arrived (send the login from it),
+    on_packet(session, DispatchedPacket) for packets without a handler of their key and
+    on_close(session, error) when a connection ends, error being None when it was closed by close_session.
+    """
+
+    def __init__(self, on_connect=None, on_packet=None, on_close=None):
+        self.selector = selectors.DefaultSelector()
+        self.sessions = set()
+        self.on_connect = on_connect
+        self.on_packet = on_packet
+        self.on_close = on_close
+        self.__running = False
+
+    def connect(self, host: str, port: int = 9933, **options) -> SFSSession:
+        """
+        Starts connecting a new session, options are passed on to SFSSession and SFSClient (receive_buffer_size,
+        socket_receive_buffer, numpy_arrays, lazy, compression_threshold, capture_path, correlation_key, ...),
+        schemas are registered on the session afterwards
+        """
+        session = SFSSession(self, **options)
+        session.connect(host, port)
+        self.sessions.add(session)
+        return session
+
+    def close_session(self, session: SFSSession, error: Exception = None):
+        if session.closed:
+            return
+        session.closed = True
+        self.sessions.discard(session)
+        self.selector.unregister(session.connection)
+        session.connection.close()
+        if session.capture is not None:
+            session.capture.close()
+        if self.on_close is not None:
+            self.on_close(session, error)
+
+    def poll(self, timeout: float = None) -> int:
+        """
+        Waits at most timeout seconds for socket events and handles them, returns the number of events
+        """
+        events = self.selector.select(timeout)
+        for key, mask in events:
+            session = key.data
+            if session.closed:
+                continue
+            try:
+                if mask & _READ:
+                    self.__read(session)
+                if mask & _WRITE and not session.closed:
+                    self.__write(session)
+            except OSError as error:
+                self.close_session(session, error)
+        return len(events)
+
+    def run(self, timeout: float = None):
+        """
+        Polls until stop is called or no session is left, timeout limits the wait of every poll
+        """
+        self.__running = True
+        while self.__running and self.sessions:
+            self.poll(timeout)
+
+    def stop(self):
+        self.__running = False
+
+    def close(self):
+        for session in list(self.sessions):
+            self.close_session(session)
+        self.selector.close()
+
+    def __write(self, session: SFSSession):
+        if not session.connected:
+            # the non-blocking connect finished
+            error = session.connection.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if error:
+                raise OSError(error, errno.errorcode.get(error, "connect failed"))
+            session.connected = True
+            self.selector.modify(session.connection, _READ | _WRITE, session)
+        session.flush()
+
+    def __read(self, session: SFSSession):
+        try:
+            packets = session.framer.receive(session.connection)
+        except (BlockingIOError, InterruptedError):
+            return
+        except ValueError as error:
+            raise ConnectionError(f"SFS stream broken: {error}")
+        if packets is None:
+            raise ConnectionError("SFS connection closed")
+
+        for packet in packets:
+            if session.capture is not None:
+                session.capture.write(INBOUND, packet)
+            item = session.router.decode(packet, session.decompile_response)
+            if item is None:
+                continue
+
+            if not session.ready and item.key == (0, 0):
+                session.ready = True
+                if self.on_connect is not None:
+                    self.on_connect(session)
+            elif item.key in session.handlers:
+                session.handlers[item.key](session, item)
+            elif self.on_packet is not None:
+                self.on_packet(session, item)
+            else:
+                session.router.route(item)
+            if session.closed:
+                return
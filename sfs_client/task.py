@@ -1,5 +1,6 @@
 import time
 import threading
+from concurrent.futures import TimeoutError
 
 from pyfox2x.sfs_types import SFSObject
 
@@ -14,6 +15,8 @@ class SFSTask:
         self.client = client
 
     def wait_response(self, cmd, binary, deadline_delta=None):
+        if self.client.dispatcher is not None:
+            return self.wait_dispatched_response(cmd, binary, deadline_delta)
         if deadline_delta is None:
             return self.wait_extension_response(cmd, binary)
         else:
@@ -39,6 +42,23 @@ class SFSTask:
 
             return None
 
+    def wait_dispatched_response(self, command, binary, timeout=None):
+        # The response is routed here by the client dispatcher, None on timeout or a closed connection
+        future = self.client.dispatcher.expect(command)
+        try:
+            item = future.result(timeout)
+        except TimeoutError:
+            # cancel fails when the response is being delivered right now, it is taken then
+            if future.cancel():
+                return None
+            item = future.result()
+        except OSError:
+            return None
+
+        self.result, self.result_binary = item.response.get("p"), item.packet
+        if binary:
+            return self.result_binary
+        return self.result
 
     def wait_extension_response(self, command, binary):
         if binary is None:
@@ -62,7 +82,7 @@ class SFSTask:
                     self.client.connection.close()
                     return
 
-                if 'c' in response.getValue():
+                if 'c' in response:
                     cmd, self.result = response.get("c"), response.get("p")
             except:
                 continue
@@ -0,0 +1,193 @@
+import asyncio
+import inspect
+import itertools
+import threading
+import time
+
+from ..sfs_client.framer import SFSFramer
+from ..sfs_types.SFSObject import SFSObject
+from ..sfs_types.encoder import compile_packet_into
+
+
+class SFSMockSession:
+    """
+    A client connected to SFSMockServer. Handlers get it as their first argument,
+    data is free for them to keep per-session state in.
+    """
+
+    def __init__(self, server, session_id: int, writer: asyncio.StreamWriter):
+        self.server = server
+        self.session_id = session_id
+        self.zone = None
+        self.username = None
+        self.data = {}
+        self.__writer = writer
+        self.__loop = asyncio.get_running_loop()
+        self.__queue = asyncio.Queue()
+        self.__sender = asyncio.ensure_future(self.__send_loop())
+
+    def send_packet(self, c: int, a: int, params: SFSObject):
+        """
+        Queues a packet, it is written after the server latency and at most at the server bandwidth.
+        Safe to call from other threads, e.g. next to start_in_thread.
+        """
+        packet = SFSObject()
+        packet.putByte("c", c)
+        packet.putShort("a", a)
+        packet.putSFSObject("p", params)
+        data = bytes(compile_packet_into(bytearray(), packet, self.server.compression_threshold))
+        self.__loop.call_soon_threadsafe(self.__queue.put_nowait, (time.monotonic() + self.server.latency, data))
+
+    def push(self, command: str, params: SFSObject = None):
+        """
+        Sends an extension response the client did not ask for (a server event)
+        """
+        response = SFSObject()
+        response.putUtfString("c", command)
+        response.putSFSObject("p", params if params is not None else SFSObject())
+        self.send_packet(1, 12, response)
+
+    async def __send_loop(self):
+        while True:
+            due, data = await self.__queue.get()
+            if data is None:
+                break
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.__writer.write(data)
+            await self.__writer.drain()
+            if self.server.bandwidth:
+                await asyncio.sleep(len(data) / self.server.bandwidth)
+
+    async def close(self):
+        # Goes through the loop like send_packet, so packets queued before are still written
+        self.__loop.call_soon(self.__queue.put_nowait, (0, None))
+        await self.__sender
+        self.__writer.close()
+
+
+class SFSMockServer:
+    """
+    Local stand-in for an SFS2X server speaking the same framing and SFSObject encoding as SFSClient.
+    It answers handshakes (c=0, a=0) and logins (c=0, a=1) and passes extension requests (c=1, a=12) to the
+    handler registered for their command. A handler gets (session, params) and returns the response params,
+    a list of them for a chunked response (numChunks is set on every chunk) or None to answer nothing; it may be
+    a coroutine function. Unknown commands are answered with empty params.
+    latency (seconds) delays every packet sent to a client, bandwidth (bytes per second) limits each connection.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0, bandwidth: int = None,
+                 compression_threshold: int = None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.compression_threshold = compression_threshold
+        self.handlers = {}
+        self.login_handler = None
+        self.sessions = {}
+        self.__server = None
+        self.__session_ids = itertools.count(1)
+        self.__loop = None
+        self.__thread = None
+
+    def handler(self, command: str):
+        """
+        Decorator registering a handler for an extension command
+        """
+        def register(function):
+            self.handlers[command] = function
+            return function
+        return register
+
+    def broadcast(self, command: str, params: SFSObject = None):
+        for session in list(self.sessions.values()):
+            session.push(command, params)
+
+    async def start(self) -> int:
+        """
+        Starts listening, returns the bound port
+        """
+        self.__server = await asyncio.start_server(self.__serve, self.host, self.port)
+        self.port = self.__server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        self.__server.close()
+        for session in list(self.sessions.values()):
+            await session.close()
+        await self.__server.wait_closed()
+
+    def start_in_thread(self) -> int:
+        """
+        Runs the server on its own event loop in a daemon thread, for use with the blocking SFSClient.
+        Returns the bound port.
+        """
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__loop.run_forever, daemon=True)
+        self.__thread.start()
+        return asyncio.run_coroutine_threadsafe(self.start(), self.__loop).result()
+
+    def stop_thread(self):
+        asyncio.run_coroutine_threadsafe(self.stop(), self.__loop).result()
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join()
+        self.__loop.close()
+
+    async def __serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session = SFSMockSession(self, next(self.__session_ids), writer)
+        self.sessions[session.session_id] = session
+        # requests are decoded straight from the receive buffer of the framer, which grows for large ones
+        framer = SFSFramer(SFSObject.decompile, buffer_size=1 << 12, views=True)
+        try:
+            while True:
+                data = await reader.read(65536)
+                if data == b"":
+                    break
+                for packet in framer.feed(data):
+                    await self.__dispatch(session, packet)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            del self.sessions[session.session_id]
+            await session.close()
+
+    async def __dispatch(self, session: SFSMockSession, packet: SFSObject):
+        c, a, params = packet.get("c"), packet.get("a"), packet.get("p")
+        if c == 0 and a == 0:
+            response = SFSObject()
+            response.putUtfString("tk", f"{session.session_id:032x}")
+            response.putInt("ct", self.compression_threshold or 1024)
+            response.putInt("ms", 500000)
+            session.send_packet(0, 0, response)
+        elif c == 0 and a == 1:
+            session.zone, session.username = params.get("zn"), params.get("un")
+            response = SFSObject()
+            response.putUtfString("zn", session.zone)
+            response.putUtfString("un", session.username)
+            response.putShort("pi", 0)
+            response.putInt("id", session.session_id)
+            response.putShort("rs", 0)
+            if self.login_handler is not None:
+                login_params = await _call(self.login_handler, session, params.get("p"))
+                if login_params is not None:
+                    response.putSFSObject("p", login_params)
+            session.send_packet(0, 1, response)
+        elif c == 1 and a == 12:
+            command = params.get("c")
+            handler = self.handlers.get(command)
+            result = SFSObject() if handler is None else await _call(handler, session, params.get("p"))
+            if isinstance(result, list):
+                for chunk in result:
+                    chunk.putInt("numChunks", len(result))
+                    session.push(command, chunk)
+            elif result is not None:
+                session.push(command, result)
+
+
+async def _call(function, *args):
+    result = function(*args)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
@@ -1,26 +1,134 @@
 import io
 import json
 import socket
+import typing
+from collections.abc import MutableSequence
 
 from ... import sfs_types
 
 
+class SFSArrayView(MutableSequence):
+    """
+    Read-write view of an SFSArray in the old list of (type name, value) form,
+    nested objects and arrays are shown as their own views
+    """
+    __slots__ = ("__array",)
+
+    def __init__(self, sfs_array):
+        self.__array = sfs_array
+
+    def getArray(self):
+        return self.__array
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(len(self))[index]]
+        code, value = self.__array._getItem(index)
+        if code >= 17:
+            value = value.getValue()
+        return sfs_types.type_names[code], value
+
+    def __setitem__(self, index, item):
+        item_type, value = item
+        self.__array._set(index, sfs_types.type_codes[item_type], _wrap(item_type, value))
+
+    def __delitem__(self, index):
+        self.__array._delete(index)
+
+    def insert(self, index, item):
+        item_type, value = item
+        self.__array._insert(index, sfs_types.type_codes[item_type], _wrap(item_type, value))
+
+    def __len__(self):
+        return len(self.__array)
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, tuple, SFSArrayView)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def _wrap(item_type: str, value):
+    from ..SFSObject import SFSObject, SFSObjectView
+
+    if item_type == "sfs_object":
+        if isinstance(value, SFSObjectView):
+            return value.getObject()
+        if not isinstance(value, SFSObject):
+            return SFSObject("", value)
+    elif item_type == "sfs_array":
+        if isinstance(value, SFSArrayView):
+            return value.getArray()
+        if not isinstance(value, SFSArray):
+            return SFSArray("", value)
+    return value
+
+
 class SFSArray:
+    """
+    Items are kept as a list of values plus a bytearray of wire type codes in the same order,
+    getValue() exposes them in the list of (type name, value) form through SFSArrayView
+    """
+    __slots__ = ("__name", "__values", "__codes")
+
     def __init__(self, name: str = None, value=None):
-        if value is None:
-            value = []
         if name is None:
             name = ""
 
-        self.__type = "sfs_array"
         self.__name = name
-        self.__value = value
+        if isinstance(value, SFSArrayView):
+            value = value.getArray()
+        if isinstance(value, SFSArray):
+            # Shares the items of the other array like the old shared list did
+            self.__values, self.__codes = value._storage()
+        else:
+            self.__values = []
+            self.__codes = bytearray()
+            if value is not None:
+                view = SFSArrayView(self)
+                for item in value:
+                    view.append(item)
+
+    @classmethod
+    def _fromStorage(cls, name: str, values: list, codes: bytearray):
+        sfsArray = cls.__new__(cls)
+        sfsArray.__name = name
+        sfsArray.__values = values
+        sfsArray.__codes = codes
+        return sfsArray
+
+    def _storage(self) -> (list, bytearray):
+        return self.__values, self.__codes
+
+    def _getItem(self, index: int) -> (int, typing.Any):
+        return self.__codes[index], self.__values[index]
 
-        self.__iter = 0
+    def _set(self, index: int, code: int, value):
+        self.__values[index] = value
+        self.__codes[index] = code
+
+    def _insert(self, index, code: int, value):
+        if index is None:
+            self.__values.append(value)
+            self.__codes.append(code)
+        else:
+            self.__values.insert(index, value)
+            self.__codes.insert(index, code)
+
+    def _delete(self, index: int):
+        del self.__values[index]
+        del self.__codes[index]
+
+    def _items(self):
+        return zip(self.__codes, self.__values)
 
     def __str__(self):
         result = f"(sfs_array) {self.getName()}:\n"
-        for item_type, item_value in self.getValue():
+        for code, item_value in self._items():
+            item_type = sfs_types.type_names[code]
             if item_type == "sfs_array":
                 result += "\n".join(["    " + line for line in str(SFSArray("", item_value)).split("\n")])
             elif item_type == "sfs_object":
@@ -30,7 +138,7 @@ class SFSArray:
         return result
 
     def __len__(self):
-        return len(self.getValue())
+        return len(self.__values)
 
     def __iter__(self):
         for _ in range(len(self)):
@@ -44,7 +152,15 @@ class SFSArray:
         return self.__name
 
     def getValue(self):
-        return self.__value
+        return SFSArrayView(self)
+
+    def freeze(self):
+        """
+        Returns an immutable FrozenSFSArray snapshot with cached compiled bytes, hash and equality
+        """
+        from ..frozen import FrozenSFSArray
+
+        return FrozenSFSArray.fromArray(self)
 
     def compileName(self) -> bytes:
         if self.__name != "":
@@ -65,259 +181,155 @@ class SFSArray:
         return name.decode('utf8')
 
     def compile(self) -> bytes:
-        array = int(len(self.getValue())).to_bytes(2, "big")
-        for item in self.getValue():
-            item_type = item[0]
-            item_value = item[1]
+        buffer = bytearray()
+        self.compile_into(buffer)
+        return bytes(buffer)
 
-            if item_type in sfs_types.types:
-                array += sfs_types.types[item_type]("", item_value).compile()
+    def compile_into(self, buffer: bytearray) -> int:
+        from ..encoder import compile_into
 
-        return bytes([17]) + self.compileName() + array
+        return compile_into(buffer, "sfs_array", self, self.getName())
 
     @staticmethod
-    def decompile(_bytes: bytes, decompile_name: bool = False, _step2: bool = False):
-        if decompile_name:
-            name, other = SFSArray.decompileName(_bytes)
-            sfsObject = SFSArray(name)
+    def decompile(_bytes: bytes, decompile_name: bool = False, _step2: bool = False, numpy_arrays: bool = False,
+                  lazy: bool = False, only: list = None):
+        if lazy:
+            from ..lazy import decompile_lazy_array
+
+            sfsObject, offset = decompile_lazy_array(_bytes, 0, decompile_name, not _step2, numpy_arrays)
         else:
-            name, other = "", _bytes
-            sfsObject = SFSArray()
-
-        if not _step2:
-            other = other[1:]
-
-        length, other = int.from_bytes(other[0:2], 'big'), other[2:]
-        for _ in range(length):
-            typex, other = int.from_bytes(other[:1], 'big'), other[1:]
-            if typex > 18:
-                continue
-            if typex == 18:
-                item, other = sfs_types.SFSObject.decompile(other, False, True)
-            elif typex == 17:
-                item, other = SFSArray.decompile(other, False, True)
-            else:
-                item, other = list(sfs_types.types.values())[typex].decompile(other, False)
-            sfsObject.getValue().append((list(sfs_types.types.keys())[typex], item.getValue()))
+            from ..decoder import decompile_array
+
+            sfsObject, offset = decompile_array(_bytes, 0, decompile_name, not _step2, numpy_arrays, only, _step2)
 
-        if _step2: return sfsObject, other
+        if _step2: return sfsObject, _bytes[offset:]
         return sfsObject
 
     @staticmethod
-    def decompile_conn(_conn: io.BytesIO, decompile_name: bool = False, _step2: bool = False):
-        if decompile_name:
-            name = SFSArray.decompileName_conn(_conn)
-            sfsObject = SFSArray(name)
+    def decompile_conn(_conn: io.BytesIO, decompile_name: bool = False, _step2: bool = False,
+                       numpy_arrays: bool = False):
+        from ..decoder import decompile_array
+
+        if numpy_arrays:
+            # NumPy views have to outlive the call, so they are built over an immutable copy of the buffer
+            sfsObject, offset = decompile_array(_conn.getvalue(), _conn.tell(), decompile_name, not _step2, True)
         else:
-            name = ""
-            sfsObject = SFSArray()
-
-        if not _step2:
-            _conn.read(1)
-
-        length = int.from_bytes(_conn.read(2), 'big')
-        for _ in range(length):
-            typex = int.from_bytes(_conn.read(1), 'big')
-            if typex > 18:
-                continue
-            if typex == 18:
-                item = sfs_types.SFSObject.decompile_conn(_conn, False, True)
-            elif typex == 17:
-                item = SFSArray.decompile_conn(_conn, False, True)
-            else:
-                item = list(sfs_types.types.values())[typex].decompile_conn(_conn, False)
-            sfsObject.getValue().append((list(sfs_types.types.keys())[typex], item.getValue()))
+            with _conn.getbuffer() as buffer:
+                sfsObject, offset = decompile_array(buffer, _conn.tell(), decompile_name, not _step2)
+        _conn.seek(offset)
 
-        if _step2: return sfsObject
         return sfsObject
 
-    def add(self, value, index: int = None):
-        from ..SFSObject import SFSObject
-        if value is None:
-            self.addNull(index)
-        if type(value) in (int, bytes):
-            if type(value) is int:
-                value = bytes([value])
-
-            if len(value) == 1:
-                self.addByte(value, index)
-            elif len(value) == 2:
-                self.addShort(value, index)
-            elif len(value) == 4:
-                self.addInt(value, index)
-            elif len(value) == 8:
-                self.addLong(value, index)
-            elif len(value) == 9:
-                self.addDouble(value, index)
-        elif type(value) is dict:
-            self.addSFSObject(SFSObject.initFromPythonObject(value), index)
-        elif type(value) is list:
-            if len(value) > 0:
-                if type(value[0]) is bool:
-                    self.addBoolArray(value, index)
-                elif type(value[0]) is float:
-                    self.addDoubleArray(value, index)
-                elif type(value[0]) is str:
-                    self.addUtfStringArray(value, index)
-                elif type(value[0]) is dict:
-                    self.addSFSArray(value, index)
-                elif type(value[0]) is int:
-                    v = bytes([value[0]])
-                    if len(v) == 1:
-                        self.addByteArray(value, index)
-                    else:
-                        self.addInt(value, index)
-        elif type(value) is str:
-            self.addUtfString(value, index)
-        elif type(value) is bool:
-            self.addBool(value, index)
-        elif type(value) is bytearray:
-            self.addByteArray(value, index)
+    def add(self, value, index: int = None, hint=None):
+        """
+        Stores a plain Python value with an inferred type (see convert.from_python), hint overrides it
+        """
+        from ..convert import infer
+
+        self._insert(index, *infer(value, hint))
 
     def addNull(self, index: int = None):
-        if index is None:
-            self.getValue().append(("bool", None))
-        else:
-            self.getValue().insert(index, ("bool", None))
+        self._insert(index, 0, None)
 
     def addBool(self, value: bool, index: int = None):
-        if index is None:
-            self.getValue().append(("bool", value))
-        else:
-            self.getValue().insert(index, ("bool", value))
+        self._insert(index, 1, value)
 
     def addByte(self, value: int, index: int = None):
-        if index is None:
-            self.getValue().append(("byte", value))
-        else:
-            self.getValue().insert(index, ("byte", value))
+        self._insert(index, 2, value)
 
     def addShort(self, value: int, index: int = None):
-        if index is None:
-            self.getValue().append(("short", value))
-        else:
-            self.getValue().insert(index, ("short", value))
+        self._insert(index, 3, value)
 
     def addInt(self, value: int, index: int = None):
-        if index is None:
-            self.getValue().append(("int", value))
-        else:
-            self.getValue().insert(index, ("int", value))
+        self._insert(index, 4, value)
 
     def addLong(self, value: int, index: int = None):
-        if index is None:
-            self.getValue().append(("long", value))
-        else:
-            self.getValue().insert(index, ("long", value))
+        self._insert(index, 5, value)
 
     def addFloat(self, value: float, index: int = None):
-        if index is None:
-            self.getValue().append(("float", value))
-        else:
-            self.getValue().insert(index, ("float", value))
+        self._insert(index, 6, value)
 
     def addDouble(self, value: float, index: int = None):
-        if index is None:
-            self.getValue().append(("double", value))
-        else:
-            self.getValue().insert(index, ("double", value))
+        self._insert(index, 7, value)
 
     def addUtfString(self, value: str, index: int = None):
-        if index is None:
-            self.getValue().append(("utf_string", value))
-        else:
-            self.getValue().insert(index, ("utf_string", value))
+        self._insert(index, 8, value)
 
     def addBoolArray(self, value: list, index: int = None):
-        if index is None:
-            self.getValue().append(("bool_array", value))
-        else:
-            self.getValue().insert(index, ("bool_array", value))
+        self._insert(index, 9, value)
 
     def addByteArray(self, value: bytearray, index: int = None):
-        if index is None:
-            self.getValue().append(("byte_array", value))
-        else:
-            self.getValue().insert(index, ("byte_array", value))
+        self._insert(index, 10, value)
 
     def addShortArray(self, value: list, index: int = None):
-        if index is None:
-            self.getValue().append(("short_array", value))
-        else:
-            self.getValue().insert(index, ("short_array", value))
+        self._insert(index, 11, value)
 
     def addIntArray(self, value: list, index: int = None):
-        if index is None:
-            self.getValue().append(("int_array", value))
-        else:
-            self.getValue().insert(index, ("int_array", value))
+        self._insert(index, 12, value)
 
     def addLongArray(self, value: list, index: int = None):
-        if index is None:
-            self.getValue().append(("long_array", value))
-        else:
-            self.getValue().insert(index, ("long_array", value))
+        self._insert(index, 13, value)
 
     def addFloatArray(self, value: list, index: int = None):
-        if index is None:
-            self.getValue().append(("float_array", value))
-        else:
-            self.getValue().insert(index, ("float_array", value))
+        self._insert(index, 14, value)
 
     def addDoubleArray(self, value: list, index: int = None):
-        if index is None:
-            self.getValue().append(("double_array", value))
-        else:
-            self.getValue().insert(index, ("double_array", value))
+        self._insert(index, 15, value)
 
     def addUtfStringArray(self, value: list, index: int = None):
-        if index is None:
-            self.getValue().append(("utf_string_array", value))
-        else:
-            self.getValue().insert(index, ("utf_string_array", value))
+        self._insert(index, 16, value)
 
     def addSFSArray(self, value, index: int = None):
-        if index is None:
-            self.getValue().append(("sfs_array", value))
-        else:
-            self.getValue().insert(index, ("sfs_array", value))
+        self._insert(index, 17, _wrap("sfs_array", value))
 
     def addSFSObject(self, value, index: int = None):
-        if index is None:
-            self.getValue().append(("sfs_object", value.getValue()))
-        else:
-            self.getValue().insert(index, ("sfs_object", value.getValue()))
+        self._insert(index, 18, _wrap("sfs_object", value))
 
     def get(self, index: int):
-        if self.getValue()[index][0] in ("sfs_object", "sfs_array"):
-            return sfs_types.types[self.getValue()[index][0]]("", self.getValue()[index][1])
-        return self.getValue()[index][1]
+        return self.__values[index]
 
     @staticmethod
-    def initFromPythonObject(python_object: list):
-        sfsArray = SFSArray()
-        for value in python_object:
-            sfsArray.add(value)
+    def initFromPythonObject(python_object: list, hints: list = None):
+        from ..convert import from_python
 
-        return sfsArray
+        return from_python(python_object, hints)
 
     @staticmethod
-    def initWithJson(json_string: str):
-        python_object = json.loads(json_string)
-        sfsArray = SFSArray()
-        for value in python_object:
-            sfsArray.add(value)
+    def initWithJson(json_string: str, hints: list = None):
+        from ..convert import from_python
 
-        return sfsArray
+        return from_python(json.loads(json_string), hints)
 
-    def getJsonDump(self):
-        val = []
-        for item in self.getValue():
-            item = list(item)
-            if item[0] == "byte_array":
-                val.append(list(item[1]))
-            elif item[0] in ('sfs_object', 'sfs_array'):
-                item[1] = json.loads(sfs_types.types[item[0]]("", item[1]).getJsonDump())
-            else:
-                val.append(item[1])
-        return json.dumps(val, ensure_ascii=False)
+    def toPython(self) -> list:
+        """
+        Returns the content as plain Python values, see convert.to_python
+        """
+        from ..convert import to_python
+
+        return to_python(self)
+
+    @staticmethod
+    def fromPython(python_value: list) -> "SFSArray":
+        """
+        Builds an SFSArray from plain Python values, see convert.from_python
+        """
+        from ..convert import from_python
+
+        return from_python(python_value)
+
+    def getJsonDump(self, indent=None, fast: bool = False):
+        """
+        JSON text of toPython(), fast uses orjson when it is installed, see convert.dumps
+        """
+        from ..convert import dumps
+
+        return dumps(self, indent, fast)
+
+    def writeJsonDump(self, file, ndjson: bool = False, path: str = None):
+        """
+        Writes the JSON of getJsonDump to a binary file-like object without building it in memory,
+        see export.dump_json
+        """
+        from ..export import dump_json
+
+        dump_json(self, file, ndjson, path)
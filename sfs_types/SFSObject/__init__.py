@@ -1,47 +1,189 @@
 import io
 import json
 import socket
+import typing
+from collections.abc import ItemsView, MutableMapping
 
 from ... import sfs_types
 from ...sfs_types import *
 
 
+class SFSObjectView(MutableMapping):
+    """
+    Read-write view of an SFSObject in the old key -> (type name, value) form,
+    nested objects and arrays are shown as their own views
+    """
+    __slots__ = ("__object",)
+
+    def __init__(self, sfs_object):
+        self.__object = sfs_object
+
+    def getObject(self):
+        return self.__object
+
+    def __getitem__(self, key):
+        code, value = self.__object._getItem(key)
+        if code >= 17:
+            value = value.getValue()
+        return sfs_types.type_names[code], value
+
+    def __setitem__(self, key, item):
+        item_type, value = item
+        self.__object._set(key, sfs_types.type_codes[item_type], _wrap(item_type, value))
+
+    def __delitem__(self, key):
+        self.__object._delete(key)
+
+    def __iter__(self):
+        return iter(self.__object)
+
+    def __len__(self):
+        return len(self.__object._storage()[1])
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def items(self):
+        return _SFSObjectItems(self)
+
+
+class _SFSObjectItems(ItemsView):
+    def __iter__(self):
+        for key, code, value in self._mapping.getObject()._items():
+            yield key, (sfs_types.type_names[code], value.getValue() if code >= 17 else value)
+
+
+def _wrap(item_type: str, value):
+    # Nested objects and arrays are stored as SFSObject / SFSArray instances
+    from ..SFSArray import SFSArray, SFSArrayView
+
+    if item_type == "sfs_object":
+        if isinstance(value, SFSObjectView):
+            return value.getObject()
+        if not isinstance(value, SFSObject):
+            return SFSObject("", value)
+    elif item_type == "sfs_array":
+        if isinstance(value, SFSArrayView):
+            return value.getArray()
+        if not isinstance(value, SFSArray):
+            return SFSArray("", value)
+    return value
+
+
 class SFSObject:
-    __type: str = "undefined"
-    __name: str
-    __value: typing.Any
+    """
+    Fields are kept as a key -> value dict plus a bytearray of wire type codes in the same order,
+    getValue() exposes them in the key -> (type name, value) form through SFSObjectView.
+    The position of a key in the codes comes from a key -> position dict built on first use.
+    """
+    __slots__ = ("__name", "__values", "__codes", "__positions")
 
     def __init__(self, name: str = None, value=None):
-        if value is None:
-            value = {}
         if name is None:
             name = ""
 
-        self.__type = "sfs_object"
         self.__name = name
-        self.__value = value
+        if isinstance(value, SFSObjectView):
+            value = value.getObject()
+        if isinstance(value, SFSObject):
+            # Shares the fields of the other object like the old shared dict did
+            self.__values, self.__codes = value._storage()
+            self.__positions = value._positions()
+        else:
+            self.__values = {}
+            self.__codes = bytearray()
+            self.__positions = None
+            if value is not None:
+                view = SFSObjectView(self)
+                for key, item in value.items():
+                    view[key] = item
+
+    @classmethod
+    def _fromStorage(cls, name: str, values: dict, codes: bytearray):
+        sfsObject = cls.__new__(cls)
+        sfsObject.__name = name
+        sfsObject.__values = values
+        sfsObject.__codes = codes
+        sfsObject.__positions = None
+        return sfsObject
 
-    def __str__(self):
-        from ..SFSArray import SFSArray
+    def _storage(self) -> (dict, bytearray):
+        return self.__values, self.__codes
+
+    def _positions(self) -> dict:
+        # Shared with the objects sharing the storage, so that a delete through any of them invalidates it for all
+        if self.__positions is None:
+            self.__positions = {}
+        return self.__positions
+
+    def __position(self, key: str) -> int:
+        positions = self._positions()
+        position = positions.get(key)
+        if position is None:
+            # (Re)built after a delete moved the fields behind it, KeyError for a missing key
+            positions.clear()
+            positions.update(zip(self.__values, range(len(self.__codes))))
+            position = positions[key]
+        return position
+
+    def _getItem(self, key: str) -> (int, typing.Any):
+        value = self.__values[key]
+        return self.__codes[self.__position(key)], value
+
+    def _set(self, key: str, code: int, value):
+        values = self.__values
+        if key in values:
+            self.__codes[self.__position(key)] = code
+        else:
+            if self.__positions:
+                self.__positions[key] = len(self.__codes)
+            self.__codes.append(code)
+        values[key] = value
+
+    def _delete(self, key: str):
+        position = self.__position(key)
+        del self.__codes[position]
+        del self.__values[key]
+        if position == len(self.__codes):
+            del self.__positions[key]
+        else:
+            self.__positions.clear()
+
+    def _items(self):
+        return zip(self.__values.keys(), self.__codes, self.__values.values())
 
+    def __str__(self):
         result = f"(sfs_object) {self.getName()}:\n"
-        for item_name, value in self.getValue().items():
-            item_type = value[0]
-            item_value = value[1]
+        for item_name, code, item_value in self._items():
+            item_type = sfs_types.type_names[code]
 
             if item_type == "sfs_array":
-                result += "\n".join(["    " + line for line in str(SFSArray(item_name, item_value)).split("\n")])
+                result += "\n".join(["    " + line for line in str(sfs_types.SFSArray(item_name, item_value)).split("\n")])
             elif item_type == "sfs_object":
                 result += "\n".join(["    " + line for line in str(SFSObject(item_name, item_value)).split("\n")])[:-4]
             else:
                 result += f"    {sfs_types.types[item_type](item_name, item_value)}\n"
         return result
 
+    def __iter__(self):
+        return iter(self.__values)
+
+    def __contains__(self, key):
+        return key in self.__values
+
     def getName(self):
         return self.__name
 
     def getValue(self):
-        return self.__value
+        return SFSObjectView(self)
+
+    def freeze(self):
+        """
+        Returns an immutable FrozenSFSObject snapshot with cached compiled bytes, hash and equality
+        """
+        from ..frozen import FrozenSFSObject
+
+        return FrozenSFSObject.fromObject(self)
 
     def compileName(self) -> bytes:
         if self.__name != "":
@@ -71,226 +213,175 @@ class SFSObject:
         #     return "[name_err]"
 
     def compile(self) -> bytes:
-        sfs_object = len(self.getValue().keys()).to_bytes(2, "big")
-        for item_name, item_data in self.getValue().items():
-            item_type = item_data[0]
-            item_value = item_data[1]
+        buffer = bytearray()
+        self.compile_into(buffer)
+        return bytes(buffer)
 
-            if item_type in sfs_types.types:
-                obj = sfs_types.types[item_type](item_name, item_value)
-                sfs_object += obj.compile()
+    def compile_into(self, buffer: bytearray) -> int:
+        from ..encoder import compile_into
 
-        return self.compileName() + bytes([18]) + sfs_object
+        return compile_into(buffer, "sfs_object", self, self.getName())
 
     @staticmethod
-    def decompile(_bytes: bytes, decompile_name: bool = False, _step2: bool = False):
-        if decompile_name:
-            name, other = SFSObject.decompileName(_bytes)
-            sfsObject = SFSObject(name)
+    def decompile(_bytes: bytes, decompile_name: bool = False, _step2: bool = False, numpy_arrays: bool = False,
+                  lazy: bool = False, only: list = None):
+        if lazy:
+            from ..lazy import decompile_lazy_object
+
+            sfsObject, offset = decompile_lazy_object(_bytes, 0, decompile_name, not _step2, numpy_arrays)
         else:
-            name, other = "", _bytes
-            sfsObject = SFSObject()
-
-        if not _step2:
-            other = other[1:]
-
-        length, other = int.from_bytes(other[0:2], 'big'), other[2:]
-        for _ in range(length):
-            key, other = SFSObject.decompileName(other)
-            typex, other = int.from_bytes(other[:1], 'big'), other[1:]
-            if typex > 18:
-                continue
-            if typex == 18:
-                item, other = SFSObject.decompile(other, False, True)
-            elif typex == 17:
-                item, other = SFSArray.decompile(other, False, True)
-            else:
-                item, other = list(sfs_types.types.values())[typex].decompile(other, False)
-            sfsObject.getValue()[key] = (list(sfs_types.types.keys())[typex], item.getValue())
+            from ..decoder import decompile_object
+
+            sfsObject, offset = decompile_object(_bytes, 0, decompile_name, not _step2, numpy_arrays, only, _step2)
 
-        if _step2: return sfsObject, other
+        if _step2: return sfsObject, _bytes[offset:]
         return sfsObject
 
     @staticmethod
-    def decompile_conn(_conn: io.BytesIO, decompile_name: bool = False, _step2: bool = False):
-        if decompile_name:
-            name = SFSObject.decompileName_conn(_conn)
-            sfsObject = SFSObject(name)
+    def decompile_conn(_conn: io.BytesIO, decompile_name: bool = False, _step2: bool = False,
+                       numpy_arrays: bool = False):
+        from ..decoder import decompile_object
+
+        if numpy_arrays:
+            # NumPy views have to outlive the call, so they are built over an immutable copy of the buffer
+            sfsObject, offset = decompile_object(_conn.getvalue(), _conn.tell(), decompile_name, not _step2, True)
         else:
-            name = ""
-            sfsObject = SFSObject()
-
-        if not _step2:
-            _conn.read(1)
-
-        length = int.from_bytes(_conn.read(2), 'big')
-        for _ in range(length):
-            key = SFSObject.decompileName_conn(_conn)
-            typex = int.from_bytes(_conn.read(1), 'big')
-            if typex > 18:
-                continue
-            if typex == 18:
-                item = SFSObject.decompile_conn(_conn, False, True)
-            elif typex == 17:
-                item = SFSArray.decompile_conn(_conn, False, True)
-            else:
-                item = list(sfs_types.types.values())[typex].decompile_conn(_conn, False)
-            sfsObject.getValue()[key] = (list(sfs_types.types.keys())[typex], item.getValue())
+            with _conn.getbuffer() as buffer:
+                sfsObject, offset = decompile_object(buffer, _conn.tell(), decompile_name, not _step2)
+        _conn.seek(offset)
 
-        if _step2: return sfsObject
         return sfsObject
 
-    def put(self, key: str, value):
-        if value is None:
-            self.putNull(key)
-        elif type(value) in (int, bytes):
-            if type(value) is int:
-                value = bytes([value])
-
-            if len(value) == 1:
-                self.putByte(key, value)
-            elif len(value) == 2:
-                self.putShort(key, value)
-            elif len(value) == 4:
-                self.putInt(key, value)
-            elif len(value) == 8:
-                self.putLong(key, value)
-            elif len(value) == 9:
-                self.putDouble(key, value)
-        elif type(value) is dict:
-            self.putSFSObject(SFSObject.initFromPythonObject(value))
-        elif type(value) is list:
-            if len(value) > 0:
-                if type(value[0]) is dict:
-                    self.putSFSArray(key, value)
-                elif type(value[0]) is float:
-                    self.putDoubleArray(key, value)
-                elif type(value[0]) is bool:
-                    self.putBoolArray(key, value)
-                elif type(value[0]) is str:
-                    self.putUtfStringArray(key, value)
-                elif type(value[0]) is int:
-                    v = bytes([value[0]])
-                    if len(v) == 1:
-                        self.putByteArray(key, value)
-                    else:
-                        self.putInt(key, value)
-        elif type(value) is str:
-            self.putUtfString(key, value)
-        elif type(value) is bool:
-            self.putBool(key, value)
-        elif type(value) is bytearray:
-            self.putByteArray(key, value)
+    def put(self, key: str, value, hint=None):
+        """
+        Stores a plain Python value with an inferred type (see convert.from_python), hint overrides it
+        """
+        from ..convert import infer
+
+        self._set(key, *infer(value, hint))
+        return self
 
     def putNull(self, key: str):
-        self.getValue()[key] = ("null", None)
+        self._set(key, 0, None)
         return self
 
     def putBool(self, key: str, value: bool):
-        self.getValue()[key] = ("bool", value)
+        self._set(key, 1, value)
         return self
 
     def putByte(self, key: str, value: int):
-        self.getValue()[key] = ("byte", value)
+        self._set(key, 2, value)
         return self
 
     def putShort(self, key: str, value: int):
-        self.getValue()[key] = ("short", value)
+        self._set(key, 3, value)
         return self
 
     def putInt(self, key: str, value: int):
-        self.getValue()[key] = ("int", value)
+        self._set(key, 4, value)
         return self
 
     def putLong(self, key: str, value: int):
-        self.getValue()[key] = ("long", value)
+        self._set(key, 5, value)
         return self
 
     def putFloat(self, key: str, value: float):
-        self.getValue()[key] = ("float", value)
+        self._set(key, 6, value)
         return self
 
     def putDouble(self, key: str, value: float):
-        self.getValue()[key] = ("double", value)
+        self._set(key, 7, value)
         return self
 
     def putUtfString(self, key: str, value: str):
-        self.getValue()[key] = ("utf_string", value)
+        self._set(key, 8, value)
         return self
 
     def putBoolArray(self, key: str, value: list):
-        self.getValue()[key] = ("bool_array", value)
+        self._set(key, 9, value)
         return self
 
     def putByteArray(self, key: str, value: bytearray):
-        self.getValue()[key] = ("byte_array", value)
+        self._set(key, 10, value)
         return self
 
     def putIntArray(self, key: str, value: list):
-        self.getValue()[key] = ("int_array", value)
+        self._set(key, 12, value)
         return self
 
     def putShortArray(self, key: str, value: list):
-        self.getValue()[key] = ("short_array", value)
+        self._set(key, 11, value)
         return self
 
     def putLongArray(self, key: str, value: list):
-        self.getValue()[key] = ("long_array", value)
+        self._set(key, 13, value)
         return self
 
     def putFloatArray(self, key: str, value: list):
-        self.getValue()[key] = ("float_array", value)
+        self._set(key, 14, value)
         return self
 
     def putDoubleArray(self, key: str, value: list):
-        self.getValue()[key] = ("double_array", value)
+        self._set(key, 15, value)
         return self
 
     def putUtfStringArray(self, key: str, value: list):
-        self.getValue()[key] = ("utf_string_array", value)
+        self._set(key, 16, value)
         return self
 
     def putSFSArray(self, key: str, value):
-        self.getValue()[key] = ("sfs_array", value.getValue())
+        self._set(key, 17, _wrap("sfs_array", value))
         return self
 
     def putSFSObject(self, key: str, value):
-        self.getValue()[key] = ("sfs_object", value.getValue())
+        self._set(key, 18, _wrap("sfs_object", value))
         return self
 
     def get(self, key: str):
-        try:
-            if self.getValue()[key][0] in ("sfs_object", "sfs_array"):
-                return sfs_types.types[self.getValue()[key][0]](key, self.getValue()[key][1])
-            else:
-                return self.getValue()[key][1]
-        except:
-            return None
+        return self.__values.get(key)
 
     @staticmethod
-    def initFromPythonObject(python_object: dict):
-        sfsObject = SFSObject()
-        for key, value in python_object.items():
-            sfsObject.put(key, value)
+    def initFromPythonObject(python_object: dict, hints: dict = None):
+        from ..convert import from_python
 
-        return sfsObject
+        return from_python(python_object, hints)
 
     @staticmethod
-    def initWithJson(json_string: str):
-        python_object = json.loads(json_string)
-        sfsObject = SFSObject()
-        for key, value in python_object.items():
-            sfsObject.put(key, value)
+    def initWithJson(json_string: str, hints: dict = None):
+        from ..convert import from_python
 
-        return sfsObject
+        return from_python(json.loads(json_string), hints)
+
+    def toPython(self) -> dict:
+        """
+        Returns the content as plain Python values, see convert.to_python
+        """
+        from ..convert import to_python
 
-    def getJsonDump(self, indent=None):
-        val = {}
-        for key, item in self.getValue().items():
-            item = list(item)
-            if item[0] == 'byte_array':
-                item[1] = list(item[1])
-            if item[0] in ('sfs_object', 'sfs_array'):
-                item[1] = json.loads(sfs_types.types[item[0]](key, item[1]).getJsonDump())
-            val[key] = item[1]
-        return json.dumps(val, ensure_ascii=False, indent=indent)
+        return to_python(self)
+
+    @staticmethod
+    def fromPython(python_value: dict) -> "SFSObject":
+        """
+        Builds an SFSObject from plain Python values, see convert.from_python
+        """
+        from ..convert import from_python
+
+        return from_python(python_value)
+
+    def getJsonDump(self, indent=None, fast: bool = False):
+        """
+        JSON text of toPython(), fast uses orjson when it is installed, see convert.dumps
+        """
+        from ..convert import dumps
+
+        return dumps(self, indent, fast)
+
+    def writeJsonDump(self, file, ndjson: bool = False, path: str = None):
+        """
+        Writes the JSON of getJsonDump to a binary file-like object without building it in memory,
+        see export.dump_json
+        """
+        from ..export import dump_json
+
+        dump_json(self, file, ndjson, path)
@@ -1,12 +1,49 @@
+import array
 import io
 import socket
 import struct
+import sys
 import typing
 
 from pyfox2x.sfs_types.SFSArray import SFSArray
 from pyfox2x.sfs_types.SFSObject import SFSObject
 
 
+_array_item_sizes = {"h": 2, "i": 4, "q": 8, "f": 4, "d": 8}
+# array.array is used for bulk conversion only where its item size matches the wire size
+_native_array_codes = {code for code, size in _array_item_sizes.items() if array.array(code).itemsize == size}
+_swap_bytes = sys.byteorder == "little"
+
+
+def unpack_array(code: str, data, offset: int, length: int) -> list:
+    """
+    Decodes length big-endian numbers of the struct format code (h, i, q, f or d) from data[offset:] in one call
+    """
+    end = offset + length * _array_item_sizes[code]
+    if code not in _native_array_codes:
+        return list(struct.unpack_from(f">{length}{code}", data, offset))
+    values = array.array(code)
+    values.frombytes(memoryview(data)[offset:end])
+    if _swap_bytes:
+        values.byteswap()
+    return values.tolist()
+
+
+def pack_array(code: str, values) -> bytes:
+    """
+    Encodes a sequence of numbers as big-endian values of the struct format code in one call
+    """
+    if getattr(values, "dtype", None) is not None:
+        # NumPy arrays are converted to the wire dtype and dumped with a single tobytes()
+        return values.astype(">" + code, copy=False).tobytes()
+    if code not in _native_array_codes:
+        return struct.pack(f">{len(values)}{code}", *values)
+    packed = array.array(code, values)
+    if _swap_bytes:
+        packed.byteswap()
+    return packed.tobytes()
+
+
 class BaseType:
     __type: str = "undefined"
     __name: str
@@ -267,10 +304,8 @@ class BoolArray(BaseType):
         super().__init__("bool_array", name, value)
 
     def compile(self) -> bytes:
-        result = super().compileName() + bytes([9]) + int(len(super().getValue()) - 1).to_bytes(2, "big")
-        for byte in super().getValue():
-            result += bytes([byte])
-        return result
+        return super().compileName() + bytes([9]) + len(super().getValue()).to_bytes(2, "big") + \
+            bytes(map(bool, super().getValue()))
 
     @staticmethod
     def decompile(_bytes: bytes, decompile_name: bool = True):
@@ -279,12 +314,8 @@ class BoolArray(BaseType):
         else:
             name, other = "", _bytes
 
-        length, other = int.from_bytes(other[:2], 'big'), other[2:]
-        array = []
-        for _ in range(length):
-            array.append(bool.from_bytes(other[:1], "big"))
-            other = other[1:]
-        return BoolArray(name, array), other
+        length = int.from_bytes(other[:2], 'big')
+        return BoolArray(name, list(map(bool, other[2:length + 2]))), other[length + 2:]
 
     @staticmethod
     def decompile_conn(_conn: io.BytesIO, decompile_name: bool = True):
@@ -294,10 +325,7 @@ class BoolArray(BaseType):
             name = ""
 
         length = int.from_bytes(_conn.read(2), 'big')
-        array = []
-        for _ in range(length):
-            array.append(bool.from_bytes(_conn.read(1), "big"))
-        return BoolArray(name, array)
+        return BoolArray(name, list(map(bool, _conn.read(length))))
 
 
 class ByteArray(BaseType):
@@ -305,10 +333,8 @@ class ByteArray(BaseType):
         super().__init__("byte_array", name, value)
 
     def compile(self) -> bytes:
-        result = super().compileName() + bytes([10]) + int(len(super().getValue()) - 1).to_bytes(4, "big")
-        for byte in super().getValue():
-            result += bytes([byte])
-        return result
+        return super().compileName() + bytes([10]) + len(super().getValue()).to_bytes(4, "big") + \
+            bytes(super().getValue())
 
     @staticmethod
     def decompile(_bytes: bytes, decompile_name: bool = True):
@@ -317,12 +343,8 @@ class ByteArray(BaseType):
         else:
             name, other = "", _bytes
 
-        length, other = int.from_bytes(other[:4], 'big'), other[4:]
-        array = bytearray()
-        for _ in range(length):
-            array += other[:1]
-            other = other[1:]
-        return ByteArray(name, array), other
+        length = int.from_bytes(other[:4], 'big')
+        return ByteArray(name, bytearray(other[4:length + 4])), other[length + 4:]
 
     @staticmethod
     def decompile_conn(_conn: io.BytesIO, decompile_name: bool = True):
@@ -332,10 +354,7 @@ class ByteArray(BaseType):
             name = ""
 
         length = int.from_bytes(_conn.read(4), 'big')
-        array = bytearray()
-        for _ in range(length):
-            array += _conn.read(1)
-        return ByteArray(name, array)
+        return ByteArray(name, bytearray(_conn.read(length)))
 
 
 class ShortArray(BaseType):
@@ -343,10 +362,8 @@ class ShortArray(BaseType):
         super().__init__("short_array", name, value)
 
     def compile(self) -> bytes:
-        result = super().compileName() + bytes([11]) + int(len(super().getValue()) - 1).to_bytes(2, "big")
-        for byte in super().getValue():
-            result += byte.to_bytes(2, "big", signed=True)
-        return result
+        return super().compileName() + bytes([11]) + len(super().getValue()).to_bytes(2, "big") + \
+            pack_array("h", super().getValue())
 
     @staticmethod
     def decompile(_bytes: bytes, decompile_name: bool = True):
@@ -355,12 +372,8 @@ class ShortArray(BaseType):
         else:
             name, other = "", _bytes
 
-        length, other = int.from_bytes(other[:2], 'big'), other[2:]
-        array = []
-        for _ in range(length):
-            array.append(int.from_bytes(other[:2], 'big', signed=True))
-            other = other[2:]
-        return ShortArray(name, array), other
+        length = int.from_bytes(other[:2], 'big')
+        return ShortArray(name, unpack_array("h", other, 2, length)), other[2 + length * 2:]
 
     @staticmethod
     def decompile_conn(_conn: io.BytesIO, decompile_name: bool = True):
@@ -370,10 +383,7 @@ class ShortArray(BaseType):
             name = ""
 
         length = int.from_bytes(_conn.read(2), 'big')
-        array = []
-        for _ in range(length):
-            array.append(int.from_bytes(_conn.read(2), 'big', signed=True))
-        return ShortArray(name, array)
+        return ShortArray(name, unpack_array("h", _conn.read(length * 2), 0, length))
 
 
 class IntArray(BaseType):
@@ -381,10 +391,8 @@ class IntArray(BaseType):
         super().__init__("int_array", name, value)
 
     def compile(self) -> bytes:
-        result = super().compileName() + bytes([12]) + int(len(super().getValue()) - 1).to_bytes(2, "big", signed=True)
-        for byte in super().getValue():
-            result += byte.to_bytes(4, "big", signed=True)
-        return result
+        return super().compileName() + bytes([12]) + len(super().getValue()).to_bytes(2, "big") + \
+            pack_array("i", super().getValue())
 
     @staticmethod
     def decompile(_bytes: bytes, decompile_name: bool = True):
@@ -393,12 +401,8 @@ class IntArray(BaseType):
         else:
             name, other = "", _bytes
 
-        length, other = int.from_bytes(other[:2], 'big'), other[2:]
-        array = []
-        for _ in range(length):
-            array.append(int.from_bytes(other[:4], 'big', signed=True))
-            other = other[4:]
-        return IntArray(name, array), other
+        length = int.from_bytes(other[:2], 'big')
+        return IntArray(name, unpack_array("i", other, 2, length)), other[2 + length * 4:]
 
     @staticmethod
     def decompile_conn(_conn: io.BytesIO, decompile_name: bool = True):
@@ -408,10 +412,7 @@ class IntArray(BaseType):
             name = ""
 
         length = int.from_bytes(_conn.read(2), 'big')
-        array = []
-        for _ in range(length):
-            array.append(int.from_bytes(_conn.read(4), 'big', signed=True))
-        return IntArray(name, array)
+        return IntArray(name, unpack_array("i", _conn.read(length * 4), 0, length))
 
 
 class LongArray(BaseType):
@@ -419,10 +420,8 @@ class LongArray(BaseType):
         super().__init__("long_array", name, value)
 
     def compile(self) -> bytes:
-        result = super().compileName() + bytes([13]) + int(len(super().getValue()) - 1).to_bytes(2, "big")
-        for byte in super().getValue():
-            result += byte.to_bytes(8, "big", signed=True)
-        return result
+        return super().compileName() + bytes([13]) + len(super().getValue()).to_bytes(2, "big") + \
+            pack_array("q", super().getValue())
 
     @staticmethod
     def decompile(_bytes: bytes, decompile_name: bool = True):
@@ -431,12 +430,8 @@ class LongArray(BaseType):
         else:
             name, other = "", _bytes
 
-        length, other = int.from_bytes(other[:2], 'big'), other[2:]
-        array = []
-        for _ in range(length):
-            array.append(int.from_bytes(other[:8], 'big', signed=True))
-            other = other[8:]
-        return LongArray(name, array), other
+        length = int.from_bytes(other[:2], 'big')
+        return LongArray(name, unpack_array("q", other, 2, length)), other[2 + length * 8:]
 
     @staticmethod
     def decompile_conn(_conn: io.BytesIO, decompile_name: bool = True):
@@ -446,10 +441,7 @@ class LongArray(BaseType):
             name = ""
 
         length = int.from_bytes(_conn.read(2), 'big')
-        array = []
-        for _ in range(length):
-            array.append(int.from_bytes(_conn.read(4), 'big', signed=True))
-        return LongArray(name, array)
+        return LongArray(name, unpack_array("q", _conn.read(length * 8), 0, length))
 
 
 class FloatArray(BaseType):
@@ -457,11 +449,8 @@ class FloatArray(BaseType):
         super().__init__("float_array", name, value)
 
     def compile(self) -> bytes:
-        result = super().compileName() + bytes([14]) + int(len(super().getValue()) - 1).to_bytes(2, "big")
-        for byte in super().getValue():
-            result += int.from_bytes(struct.pack("f", byte), "little", signed=True).to_bytes(
-                4, "big", signed=True)
-        return result
+        return super().compileName() + bytes([14]) + len(super().getValue()).to_bytes(2, "big") + \
+            pack_array("f", super().getValue())
 
     @staticmethod
     def decompile(_bytes: bytes, decompile_name: bool = True):
@@ -470,12 +459,8 @@ class FloatArray(BaseType):
         else:
             name, other = "", _bytes
 
-        length, other = int.from_bytes(other[:2], 'big'), other[2:]
-        array = []
-        for _ in range(length ):
-            array.append(round(struct.unpack('f', other[:4][::-1])[0], 6))
-            other = other[4:]
-        return FloatArray(name, array), other
+        length = int.from_bytes(other[:2], 'big')
+        return FloatArray(name, [round(item, 6) for item in unpack_array("f", other, 2, length)]), other[2 + length * 4:]
 
     @staticmethod
     def decompile_conn(_conn: io.BytesIO, decompile_name: bool = True):
@@ -485,10 +470,7 @@ class FloatArray(BaseType):
             name = ""
 
         length = int.from_bytes(_conn.read(2), 'big')
-        array = []
-        for _ in range(length ):
-            array.append(round(struct.unpack('f', _conn.read(4)[::-1])[0], 6))
-        return FloatArray(name, array)
+        return FloatArray(name, [round(item, 6) for item in unpack_array("f", _conn.read(length * 4), 0, length)])
 
 
 class DoubleArray(BaseType):
@@ -496,11 +478,8 @@ class DoubleArray(BaseType):
         super().__init__("double_array", name, value)
 
     def compile(self) -> bytes:
-        result = super().compileName() + bytes([15]) + int(len(super().getValue()) - 1).to_bytes(2, "big")
-        for byte in super().getValue():
-            result += int.from_bytes(struct.pack("d", byte), "little", signed=True).to_bytes(
-                8, "big", signed=True)
-        return result
+        return super().compileName() + bytes([15]) + len(super().getValue()).to_bytes(2, "big") + \
+            pack_array("d", super().getValue())
 
     @staticmethod
     def decompile(_bytes: bytes, decompile_name: bool = True):
@@ -509,12 +488,8 @@ class DoubleArray(BaseType):
         else:
             name, other = "", _bytes
 
-        length, other = int.from_bytes(other[:2], 'big'), other[2:]
-        array = []
-        for _ in range(length):
-            array.append(round(struct.unpack('d', other[:8][::-1])[0], 12))
-            other = other[8:]
-        return DoubleArray(name, array), other
+        length = int.from_bytes(other[:2], 'big')
+        return DoubleArray(name, [round(item, 12) for item in unpack_array("d", other, 2, length)]), other[2 + length * 8:]
 
     @staticmethod
     def decompile_conn(_conn: io.BytesIO, decompile_name: bool = True):
@@ -524,10 +499,7 @@ class DoubleArray(BaseType):
             name = ""
 
         length = int.from_bytes(_conn.read(2), 'big')
-        array = []
-        for _ in range(length):
-            array.append(round(struct.unpack('d', _conn.read(8)[::-1])[0], 12))
-        return DoubleArray(name, array)
+        return DoubleArray(name, [round(item, 12) for item in unpack_array("d", _conn.read(length * 8), 0, length)])
 
 
 class UtfStringArray(BaseType):
@@ -590,4 +562,8 @@ types = {
     "utf_string_array": UtfStringArray,
     "sfs_array": SFSArray,
     "sfs_object": SFSObject
-}
\ No newline at end of file
+}
+
+# Wire type codes are the positions of the type names in types
+type_names = tuple(types.keys())
+type_codes = {name: code for code, name in enumerate(type_names)}
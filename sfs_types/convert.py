@@ -0,0 +1,272 @@
+import collections
+import json
+
+from .SFSArray import SFSArray
+from .SFSObject import SFSObject
+from .decoder import TYPE_CODES, NULL, BOOL, BYTE, INT, LONG, DOUBLE, UTF_STRING, BOOL_ARRAY, BYTE_ARRAY, INT_ARRAY, \
+    LONG_ARRAY, DOUBLE_ARRAY, UTF_STRING_ARRAY, SFS_ARRAY, SFS_OBJECT
+
+try:
+    # pip install orjson
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _byte(value):
+    # put/addByte also accept 1-byte bytes objects
+    return value if type(value) is int else int.from_bytes(value, "big", signed=True)
+
+
+def _array(value) -> list:
+    return value.tolist() if hasattr(value, "tolist") else list(value)
+
+
+# Converters of the values that are not plain Python values already, indexed by type code
+_converters = {
+    BYTE: _byte,
+    BYTE_ARRAY: list,
+    SFS_ARRAY: lambda value: _array_to_python(value),
+    SFS_OBJECT: lambda value: _object_to_python(value),
+}
+for _code in range(UTF_STRING + 1, SFS_ARRAY):
+    _converters.setdefault(_code, _array)
+
+
+def _object_to_python(sfs_object) -> dict:
+    result = {}
+    for key, code, value in sfs_object._items():
+        if code in _converters:
+            value = _converters[code](value)
+        result[key] = value
+    return result
+
+
+def _array_to_python(sfs_array) -> list:
+    result = []
+    append = result.append
+    for code, value in sfs_array._items():
+        append(_converters[code](value) if code in _converters else value)
+    return result
+
+
+def to_python(value):
+    """
+    Converts an SFSObject to a dict or an SFSArray to a list in one walk over the tree.
+    Typed arrays become lists and bytes become signed ints, so the result can be passed to json.dumps as is.
+    """
+    if isinstance(value, SFSObject):
+        return _object_to_python(value)
+    return _array_to_python(value)
+
+
+_INT_MIN, _INT_MAX = -2 ** 31, 2 ** 31
+
+# Python types stored as they are with a fixed type code
+_fixed_codes = {type(None): NULL, bool: BOOL, float: DOUBLE, str: UTF_STRING}
+
+# Upper bound of cached plans, the least recently used plan is dropped beyond it
+PLAN_CACHE_SIZE = 1024
+# (keys, value types, hint key of the hints) -> (type codes, converters of the fields without a fixed code),
+# in least recently used order
+_plans = collections.OrderedDict()
+
+
+def _int(value) -> (int, int):
+    return (INT, value) if _INT_MIN <= value < _INT_MAX else (LONG, value)
+
+
+def _byte_array(value) -> (int, bytearray):
+    return BYTE_ARRAY, bytearray(value)
+
+
+def _list(value) -> (int, object):
+    item_types = set(map(type, value))
+    if len(item_types) == 1:
+        item_type = next(iter(item_types))
+        if item_type is bool:
+            return BOOL_ARRAY, list(value)
+        if item_type is int:
+            return (INT_ARRAY if all(_INT_MIN <= item < _INT_MAX for item in value) else LONG_ARRAY), list(value)
+        if item_type is float:
+            return DOUBLE_ARRAY, list(value)
+        if item_type is str:
+            return UTF_STRING_ARRAY, list(value)
+    elif item_types == {int, float}:
+        return DOUBLE_ARRAY, [float(item) for item in value]
+    # Empty, nested or mixed lists keep the type of every item
+    return SFS_ARRAY, _array_from_python(value, None)
+
+
+def _other(value) -> (int, object):
+    # Subclasses and containers of other libraries, the exact types above are looked up directly
+    if isinstance(value, SFSObject):
+        return SFS_OBJECT, value
+    if isinstance(value, SFSArray):
+        return SFS_ARRAY, value
+    if isinstance(value, bool):
+        return BOOL, bool(value)
+    if isinstance(value, int):
+        return _int(int(value))
+    if isinstance(value, float):
+        return DOUBLE, float(value)
+    if isinstance(value, str):
+        return UTF_STRING, str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return _byte_array(value)
+    if isinstance(value, dict):
+        return SFS_OBJECT, _object_from_python(value, None)
+    if hasattr(value, "tolist"):
+        # NumPy arrays and scalars
+        return _infer(value.tolist())
+    if isinstance(value, (list, tuple)):
+        return _list(value)
+    raise TypeError(f"Can not convert {type(value).__name__} to an SFS type")
+
+
+_converters_by_type = {
+    int: _int,
+    dict: lambda value: (SFS_OBJECT, _object_from_python(value, None)),
+    list: _list,
+    tuple: _list,
+    bytes: _byte_array,
+    bytearray: _byte_array,
+}
+
+
+def _infer(value) -> (int, object):
+    value_type = type(value)
+    if value_type in _fixed_codes:
+        return _fixed_codes[value_type], value
+    return _converters_by_type.get(value_type, _other)(value)
+
+
+_casts = {
+    "null": lambda value: None,
+    "bool": bool,
+    "byte": int,
+    "short": int,
+    "int": int,
+    "long": int,
+    "float": float,
+    "double": float,
+    "utf_string": str,
+    "bool_array": lambda value: list(map(bool, value)),
+    "byte_array": bytearray,
+    "short_array": lambda value: list(map(int, value)),
+    "int_array": lambda value: list(map(int, value)),
+    "long_array": lambda value: list(map(int, value)),
+    "float_array": lambda value: list(map(float, value)),
+    "double_array": lambda value: list(map(float, value)),
+    "utf_string_array": lambda value: list(map(str, value)),
+    "sfs_array": lambda value: value if isinstance(value, SFSArray) else _array_from_python(value, None),
+    "sfs_object": lambda value: value if isinstance(value, SFSObject) else _object_from_python(value, None),
+}
+
+
+def _hinted(hint):
+    """
+    Returns the converter of a type hint: a type name, a dict of hints for an sfs_object or a one-item list with
+    the hint of every item of an sfs_array (the field format of SFSSchema)
+    """
+    if isinstance(hint, dict):
+        return lambda value: (SFS_OBJECT, _object_from_python(value, hint))
+    if isinstance(hint, list):
+        return lambda value: (SFS_ARRAY, _array_from_python(value, hint[0] if hint else None))
+    if hint not in _casts:
+        raise ValueError(f"Unknown SFS type {hint!r}")
+    code, cast = TYPE_CODES[hint], _casts[hint]
+    return lambda value: (code, cast(value))
+
+
+def _hint_key(hint):
+    # Hashable content of a hint, equal hints given as separate dicts share their plans
+    if isinstance(hint, dict):
+        return "sfs_object", tuple((key, _hint_key(item)) for key, item in hint.items())
+    if isinstance(hint, list):
+        return "sfs_array", tuple(_hint_key(item) for item in hint)
+    return hint
+
+
+def _plan(keys: tuple, value_types: tuple, hints: dict) -> tuple:
+    codes = bytearray()
+    converters = []
+    for position, (key, value_type) in enumerate(zip(keys, value_types)):
+        hint = hints.get(key) if hints else None
+        if hint is None and value_type in _fixed_codes:
+            codes.append(_fixed_codes[value_type])
+            continue
+        codes.append(NULL)
+        if hint is not None:
+            converters.append((position, key, _hinted(hint)))
+        else:
+            converters.append((position, key, _converters_by_type.get(value_type, _other)))
+    return bytes(codes), tuple(converters)
+
+
+def _object_from_python(python_object: dict, hints: dict) -> SFSObject:
+    keys = tuple(python_object)
+    value_types = tuple(map(type, python_object.values()))
+    plan_key = (keys, value_types, None if hints is None else _hint_key(hints))
+    plan = _plans.get(plan_key)
+    if plan is None:
+        plan = _plans[plan_key] = _plan(keys, value_types, hints)
+        if len(_plans) > PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    else:
+        try:
+            _plans.move_to_end(plan_key)
+        except KeyError:
+            # dropped by another thread meanwhile, the plan itself is still valid
+            pass
+
+    plan_codes, converters = plan
+    values = dict(python_object)
+    codes = bytearray(plan_codes)
+    for position, key, convert in converters:
+        codes[position], values[key] = convert(values[key])
+    return SFSObject._fromStorage("", values, codes)
+
+
+def _array_from_python(python_list, hint) -> SFSArray:
+    convert = _infer if hint is None else _hinted(hint)
+    values = []
+    codes = bytearray()
+    for value in python_list:
+        code, value = convert(value)
+        values.append(value)
+        codes.append(code)
+    return SFSArray._fromStorage("", values, codes)
+
+
+def infer(value, hint=None) -> (int, object):
+    """
+    Returns the wire type code and the value to store for a plain Python value, see from_python
+    """
+    return _infer(value) if hint is None else _hinted(hint)(value)
+
+
+def from_python(value, hints=None):
+    """
+    Converts a dict to an SFSObject or a list to an SFSArray, the inverse of to_python.
+    Ints become int (long when they do not fit 32 bits), floats double, bytes byte_array, homogeneous lists
+    typed arrays and dicts / other lists sfs_object / sfs_array.
+    The conversion plan of a dict (its keys and value types) is cached, dicts of the same shape reuse it.
+    hints override the inferred types in the SFSSchema field format: {"id": "long", "pos": "float_array",
+    "player": {"coins": "long"}, "monsters": [{"level": "short"}]}, for a list [item hint].
+    """
+    if isinstance(value, dict):
+        return _object_from_python(value, hints)
+    return _array_from_python(value, hints[0] if hints else None)
+
+
+def dumps(value, indent: int = None, fast: bool = False) -> str:
+    """
+    JSON of to_python(value), the same text as json.dumps(..., ensure_ascii=False) and export.dump_json.
+    With fast it is made by orjson when it is installed and the indent is one it supports, which writes no spaces
+    after separators and NaN / Infinity as null, so the text depends on whether orjson is there.
+    """
+    python_value = to_python(value)
+    if fast and orjson is not None and indent in (None, 2):
+        return orjson.dumps(python_value, option=orjson.OPT_INDENT_2 if indent else 0).decode("utf-8")
+    return json.dumps(python_value, ensure_ascii=False, indent=indent)
@@ -0,0 +1,374 @@
+import struct
+
+from .. import sfs_types
+from .SFSArray import SFSArray
+from .SFSObject import SFSObject
+
+
+TYPE_NAMES = sfs_types.type_names
+TYPE_CODES = sfs_types.type_codes
+
+NULL, BOOL, BYTE, SHORT, INT, LONG, FLOAT, DOUBLE, UTF_STRING, BOOL_ARRAY, BYTE_ARRAY, SHORT_ARRAY, INT_ARRAY, \
+    LONG_ARRAY, FLOAT_ARRAY, DOUBLE_ARRAY, UTF_STRING_ARRAY, SFS_ARRAY, SFS_OBJECT = range(len(TYPE_NAMES))
+
+_unpack_byte = struct.Struct(">b").unpack_from
+_unpack_short = struct.Struct(">h").unpack_from
+_unpack_ushort = struct.Struct(">H").unpack_from
+_unpack_int = struct.Struct(">i").unpack_from
+_unpack_uint = struct.Struct(">I").unpack_from
+_unpack_long = struct.Struct(">q").unpack_from
+_unpack_float = struct.Struct(">f").unpack_from
+_unpack_double = struct.Struct(">d").unpack_from
+
+
+def _read_null(view, offset):
+    return None, offset
+
+
+def _read_bool(view, offset):
+    return view[offset] != 0, offset + 1
+
+
+def _read_byte(view, offset):
+    return _unpack_byte(view, offset)[0], offset + 1
+
+
+def _read_short(view, offset):
+    return _unpack_short(view, offset)[0], offset + 2
+
+
+def _read_int(view, offset):
+    return _unpack_int(view, offset)[0], offset + 4
+
+
+def _read_long(view, offset):
+    return _unpack_long(view, offset)[0], offset + 8
+
+
+def _read_float(view, offset):
+    return round(_unpack_float(view, offset)[0], 6), offset + 4
+
+
+def _read_double(view, offset):
+    return _unpack_double(view, offset)[0], offset + 8
+
+
+def _read_utf_string(view, offset):
+    length = _unpack_ushort(view, offset)[0]
+    offset += 2
+    return str(view[offset:offset + length], "utf-8"), offset + length
+
+
+def _read_bool_array(view, offset):
+    length = _unpack_ushort(view, offset)[0]
+    offset += 2
+    return list(map(bool, view[offset:offset + length])), offset + length
+
+
+def _read_byte_array(view, offset):
+    length = _unpack_uint(view, offset)[0]
+    offset += 4
+    return bytearray(view[offset:offset + length]), offset + length
+
+
+def _reader_numeric_array(code: str, size: int, precision: int = None):
+    def read(view, offset):
+        length = _unpack_ushort(view, offset)[0]
+        offset += 2
+        array = sfs_types.unpack_array(code, view, offset, length)
+        if precision is not None:
+            array = [round(item, precision) for item in array]
+        return array, offset + length * size
+    return read
+
+
+def _read_utf_string_array(view, offset):
+    length = _unpack_ushort(view, offset)[0]
+    offset += 2
+    array = []
+    for _ in range(length):
+        string_length = _unpack_ushort(view, offset)[0]
+        offset += 2
+        array.append(str(view[offset:offset + string_length], "utf-8"))
+        offset += string_length
+    return array, offset
+
+
+def _reader_numpy_array(code: str, size: int):
+    dtype = ">" + code
+
+    def read(view, offset):
+        # pip install numpy
+        import numpy
+
+        length = _unpack_ushort(view, offset)[0]
+        offset += 2
+        array = numpy.frombuffer(view, dtype=dtype, count=length, offset=offset)
+        array.flags.writeable = False
+        return array, offset + length * size
+    return read
+
+
+def _reader_sfs_array(readers: list):
+    def read(view, offset):
+        length = _unpack_ushort(view, offset)[0]
+        offset += 2
+        values = []
+        codes = bytearray()
+        append = values.append
+        for _ in range(length):
+            code = view[offset]
+            if code >= len(readers):
+                raise ValueError(f"Unknown SFS type code {code} at offset {offset}")
+            item, offset = readers[code](view, offset + 1)
+            append(item)
+            codes.append(code)
+        return SFSArray._fromStorage("", values, codes), offset
+    return read
+
+
+def _reader_sfs_object(readers: list):
+    def read(view, offset):
+        length = _unpack_ushort(view, offset)[0]
+        offset += 2
+        values = {}
+        codes = bytearray()
+        for _ in range(length):
+            key_length = _unpack_ushort(view, offset)[0]
+            offset += 2
+            key = str(view[offset:offset + key_length], "utf-8")
+            offset += key_length
+            code = view[offset]
+            if code >= len(readers):
+                raise ValueError(f"Unknown SFS type code {code} for key {key!r}")
+            item, offset = readers[code](view, offset + 1)
+            if key in values:
+                # A repeated key keeps its first position, like a dict assignment
+                codes[list(values).index(key)] = code
+            else:
+                codes.append(code)
+            values[key] = item
+        return SFSObject._fromStorage("", values, codes), offset
+    return read
+
+
+def _make_readers(numpy_arrays: bool) -> list:
+    if numpy_arrays:
+        numeric_arrays = [_reader_numpy_array(code, size) for code, size in (("h", 2), ("i", 4), ("q", 8),
+                                                                             ("f", 4), ("d", 8))]
+    else:
+        numeric_arrays = [_reader_numeric_array("h", 2),
+                          _reader_numeric_array("i", 4),
+                          _reader_numeric_array("q", 8),
+                          _reader_numeric_array("f", 4, 6),
+                          _reader_numeric_array("d", 8, 12)]
+
+    readers = [
+        _read_null,
+        _read_bool,
+        _read_byte,
+        _read_short,
+        _read_int,
+        _read_long,
+        _read_float,
+        _read_double,
+        _read_utf_string,
+        _read_bool_array,
+        _read_byte_array,
+        *numeric_arrays,
+        _read_utf_string_array,
+    ]
+    readers += [_reader_sfs_array(readers), _reader_sfs_object(readers)]
+    return readers
+
+
+_readers = _make_readers(False)
+_numpy_readers = _make_readers(True)
+
+
+def _read_header(view, offset: int, decompile_name: bool, read_type: bool, expected: int) -> (str, int):
+    name = ""
+    if decompile_name:
+        name, offset = _read_utf_string(view, offset)
+    if read_type:
+        if view[offset] != expected:
+            raise ValueError(f"Expected {TYPE_NAMES[expected]} (type {expected}), got type {view[offset]}")
+        offset += 1
+    return name, offset
+
+
+def decompile_object(data, offset: int = 0, decompile_name: bool = False, read_type: bool = True,
+                     numpy_arrays: bool = False, only: list = None, need_end: bool = True) -> (SFSObject, int):
+    """
+    Decodes an SFSObject from any bytes-like object starting at offset.
+    Walks a single memoryview, so nothing but the decoded values is copied.
+    With numpy_arrays short/int/long/float/double arrays are returned as read-only big-endian NumPy views over data
+    (without the float rounding of the list mode), so data must stay alive and unchanged while they are used.
+    With only (a list of key paths, see projection_tree) just those paths are decoded and everything else is
+    skipped; if need_end is False the walk also stops as soon as all paths were found and None is returned as offset.
+    Arrays keep the positions of their selected items: skipped items before the last selected one are null, the
+    array ends with that one.
+    Returns the object and the offset right after it.
+    """
+    view = memoryview(data)
+    readers = _numpy_readers if numpy_arrays else _readers
+    name, offset = _read_header(view, offset, decompile_name, read_type, SFS_OBJECT)
+    if only is None:
+        value, offset = readers[SFS_OBJECT](view, offset)
+    else:
+        value, offset = _read_projected_object(view, offset, projection_tree(only), readers, not need_end)
+    return SFSObject._fromStorage(name, *value._storage()), offset
+
+
+def decompile_array(data, offset: int = 0, decompile_name: bool = False, read_type: bool = True,
+                    numpy_arrays: bool = False, only: list = None, need_end: bool = True) -> (SFSArray, int):
+    """
+    Decodes an SFSArray from any bytes-like object starting at offset.
+    only and need_end work like in decompile_object, paths start with an item index or *.
+    Returns the array and the offset right after it.
+    """
+    view = memoryview(data)
+    readers = _numpy_readers if numpy_arrays else _readers
+    name, offset = _read_header(view, offset, decompile_name, read_type, SFS_ARRAY)
+    if only is None:
+        value, offset = readers[SFS_ARRAY](view, offset)
+    else:
+        value, offset = _read_projected_array(view, offset, projection_tree(only), readers, not need_end)
+    return SFSArray._fromStorage(name, *value._storage()), offset
+
+
+# Payload sizes of fixed-width types and item sizes of fixed-width arrays, indexed by type code
+_fixed_sizes = (0, 1, 1, 2, 4, 8, 4, 8)
+_array_item_sizes = {BOOL_ARRAY: 1, SHORT_ARRAY: 2, INT_ARRAY: 4, LONG_ARRAY: 8, FLOAT_ARRAY: 4, DOUBLE_ARRAY: 8}
+
+
+def skip_value(view, code: int, offset: int) -> int:
+    """
+    Returns the offset right after the payload of a value of type code starting at offset.
+    Sizes are computed from the headers only, no Python values are created.
+    """
+    if code < UTF_STRING:
+        return offset + _fixed_sizes[code]
+    if code == UTF_STRING:
+        return offset + 2 + _unpack_ushort(view, offset)[0]
+    if code in _array_item_sizes:
+        return offset + 2 + _unpack_ushort(view, offset)[0] * _array_item_sizes[code]
+    if code == BYTE_ARRAY:
+        return offset + 4 + _unpack_uint(view, offset)[0]
+
+    length = _unpack_ushort(view, offset)[0]
+    offset += 2
+    if code == UTF_STRING_ARRAY:
+        for _ in range(length):
+            offset += 2 + _unpack_ushort(view, offset)[0]
+    elif code == SFS_ARRAY:
+        for _ in range(length):
+            offset = skip_value(view, view[offset], offset + 1)
+    elif code == SFS_OBJECT:
+        for _ in range(length):
+            offset += 2 + _unpack_ushort(view, offset)[0]
+            offset = skip_value(view, view[offset], offset + 1)
+    else:
+        raise ValueError(f"Unknown SFS type code {code} at offset {offset}")
+    return offset
+
+
+def read_value(view, code: int, offset: int, numpy_arrays: bool = False):
+    """
+    Decodes a single value of type code starting at offset.
+    Returns the value and the offset right after it.
+    """
+    readers = _numpy_readers if numpy_arrays else _readers
+    if code >= len(readers):
+        raise ValueError(f"Unknown SFS type code {code} at offset {offset}")
+    return readers[code](view, offset)
+
+
+_missing = object()
+
+
+def projection_tree(paths: list) -> dict:
+    """
+    Turns key paths like ["p.player_object.coins", "c"] into {"p": {"player_object": {"coins": None}}, "c": None}.
+    None marks a value that is decoded completely. Array items are addressed by index or by * for every item.
+    """
+    tree = {}
+    for path in paths:
+        node = tree
+        *parents, leaf = path.split(".")
+        for part in parents:
+            if node.get(part, _missing) is None:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[leaf] = None
+    return tree
+
+
+def _read_projected(view, code: int, offset: int, tree, readers, can_stop: bool):
+    if tree is None:
+        return readers[code](view, offset)
+    if code == SFS_OBJECT:
+        return _read_projected_object(view, offset, tree, readers, can_stop)
+    if code == SFS_ARRAY:
+        return _read_projected_array(view, offset, tree, readers, can_stop)
+    # The path goes deeper than a plain value, so it does not exist in this payload
+    return _missing, skip_value(view, code, offset)
+
+
+def _read_projected_object(view, offset, tree: dict, readers, can_stop: bool):
+    length = _unpack_ushort(view, offset)[0]
+    offset += 2
+    remaining = len(tree)
+    sfs_object = SFSObject()
+    for _ in range(length):
+        if remaining == 0 and can_stop:
+            return sfs_object, None
+
+        key_length = _unpack_ushort(view, offset)[0]
+        offset += 2
+        key = str(view[offset:offset + key_length], "utf-8")
+        offset += key_length
+        code = view[offset]
+        subtree = tree.get(key, _missing)
+        if subtree is _missing:
+            offset = skip_value(view, code, offset + 1)
+            continue
+
+        remaining -= 1
+        item, offset = _read_projected(view, code, offset + 1, subtree, readers, can_stop and remaining == 0)
+        if item is not _missing:
+            sfs_object._set(key, code, item)
+        if offset is None:
+            return sfs_object, None
+    return sfs_object, offset
+
+
+def _read_projected_array(view, offset, tree: dict, readers, can_stop: bool):
+    length = _unpack_ushort(view, offset)[0]
+    offset += 2
+    every = tree.get("*", _missing)
+    positions = {int(position): subtree for position, subtree in tree.items() if position != "*"}
+    last = max(positions, default=-1) if every is _missing else length
+    array = SFSArray()
+    for position in range(length):
+        if position > last and can_stop:
+            return array, None
+
+        code = view[offset]
+        subtree = every if every is not _missing else positions.get(position, _missing)
+        if subtree is _missing:
+            offset = skip_value(view, code, offset + 1)
+            # null keeps the index of the selected items after it
+            if position < last:
+                array._insert(None, NULL, None)
+            continue
+
+        item, offset = _read_projected(view, code, offset + 1, subtree, readers, can_stop and position == last)
+        if item is _missing:
+            array._insert(None, NULL, None)
+        else:
+            array._insert(None, code, item)
+        if offset is None:
+            return array, None
+    return array, offset
@@ -0,0 +1,206 @@
+import struct
+import zlib
+
+from .. import sfs_types
+from .SFSArray import SFSArray, SFSArrayView
+from .SFSObject import SFSObject, SFSObjectView
+from .decoder import TYPE_CODES
+
+_pack_byte = struct.Struct(">b").pack
+_pack_short = struct.Struct(">h").pack
+_pack_ushort = struct.Struct(">H").pack
+_pack_int = struct.Struct(">i").pack
+_pack_uint = struct.Struct(">I").pack
+_pack_long = struct.Struct(">q").pack
+_pack_float = struct.Struct(">f").pack
+_pack_double = struct.Struct(">d").pack
+
+
+def _write_null(out: bytearray, value):
+    pass
+
+
+def _write_bool(out: bytearray, value):
+    out.append(1 if value else 0)
+
+
+def _write_byte(out: bytearray, value):
+    # Decoded and user supplied bytes come both as signed ints and as 1-byte bytes objects
+    if type(value) is int:
+        out += _pack_byte(value)
+    else:
+        out += value
+
+
+def _write_short(out: bytearray, value):
+    out += _pack_short(value)
+
+
+def _write_int(out: bytearray, value):
+    out += _pack_int(value)
+
+
+def _write_long(out: bytearray, value):
+    out += _pack_long(value)
+
+
+def _write_float(out: bytearray, value):
+    out += _pack_float(value)
+
+
+def _write_double(out: bytearray, value):
+    out += _pack_double(value)
+
+
+def _write_utf_string(out: bytearray, value):
+    encoded = value.encode("utf-8")
+    out += _pack_ushort(len(encoded))
+    out += encoded
+
+
+def _write_bool_array(out: bytearray, value):
+    out += _pack_ushort(len(value))
+    out += bytes(map(bool, value))
+
+
+def _write_byte_array(out: bytearray, value):
+    out += _pack_uint(len(value))
+    out.extend(value)
+
+
+def _writer_numeric_array(code: str):
+    def write(out: bytearray, value):
+        out += _pack_ushort(len(value))
+        out += sfs_types.pack_array(code, value)
+    return write
+
+
+def _write_utf_string_array(out: bytearray, value):
+    out += _pack_ushort(len(value))
+    for item in value:
+        _write_utf_string(out, item)
+
+
+def _write_sfs_array(out: bytearray, value):
+    if type(value) is not SFSArray:
+        if type(value) is list:
+            value = SFSArray("", value)
+        elif hasattr(value, "compile_body_into"):
+            # Lazy containers copy their untouched parts verbatim
+            value.compile_body_into(out)
+            return
+    write_array_body(out, value)
+
+
+def write_array_body(out: bytearray, value):
+    """
+    Appends the item count and the items of an SFSArray (or SFSArrayView) straight from its storage
+    """
+    if isinstance(value, SFSArrayView):
+        value = value.getArray()
+    values, codes = value._storage()
+    out += _pack_ushort(len(codes))
+    for code, item_value in zip(codes, values):
+        out.append(code)
+        _writers[code](out, item_value)
+
+
+def _write_sfs_object(out: bytearray, value):
+    if type(value) is not SFSObject:
+        if type(value) is dict:
+            value = SFSObject("", value)
+        elif hasattr(value, "compile_body_into"):
+            # Lazy and schema bound containers write their own body
+            value.compile_body_into(out)
+            return
+    write_object_body(out, value)
+
+
+def write_object_body(out: bytearray, value):
+    """
+    Appends the field count and the fields of an SFSObject (or SFSObjectView) straight from its storage
+    """
+    if isinstance(value, SFSObjectView):
+        value = value.getObject()
+    values, codes = value._storage()
+    out += _pack_ushort(len(codes))
+    for (item_name, item_value), code in zip(values.items(), codes):
+        _write_utf_string(out, item_name)
+        out.append(code)
+        _writers[code](out, item_value)
+
+
+_writers = (
+    _write_null,
+    _write_bool,
+    _write_byte,
+    _write_short,
+    _write_int,
+    _write_long,
+    _write_float,
+    _write_double,
+    _write_utf_string,
+    _write_bool_array,
+    _write_byte_array,
+    _writer_numeric_array("h"),
+    _writer_numeric_array("i"),
+    _writer_numeric_array("q"),
+    _writer_numeric_array("f"),
+    _writer_numeric_array("d"),
+    _write_utf_string_array,
+    _write_sfs_array,
+    _write_sfs_object,
+)
+
+
+# Bytes reserved in front of a packet body for its header: the header byte and the 2-byte size of all but the
+# largest packets
+HEADER_RESERVE = 3
+
+
+def compile_into(buffer: bytearray, item_type: str, value, name: str = "") -> int:
+    """
+    Appends an encoded value (name, type byte and payload) to buffer in a single pass.
+    Returns the number of bytes written.
+    """
+    start = len(buffer)
+    code = TYPE_CODES[item_type]
+    if name != "":
+        _write_utf_string(buffer, name)
+    buffer.append(code)
+    _writers[code](buffer, value)
+    return len(buffer) - start
+
+
+def compile_packet_into(buffer: bytearray, packet, compression_threshold: int = None) -> bytearray:
+    """
+    Appends a framed packet (header byte, size and body) to buffer.
+    Space for the header is reserved up front and the actual header is written in place afterwards.
+    Bodies larger than compression_threshold bytes are zlib compressed and flagged with 0x20 when that makes them
+    smaller.
+    """
+    start = len(buffer)
+    buffer += bytes(HEADER_RESERVE)
+    packet.compile_into(buffer)
+    return finish_packet_into(buffer, start, compression_threshold)
+
+
+def finish_packet_into(buffer: bytearray, start: int, compression_threshold: int = None) -> bytearray:
+    """
+    Writes the header of a packet whose body was appended after HEADER_RESERVE bytes at start, see
+    compile_packet_into. Only bodies of 64 KiB and more, which need the 4-byte size, are moved for their header.
+    """
+    body = start + HEADER_RESERVE
+    size = len(buffer) - body
+    header = 0x80
+    if compression_threshold is not None and size > compression_threshold:
+        compressed = zlib.compress(memoryview(buffer)[body:])
+        if len(compressed) < size:
+            buffer[body:] = compressed
+            size = len(compressed)
+            header |= 0x20
+    if size < 65535:
+        buffer[start:body] = bytes([header]) + _pack_ushort(size)
+    else:
+        buffer[start:body] = bytes([header | 0x08]) + _pack_uint(size)
+    return buffer
@@ -0,0 +1,196 @@
+import json
+import math
+
+from .SFSArray import SFSArray
+from .SFSObject import SFSObject
+from .decoder import BYTE, UTF_STRING, BYTE_ARRAY, SFS_ARRAY, SFS_OBJECT, _readers, _read_utf_string, \
+    _unpack_ushort, skip_value
+
+# JSON text of strings without escaping non-ASCII characters, like json.dumps(..., ensure_ascii=False)
+_encode_string = json.encoder.encode_basestring
+
+
+def _float(value) -> str:
+    # Same text as json.dumps for floats, including its NaN and Infinity
+    if math.isfinite(value):
+        return repr(value)
+    if value != value:
+        return "NaN"
+    return "Infinity" if value > 0 else "-Infinity"
+
+
+def _bool(value) -> str:
+    return "true" if value else "false"
+
+
+def _byte(value) -> str:
+    return str(value if type(value) is int else int.from_bytes(value, "big", signed=True))
+
+
+def _list(format_item):
+    def format_list(value) -> str:
+        if hasattr(value, "tolist"):
+            value = value.tolist()
+        return "[" + ", ".join(map(format_item, value)) + "]"
+    return format_list
+
+
+# Formatters of the values that are not containers, indexed by type code
+_formatters = (
+    lambda value: "null",
+    _bool,
+    _byte,
+    str,
+    str,
+    str,
+    _float,
+    _float,
+    _encode_string,
+    _list(_bool),
+    _list(str),
+    _list(str),
+    _list(str),
+    _list(str),
+    _list(_float),
+    _list(_float),
+    _list(_encode_string),
+)
+
+
+class _Output:
+    # Collects JSON text and writes it to the file as UTF-8 in chunks of about buffer_size characters
+    def __init__(self, file, buffer_size: int):
+        self.file = file
+        self.buffer_size = buffer_size
+        self.parts = []
+        self.size = 0
+
+    def write(self, text: str):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.file.write("".join(self.parts).encode("utf-8"))
+            self.parts = []
+            self.size = 0
+
+
+def _write_value(out: _Output, code: int, value):
+    if code == SFS_OBJECT:
+        out.write("{")
+        for position, (key, item_code, item) in enumerate(value._items()):
+            out.write(", " + _encode_string(key) + ": " if position else _encode_string(key) + ": ")
+            _write_value(out, item_code, item)
+        out.write("}")
+    elif code == SFS_ARRAY:
+        out.write("[")
+        for position, (item_code, item) in enumerate(value._items()):
+            if position:
+                out.write(", ")
+            _write_value(out, item_code, item)
+        out.write("]")
+    else:
+        out.write(_formatters[code](value))
+
+
+def _write_wire(out: _Output, view, code: int, offset: int) -> int:
+    # Writes the value of type code at offset straight from the buffer, returns the offset after it
+    if code == SFS_OBJECT:
+        out.write("{")
+        length = _unpack_ushort(view, offset)[0]
+        offset += 2
+        for position in range(length):
+            key, offset = _read_utf_string(view, offset)
+            out.write(", " + _encode_string(key) + ": " if position else _encode_string(key) + ": ")
+            offset = _write_wire(out, view, view[offset], offset + 1)
+        out.write("}")
+        return offset
+    if code == SFS_ARRAY:
+        out.write("[")
+        length = _unpack_ushort(view, offset)[0]
+        offset += 2
+        for position in range(length):
+            if position:
+                out.write(", ")
+            offset = _write_wire(out, view, view[offset], offset + 1)
+        out.write("]")
+        return offset
+    if code >= len(_formatters):
+        raise ValueError(f"Unknown SFS type code {code} at offset {offset}")
+    value, offset = _readers[code](view, offset)
+    out.write(_formatters[code](value))
+    return offset
+
+
+def _find_value(source, path: list) -> (int, object):
+    code = SFS_OBJECT if isinstance(source, SFSObject) else SFS_ARRAY
+    for part in path:
+        if code == SFS_OBJECT and part in source:
+            code, source = source._getItem(part)
+        elif code == SFS_ARRAY and part.lstrip("-").isdigit():
+            code, source = source._getItem(int(part))
+        else:
+            raise KeyError(".".join(path))
+    return code, source
+
+
+def _find_wire(view, code: int, offset: int, path: list) -> (int, int):
+    for part in path:
+        length = _unpack_ushort(view, offset)[0]
+        offset += 2
+        if code == SFS_OBJECT:
+            for _ in range(length):
+                key, offset = _read_utf_string(view, offset)
+                if key == part:
+                    break
+                offset = skip_value(view, view[offset], offset + 1)
+            else:
+                raise KeyError(".".join(path))
+        elif code == SFS_ARRAY and part.isdigit() and int(part) < length:
+            for _ in range(int(part)):
+                offset = skip_value(view, view[offset], offset + 1)
+        else:
+            raise KeyError(".".join(path))
+        code, offset = view[offset], offset + 1
+    return code, offset
+
+
+def dump_json(source, file, ndjson: bool = False, path: str = None, buffer_size: int = 1 << 16):
+    """
+    Writes source as JSON to a binary file-like object (a file opened with "wb", socket.makefile("wb"), ...)
+    chunk by chunk, the full JSON text is never built.
+    source is an SFSObject / SFSArray or the compiled bytes of one (as returned by compile, type byte first),
+    which are read in place without decoding them to Python objects first.
+    path ("player_object.monsters", array items by index) selects a nested value to write instead of source.
+    With ndjson an array is written one item per line, any other value as a single line.
+    """
+    out = _Output(file, buffer_size)
+    parts = path.split(".") if path else []
+
+    if isinstance(source, (SFSObject, SFSArray)):
+        code, value = _find_value(source, parts)
+        if ndjson and code == SFS_ARRAY:
+            for item_code, item in value._items():
+                _write_value(out, item_code, item)
+                out.write("\n")
+        else:
+            _write_value(out, code, value)
+            if ndjson:
+                out.write("\n")
+    else:
+        view = memoryview(source)
+        code, offset = _find_wire(view, view[0], 1, parts)
+        if ndjson and code == SFS_ARRAY:
+            length = _unpack_ushort(view, offset)[0]
+            offset += 2
+            for _ in range(length):
+                offset = _write_wire(out, view, view[offset], offset + 1)
+                out.write("\n")
+        else:
+            _write_wire(out, view, code, offset)
+            if ndjson:
+                out.write("\n")
+    out.flush()
@@ -0,0 +1,135 @@
+import hashlib
+import types
+
+from .SFSArray import SFSArray
+from .SFSObject import SFSObject
+from .decoder import BOOL_ARRAY, BYTE_ARRAY, SFS_ARRAY, SFS_OBJECT
+
+
+def _freeze_value(code: int, value):
+    if code in (SFS_ARRAY, SFS_OBJECT):
+        return value.freeze()
+    if code == BYTE_ARRAY:
+        return bytes(value)
+    if code >= BOOL_ARRAY:
+        # NumPy arrays are turned into plain Python values as well
+        return tuple(value.tolist() if hasattr(value, "tolist") else value)
+    return value
+
+
+class FrozenSFSObject(SFSObject):
+    """
+    Immutable snapshot of an SFSObject made by SFSObject.freeze.
+    Its body is compiled once and copied as is whenever it is compiled again, on its own or nested in another
+    object (e.g. the auth params of every login request). Frozen objects are hashable and compare equal when their
+    names and compiled bytes are equal, so they can be used as dict keys.
+    """
+    __slots__ = ("__body", "__hash")
+
+    @classmethod
+    def fromObject(cls, sfs_object: SFSObject) -> "FrozenSFSObject":
+        values = {key: _freeze_value(code, value) for key, code, value in sfs_object._items()}
+        codes = bytes(sfs_object._storage()[1])
+        frozen = cls._fromStorage(sfs_object.getName(), types.MappingProxyType(values), codes)
+        frozen.__body = None
+        frozen.__hash = None
+        return frozen
+
+    def _set(self, key: str, code: int, value):
+        raise TypeError("FrozenSFSObject does not support item assignment")
+
+    def _delete(self, key: str):
+        raise TypeError("FrozenSFSObject does not support item deletion")
+
+    def freeze(self) -> "FrozenSFSObject":
+        return self
+
+    def getBody(self) -> bytes:
+        """
+        Returns the compiled field count and fields, the payload that follows the sfs_object type byte
+        """
+        if self.__body is None:
+            from .encoder import write_object_body
+
+            body = bytearray()
+            write_object_body(body, self)
+            self.__body = bytes(body)
+        return self.__body
+
+    def getDigest(self) -> str:
+        """
+        Returns a content hash of the compiled body that is stable across processes
+        """
+        return hashlib.blake2b(self.getBody(), digest_size=16).hexdigest()
+
+    def compile_body_into(self, buffer: bytearray):
+        buffer += self.getBody()
+
+    def __eq__(self, other):
+        if not isinstance(other, FrozenSFSObject):
+            return NotImplemented
+        return self.getName() == other.getName() and self.getBody() == other.getBody()
+
+    def __hash__(self):
+        if self.__hash is None:
+            self.__hash = hash((self.getName(), self.getBody()))
+        return self.__hash
+
+
+class FrozenSFSArray(SFSArray):
+    """
+    Immutable snapshot of an SFSArray made by SFSArray.freeze, see FrozenSFSObject
+    """
+    __slots__ = ("__body", "__hash")
+
+    @classmethod
+    def fromArray(cls, sfs_array: SFSArray) -> "FrozenSFSArray":
+        values = tuple(_freeze_value(code, value) for code, value in sfs_array._items())
+        codes = bytes(sfs_array._storage()[1])
+        frozen = cls._fromStorage(sfs_array.getName(), values, codes)
+        frozen.__body = None
+        frozen.__hash = None
+        return frozen
+
+    def _set(self, index: int, code: int, value):
+        raise TypeError("FrozenSFSArray does not support item assignment")
+
+    def _insert(self, index, code: int, value):
+        raise TypeError("FrozenSFSArray does not support item insertion")
+
+    def _delete(self, index: int):
+        raise TypeError("FrozenSFSArray does not support item deletion")
+
+    def freeze(self) -> "FrozenSFSArray":
+        return self
+
+    def getBody(self) -> bytes:
+        """
+        Returns the compiled item count and items, the payload that follows the sfs_array type byte
+        """
+        if self.__body is None:
+            from .encoder import write_array_body
+
+            body = bytearray()
+            write_array_body(body, self)
+            self.__body = bytes(body)
+        return self.__body
+
+    def getDigest(self) -> str:
+        """
+        Returns a content hash of the compiled body that is stable across processes
+        """
+        return hashlib.blake2b(self.getBody(), digest_size=16).hexdigest()
+
+    def compile_body_into(self, buffer: bytearray):
+        buffer += self.getBody()
+
+    def __eq__(self, other):
+        if not isinstance(other, FrozenSFSArray):
+            return NotImplemented
+        return self.getName() == other.getName() and self.getBody() == other.getBody()
+
+    def __hash__(self):
+        if self.__hash is None:
+            self.__hash = hash((self.getName(), self.getBody()))
+        return self.__hash
@@ -0,0 +1,329 @@
+from .SFSArray import SFSArray
+from .SFSObject import SFSObject
+from .decoder import TYPE_NAMES, SFS_ARRAY, SFS_OBJECT, _read_header, _unpack_ushort, read_value, skip_value
+
+
+def _read_lazy(view, code: int, offset: int, end: int, name: str, numpy_arrays: bool):
+    # Nested containers stay lazy, everything else is decoded right away
+    if code == SFS_OBJECT:
+        return LazySFSObject(view, offset, name, end, numpy_arrays)
+    if code == SFS_ARRAY:
+        return LazySFSArray(view, offset, name, end, numpy_arrays)
+    return read_value(view, code, offset, numpy_arrays)[0]
+
+
+class LazySFSObject(SFSObject):
+    """
+    SFSObject over a received buffer that decodes fields on first access.
+    The first lookup only indexes the keys, values are decoded one by one when read with get
+    and nested objects and arrays stay lazy as well. getValue() and every put* decode the rest of the object,
+    after that it behaves exactly like SFSObject. Untouched fields are copied verbatim by compile.
+    """
+    __slots__ = ("__view", "__offset", "__end", "__numpy_arrays", "__index", "__items")
+
+    def __init__(self, buffer, offset: int, name: str = None, end: int = None, numpy_arrays: bool = False):
+        super().__init__(name)
+
+        self.__view = memoryview(buffer)
+        self.__offset = offset
+        self.__end = end
+        self.__numpy_arrays = numpy_arrays
+        self.__index = None
+        self.__items = {}
+
+    def __iter__(self):
+        if self.__view is None:
+            return super().__iter__()
+        return iter(self.getIndex())
+
+    def __contains__(self, key):
+        if self.__view is None:
+            return super().__contains__(key)
+        return key in self.getIndex()
+
+    def isMaterialized(self) -> bool:
+        return self.__view is None
+
+    def getIndex(self) -> dict:
+        """
+        Returns key -> (type code, field offset, value offset, end offset), built on first call
+        """
+        if self.__index is None:
+            view = self.__view
+            offset = self.__offset + 2
+            index = {}
+            for _ in range(_unpack_ushort(view, self.__offset)[0]):
+                start = offset
+                key_length = _unpack_ushort(view, offset)[0]
+                key = str(view[offset + 2:offset + 2 + key_length], "utf-8")
+                offset += 2 + key_length
+                code = view[offset]
+                offset = skip_value(view, code, offset + 1)
+                index[key] = (code, start, start + 3 + key_length, offset)
+            self.__index = index
+            self.__end = offset
+        return self.__index
+
+    def getEnd(self) -> int:
+        """
+        Returns the offset right after this object in the buffer
+        """
+        if self.__end is None:
+            self.getIndex()
+        return self.__end
+
+    def __item(self, key: str):
+        if key not in self.__items:
+            code, _, start, end = self.getIndex()[key]
+            self.__items[key] = _read_lazy(self.__view, code, start, end, key, self.__numpy_arrays)
+        return self.__items[key]
+
+    def __materialize(self):
+        # Moves every field into the regular storage, nested containers stay lazy
+        if self.__view is not None:
+            for key, (code, *_) in self.getIndex().items():
+                super()._set(key, code, self.__item(key))
+            self.__view = None
+            self.__index = None
+            self.__items = None
+
+    def _storage(self):
+        self.__materialize()
+        return super()._storage()
+
+    def _getItem(self, key: str):
+        if self.__view is None:
+            return super()._getItem(key)
+        return self.getIndex()[key][0], self.__item(key)
+
+    def _set(self, key: str, code: int, value):
+        self.__materialize()
+        super()._set(key, code, value)
+
+    def _delete(self, key: str):
+        self.__materialize()
+        super()._delete(key)
+
+    def _items(self):
+        self.__materialize()
+        return super()._items()
+
+    def getValue(self):
+        self.__materialize()
+        return super().getValue()
+
+    def get(self, key: str):
+        if self.__view is None:
+            return super().get(key)
+        if key not in self.getIndex():
+            return None
+        return self.__item(key)
+
+    def getItem(self, key: str) -> tuple:
+        """
+        Returns the (type name, value) pair of a field the way getValue() shows it
+        """
+        code, value = self._getItem(key)
+        if code >= SFS_ARRAY:
+            value = value.getValue()
+        return TYPE_NAMES[code], value
+
+    def getBuffer(self) -> memoryview:
+        """
+        Returns the source buffer the offsets of getIndex() point into, None once the object is materialized
+        """
+        return self.__view
+
+    def compile_into(self, buffer: bytearray) -> int:
+        if self.__view is None:
+            return super().compile_into(buffer)
+
+        start = len(buffer)
+        if self.getName() != "":
+            buffer += self.compileName()
+        buffer.append(SFS_OBJECT)
+        self.compile_body_into(buffer)
+        return len(buffer) - start
+
+    def compile_body_into(self, buffer: bytearray):
+        """
+        Appends the field count and the fields. Fields that were never read are copied from the source buffer as is
+        """
+        from .encoder import _write_utf_string, _writers, write_object_body
+
+        if self.__view is None:
+            write_object_body(buffer, self)
+            return
+
+        index = self.getIndex()
+        if not self.__items:
+            buffer += self.__view[self.__offset:self.__end]
+            return
+
+        buffer += len(index).to_bytes(2, "big")
+        for key, (code, field_start, _, end) in index.items():
+            if key in self.__items:
+                _write_utf_string(buffer, key)
+                buffer.append(code)
+                _writers[code](buffer, self.__items[key])
+            else:
+                buffer += self.__view[field_start:end]
+
+
+class LazySFSArray(SFSArray):
+    """
+    SFSArray over a received buffer that decodes items on first access, see LazySFSObject
+    """
+    __slots__ = ("__view", "__offset", "__end", "__numpy_arrays", "__index", "__items")
+
+    def __init__(self, buffer, offset: int, name: str = None, end: int = None, numpy_arrays: bool = False):
+        super().__init__(name)
+
+        self.__view = memoryview(buffer)
+        self.__offset = offset
+        self.__end = end
+        self.__numpy_arrays = numpy_arrays
+        self.__index = None
+        self.__items = {}
+
+    def __len__(self):
+        if self.__view is None:
+            return super().__len__()
+        return _unpack_ushort(self.__view, self.__offset)[0]
+
+    def isMaterialized(self) -> bool:
+        return self.__view is None
+
+    def getIndex(self) -> list:
+        """
+        Returns a (type code, value offset, end offset) tuple per item, built on first call
+        """
+        if self.__index is None:
+            view = self.__view
+            offset = self.__offset + 2
+            index = []
+            for _ in range(_unpack_ushort(view, self.__offset)[0]):
+                code = view[offset]
+                end = skip_value(view, code, offset + 1)
+                index.append((code, offset + 1, end))
+                offset = end
+            self.__index = index
+            self.__end = offset
+        return self.__index
+
+    def getEnd(self) -> int:
+        """
+        Returns the offset right after this array in the buffer
+        """
+        if self.__end is None:
+            self.getIndex()
+        return self.__end
+
+    def __item(self, index: int):
+        if index < 0:
+            index += len(self)
+        if index not in self.__items:
+            code, start, end = self.getIndex()[index]
+            self.__items[index] = _read_lazy(self.__view, code, start, end, "", self.__numpy_arrays)
+        return self.__items[index]
+
+    def __materialize(self):
+        if self.__view is not None:
+            for position, (code, *_) in enumerate(self.getIndex()):
+                super()._insert(None, code, self.__item(position))
+            self.__view = None
+            self.__index = None
+            self.__items = None
+
+    def _storage(self):
+        self.__materialize()
+        return super()._storage()
+
+    def _getItem(self, index: int):
+        if self.__view is None:
+            return super()._getItem(index)
+        return self.getIndex()[index][0], self.__item(index)
+
+    def _set(self, index: int, code: int, value):
+        self.__materialize()
+        super()._set(index, code, value)
+
+    def _insert(self, index, code: int, value):
+        self.__materialize()
+        super()._insert(index, code, value)
+
+    def _delete(self, index: int):
+        self.__materialize()
+        super()._delete(index)
+
+    def _items(self):
+        self.__materialize()
+        return super()._items()
+
+    def getValue(self):
+        self.__materialize()
+        return super().getValue()
+
+    def get(self, index: int):
+        if self.__view is None:
+            return super().get(index)
+        return self.__item(index)
+
+    def compile_into(self, buffer: bytearray) -> int:
+        if self.__view is None:
+            return super().compile_into(buffer)
+
+        start = len(buffer)
+        if self.getName() != "":
+            buffer += self.compileName()
+        buffer.append(SFS_ARRAY)
+        self.compile_body_into(buffer)
+        return len(buffer) - start
+
+    def compile_body_into(self, buffer: bytearray):
+        """
+        Appends the item count and the items. Items that were never read are copied from the source buffer as is
+        """
+        from .encoder import _writers, write_array_body
+
+        if self.__view is None:
+            write_array_body(buffer, self)
+            return
+
+        index = self.getIndex()
+        if not self.__items:
+            buffer += self.__view[self.__offset:self.__end]
+            return
+
+        buffer += len(index).to_bytes(2, "big")
+        for position, (code, start, end) in enumerate(index):
+            if position in self.__items:
+                buffer.append(code)
+                _writers[code](buffer, self.__items[position])
+            else:
+                buffer += self.__view[start - 1:end]
+
+
+def decompile_lazy_object(data, offset: int = 0, decompile_name: bool = False, read_type: bool = True,
+                          numpy_arrays: bool = False) -> (LazySFSObject, int):
+    """
+    Wraps the SFSObject starting at offset into a LazySFSObject without decoding any field.
+    data must stay alive and unchanged while the object is used.
+    Returns the object and the offset right after it, which is found while indexing the keys.
+    """
+    view = memoryview(data)
+    name, offset = _read_header(view, offset, decompile_name, read_type, SFS_OBJECT)
+    sfsObject = LazySFSObject(view, offset, name, numpy_arrays=numpy_arrays)
+    return sfsObject, sfsObject.getEnd()
+
+
+def decompile_lazy_array(data, offset: int = 0, decompile_name: bool = False, read_type: bool = True,
+                         numpy_arrays: bool = False) -> (LazySFSArray, int):
+    """
+    Wraps the SFSArray starting at offset into a LazySFSArray without decoding any item.
+    Returns the array and the offset right after it.
+    """
+    view = memoryview(data)
+    name, offset = _read_header(view, offset, decompile_name, read_type, SFS_ARRAY)
+    sfsArray = LazySFSArray(view, offset, name, numpy_arrays=numpy_arrays)
+    return sfsArray, sfsArray.getEnd()
@@ -0,0 +1,275 @@
+import struct
+
+from .SFSArray import SFSArray
+from .SFSObject import SFSObject
+from .decoder import TYPE_CODES, SFS_OBJECT, _readers, decompile_object
+from .encoder import _writers, write_object_body
+
+
+class SchemaMismatch(ValueError):
+    pass
+
+
+# Inline snippets for the hot scalar types, everything else goes through the generic reader / writer tables
+_read_snippets = {
+    "null": "v = None",
+    "bool": "v = view[offset] != 0; offset += 1",
+    "byte": "v = _unpack_byte(view, offset)[0]; offset += 1",
+    "short": "v = _unpack_short(view, offset)[0]; offset += 2",
+    "int": "v = _unpack_int(view, offset)[0]; offset += 4",
+    "long": "v = _unpack_long(view, offset)[0]; offset += 8",
+    "float": "v = round(_unpack_float(view, offset)[0], 6); offset += 4",
+    "double": "v = _unpack_double(view, offset)[0]; offset += 8",
+    "utf_string": "n = _unpack_ushort(view, offset)[0]; v = str(view[offset + 2:offset + 2 + n], 'utf-8'); "
+                  "offset += 2 + n",
+}
+_write_snippets = {
+    "null": "pass",
+    "bool": "out.append(1 if v else 0)",
+    "short": "out += _pack_short(v)",
+    "int": "out += _pack_int(v)",
+    "long": "out += _pack_long(v)",
+    "float": "out += _pack_float(v)",
+    "double": "out += _pack_double(v)",
+    "utf_string": "e = v.encode('utf-8'); out += _pack_ushort(len(e)); out += e",
+}
+_namespace = {
+    "SchemaMismatch": SchemaMismatch,
+    "SFSArray": SFSArray,
+    "SFSObject": SFSObject,
+    "_readers": _readers,
+    "_writers": _writers,
+    "_unpack_byte": struct.Struct(">b").unpack_from,
+    "_unpack_short": struct.Struct(">h").unpack_from,
+    "_unpack_ushort": struct.Struct(">H").unpack_from,
+    "_unpack_int": struct.Struct(">i").unpack_from,
+    "_unpack_long": struct.Struct(">q").unpack_from,
+    "_unpack_float": struct.Struct(">f").unpack_from,
+    "_unpack_double": struct.Struct(">d").unpack_from,
+    "_pack_short": struct.Struct(">h").pack,
+    "_pack_ushort": struct.Struct(">H").pack,
+    "_pack_int": struct.Struct(">i").pack,
+    "_pack_long": struct.Struct(">q").pack,
+    "_pack_float": struct.Struct(">f").pack,
+    "_pack_double": struct.Struct(">d").pack,
+}
+
+# Generated codecs are shared by every SFSSchema with the same fields
+_compiled = {}
+
+
+def _type_name(field) -> str:
+    if isinstance(field, dict):
+        return "sfs_object"
+    if isinstance(field, list):
+        return "sfs_array"
+    if field not in TYPE_CODES:
+        raise ValueError(f"Unknown SFS type {field!r}")
+    return field
+
+
+def _check_field(field, name: str):
+    # Raises ValueError naming the first entry that is not a valid schema field
+    if isinstance(field, dict):
+        for key, item in field.items():
+            _check_field(item, f"{name}.{key}" if name else key)
+    elif isinstance(field, list):
+        if len(field) != 1:
+            raise ValueError(f"Schema field {name!r} must list exactly one item shape, got {len(field)}")
+        _check_field(field[0], name + ".*")
+    elif field not in TYPE_CODES:
+        raise ValueError(f"Schema field {name!r} has an unknown SFS type {field!r}")
+
+
+def _freeze(field):
+    if isinstance(field, dict):
+        return "sfs_object", tuple((key, _freeze(value)) for key, value in field.items())
+    if isinstance(field, list):
+        return "sfs_array", _freeze(field[0])
+    return field
+
+
+class _Generator:
+    def __init__(self):
+        self.functions = []
+
+    def add(self, lines: list) -> str:
+        name = f"_codec_{len(self.functions)}"
+        self.functions.append("\n".join(line.replace("{name}", name) for line in lines))
+        return name
+
+    def read_value(self, field, indent: str) -> list:
+        item_type = _type_name(field)
+        if isinstance(field, (dict, list)):
+            return [f"{indent}v, offset = {self.decoder(field)}(view, offset)"]
+        if item_type in _read_snippets:
+            return [indent + _read_snippets[item_type]]
+        return [f"{indent}v, offset = _readers[{TYPE_CODES[item_type]}](view, offset)"]
+
+    def write_value(self, field, indent: str) -> list:
+        item_type = _type_name(field)
+        if isinstance(field, (dict, list)):
+            return [f"{indent}{self.encoder(field)}(out, v)"]
+        if item_type in _write_snippets:
+            return [indent + _write_snippets[item_type]]
+        return [f"{indent}_writers[{TYPE_CODES[item_type]}](out, v)"]
+
+    def decoder(self, field) -> str:
+        if isinstance(field, list):
+            code = TYPE_CODES[_type_name(field[0])]
+            lines = ["def {name}(view, offset):",
+                     "    value = []",
+                     "    length = _unpack_ushort(view, offset)[0]",
+                     "    offset += 2",
+                     "    for _ in range(length):",
+                     f"        if view[offset] != {code}:",
+                     "            raise SchemaMismatch('item type')",
+                     "        offset += 1",
+                     *self.read_value(field[0], "        "),
+                     "        value.append(v)",
+                     f"    return SFSArray._fromStorage('', value, bytearray([{code}]) * length), offset"]
+            return self.add(lines)
+
+        codes = bytes(TYPE_CODES[_type_name(item)] for item in field.values())
+        lines = ["def {name}(view, offset):",
+                 f"    if _unpack_ushort(view, offset)[0] != {len(field)}:",
+                 "        raise SchemaMismatch('field count')",
+                 "    offset += 2",
+                 "    value = {}"]
+        for key, item in field.items():
+            item_type = _type_name(item)
+            encoded_key = key.encode("utf-8")
+            header = len(encoded_key).to_bytes(2, "big") + encoded_key + bytes([TYPE_CODES[item_type]])
+            lines += [f"    if view[offset:offset + {len(header)}] != {header!r}:",
+                      f"        raise SchemaMismatch({key!r})",
+                      f"    offset += {len(header)}",
+                      *self.read_value(item, "    "),
+                      f"    value[{key!r}] = v"]
+        lines.append(f"    return SFSObject._fromStorage('', value, bytearray({codes!r})), offset")
+        return self.add(lines)
+
+    def encoder(self, field) -> str:
+        if isinstance(field, list):
+            code = TYPE_CODES[_type_name(field[0])]
+            lines = ["def {name}(out, value):",
+                     "    if not isinstance(value, SFSArray):",
+                     "        value = SFSArray('', value)",
+                     "    values, codes = value._storage()",
+                     f"    if codes.count({code}) != len(codes):",
+                     "        raise SchemaMismatch('item type')",
+                     "    out += _pack_ushort(len(values))",
+                     "    for v in values:",
+                     f"        out.append({code})",
+                     *self.write_value(field[0], "        ")]
+            return self.add(lines)
+
+        # The whole type layout is checked with two comparisons, the codes are positional while values are then looked
+        # up by key, so the keys must be in schema order too
+        codes = bytes(TYPE_CODES[_type_name(item)] for item in field.values())
+        lines = ["def {name}(out, value):",
+                 "    if not isinstance(value, SFSObject):",
+                 "        value = SFSObject('', value)",
+                 "    values, codes = value._storage()",
+                 f"    if codes != {codes!r} or tuple(values) != {tuple(field)!r}:",
+                 "        raise SchemaMismatch('field types')",
+                 f"    out += {len(field).to_bytes(2, 'big')!r}"]
+        for key, item in field.items():
+            item_type = _type_name(item)
+            encoded_key = key.encode("utf-8")
+            header = len(encoded_key).to_bytes(2, "big") + encoded_key + bytes([TYPE_CODES[item_type]])
+            lines += [f"    v = values[{key!r}]",
+                      f"    out += {header!r}",
+                      *self.write_value(item, "    ")]
+        return self.add(lines)
+
+
+def _compile_codecs(fields: dict):
+    key = _freeze(fields)
+    if key not in _compiled:
+        generator = _Generator()
+        decoder = generator.decoder(fields)
+        encoder = generator.encoder(fields)
+        namespace = dict(_namespace)
+        exec("\n\n".join(generator.functions), namespace)
+        _compiled[key] = namespace[decoder], namespace[encoder]
+    return _compiled[key]
+
+
+class SFSSchema:
+    """
+    Fixed shape of an SFSObject: key -> type name ("int", "utf_string", ...), a nested dict for an sfs_object
+    or a one-item list for an sfs_array whose items all have that shape. Keys are expected in wire order.
+    Specialized decoder and encoder functions are generated once per shape, payloads that do not fit the schema
+    fall back to the generic codec. Fields that are not valid type names or shapes raise ValueError right away.
+    """
+
+    def __init__(self, fields: dict):
+        _check_field(fields, "")
+        self.__fields = fields
+        self.__decoder, self.__encoder = _compile_codecs(fields)
+
+    def getFields(self) -> dict:
+        return self.__fields
+
+    @staticmethod
+    def infer(sfs_object) -> "SFSSchema":
+        """
+        Builds a schema from a decoded sample, keeping its key order. Arrays are described by their first item.
+        """
+        def describe(item_type, value):
+            if item_type == "sfs_object":
+                return {key: describe(*item) for key, item in value.items()}
+            if item_type == "sfs_array" and len(value) > 0:
+                return [describe(*value[0])]
+            return item_type
+
+        return SFSSchema(describe("sfs_object", sfs_object.getValue()))
+
+    def decompile_body(self, data, offset: int = 0) -> (SFSObject, int):
+        """
+        Decodes the field count and fields of an object starting at offset
+        """
+        view = memoryview(data)
+        try:
+            return self.__decoder(view, offset)
+        except (SchemaMismatch, IndexError, struct.error, UnicodeDecodeError):
+            return decompile_object(view, offset, read_type=False)
+
+    def decompile(self, data) -> SFSObject:
+        """
+        Decodes an object compiled by SFSObject.compile
+        """
+        if data[0] != SFS_OBJECT:
+            return SFSObject.decompile(data)
+        return self.decompile_body(data, 1)[0]
+
+    def compile_body_into(self, buffer: bytearray, sfs_object):
+        start = len(buffer)
+        try:
+            self.__encoder(buffer, sfs_object)
+        except (KeyError, ValueError, TypeError, AttributeError, struct.error):
+            del buffer[start:]
+            write_object_body(buffer, sfs_object)
+
+    def compile(self, sfs_object) -> bytes:
+        buffer = bytearray([SFS_OBJECT])
+        self.compile_body_into(buffer, sfs_object)
+        return bytes(buffer)
+
+    def bind(self, sfs_object) -> "BoundSFSSchema":
+        return BoundSFSSchema(self, sfs_object)
+
+
+class BoundSFSSchema(SFSObject):
+    """
+    An SFSObject paired with its schema, the encoder compiles it with the schema when it is nested in another object.
+    It shares the fields of the bound object.
+    """
+    __slots__ = ("__schema",)
+
+    def __init__(self, schema: SFSSchema, sfs_object):
+        super().__init__(sfs_object.getName(), sfs_object)
+        self.__schema = schema
+
+    def compile_body_into(self, buffer: bytearray):
+        self.__schema.compile_body_into(buffer, self)
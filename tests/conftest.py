@@ -0,0 +1,13 @@
+import importlib.util
+import pathlib
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+# The repository root is the pyfox2x package itself, whatever the checkout directory is called
+if "pyfox2x" not in sys.modules:
+    spec = importlib.util.spec_from_file_location("pyfox2x", ROOT / "__init__.py",
+                                                  submodule_search_locations=[str(ROOT)])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["pyfox2x"] = package
+    spec.loader.exec_module(package)
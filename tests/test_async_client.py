@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from pyfox2x.sfs_client.async_client import AsyncSFSClient
+from pyfox2x.sfs_server import SFSMockServer
+from pyfox2x.sfs_types.SFSObject import SFSObject
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = SFSMockServer()
+    server.handlers["echo"] = lambda session, params: params
+    server.start_in_thread()
+    yield server
+    server.stop_thread()
+
+
+def test_request_and_pushes(server):
+    async def main():
+        async with AsyncSFSClient() as client:
+            await client.connect("127.0.0.1", server.port)
+            response = await asyncio.wait_for(client.request("echo", SFSObject().putInt("x", 3)), 5)
+            server.sessions[max(server.sessions)].push("event", SFSObject().putInt("y", 4))
+            pushed = await client.wait_extension_response("event", timeout=5)
+            missing = await client.wait_extension_response("missing", timeout=0.05)
+            return response.get("x"), pushed.get("y"), missing
+
+    assert asyncio.run(main()) == (3, 4, None)
+
+
+def test_concurrent_requests(server):
+    async def main():
+        async with AsyncSFSClient() as client:
+            await client.connect("127.0.0.1", server.port)
+            requests = [client.request("echo", SFSObject().putInt("x", number)) for number in range(10)]
+            return [response.get("x") for response in await asyncio.wait_for(asyncio.gather(*requests), 5)]
+
+    assert asyncio.run(main()) == list(range(10))
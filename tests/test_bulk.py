@@ -0,0 +1,51 @@
+import pytest
+
+from pyfox2x.sfs_client import SFSClient
+from pyfox2x.sfs_client.bulk import decode_bulk
+from pyfox2x.sfs_client.capture import OUTBOUND, SFSCaptureWriter
+from pyfox2x.sfs_types.SFSObject import SFSObject
+
+BODIES = [SFSObject().putByte("c", 1).putShort("a", 12)
+          .putSFSObject("p", SFSObject().putInt("n", number).putUtfString("s", "x" * number)).compile()
+          for number in range(20)]
+SERIAL = [SFSObject.decompile(body).toPython() for body in BODIES]
+
+
+@pytest.fixture(scope="module")
+def capture(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("bulk") / "traffic.cap")
+    writer = SFSCaptureWriter(path)
+    for number, body in enumerate(BODIES):
+        writer.write(number % 2, body)
+    writer.close()
+    return path
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_ordered_capture(capture, processes):
+    assert list(decode_bulk(capture, processes, chunk_size=3)) == SERIAL
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_unordered_capture(capture, processes):
+    results = dict(decode_bulk(capture, processes, chunk_size=3, ordered=False, indexed=True))
+    assert [results[index] for index in range(len(BODIES))] == SERIAL
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_direction_and_only(capture, processes):
+    results = list(decode_bulk(capture, processes, chunk_size=3, direction=OUTBOUND, only=["p.n"], indexed=True))
+    assert results == [(index, {"p": {"n": index}}) for index in range(1, len(BODIES), 2)]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_framed_buffers(processes):
+    frames = [SFSClient.compile_packet(SFSObject.decompile(body), 10) for body in BODIES]
+    buffers = [b"".join(frames[:10]), memoryview(b"".join(frames[10:]))]
+    assert list(decode_bulk(buffers, processes, chunk_size=1, framed=True)) == SERIAL
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_unordered_bodies(processes):
+    results = list(decode_bulk(BODIES, processes, chunk_size=3, ordered=False))
+    assert sorted(results, key=lambda result: result["p"]["n"]) == SERIAL
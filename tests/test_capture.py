@@ -0,0 +1,79 @@
+import os
+import socket
+import threading
+
+from pyfox2x.sfs_client import SFSClient
+from pyfox2x.sfs_client.capture import INBOUND, OUTBOUND, SFSCaptureReader, SFSCaptureWriter
+from pyfox2x.sfs_client.framer import SFSFramer
+from pyfox2x.sfs_types.SFSObject import SFSObject
+
+
+def bodies(count: int) -> list:
+    return [SFSObject().putInt("i", number).putUtfString("s", "x" * number).compile() for number in range(count)]
+
+
+def write_capture(path: str, count: int) -> list:
+    writer = SFSCaptureWriter(path)
+    for number, body in enumerate(bodies(count)):
+        writer.write(number % 2, body, number)
+    writer.close()
+    return bodies(count)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "traffic.cap")
+    expected = write_capture(path, 5)
+    writer = SFSCaptureWriter(path)
+    packet = SFSObject().putUtfString("text", "ab" * 500)
+    writer.write_frame(OUTBOUND, SFSClient.compile_packet(packet, 100))
+    writer.close()
+
+    with SFSCaptureReader(path) as reader:
+        assert len(reader) == 6
+        assert [bytes(item.data) for item in list(reader)[:5]] == expected
+        assert [(item.direction, item.timestamp_ns) for item in list(reader)[:5]] == \
+            [(INBOUND, 0), (OUTBOUND, 1), (INBOUND, 2), (OUTBOUND, 3), (INBOUND, 4)]
+        assert bytes(reader[-1].data) == packet.compile()
+        assert reader.decode(3).get("i") == 3
+
+
+def test_truncated_trailing_record_rebuilds_the_index(tmp_path):
+    path = str(tmp_path / "traffic.cap")
+    expected = write_capture(path, 4)
+    with open(path, "r+b") as file:
+        file.truncate(os.path.getsize(path) - 2)
+
+    with SFSCaptureReader(path) as reader:
+        assert len(reader) == 3
+        assert [bytes(item.data) for item in reader] == expected[:3]
+
+    os.remove(path + ".idx")
+    with SFSCaptureReader(path) as reader:
+        assert [bytes(item.data) for item in reader] == expected[:3]
+
+
+def test_client_records_packets_in_send_order(tmp_path):
+    path = str(tmp_path / "traffic.cap")
+    client = SFSClient(capture_path=path, dispatch=False)
+    client.connection.close()
+    client.connection, peer = socket.socketpair()
+    received = []
+    reader = threading.Thread(target=lambda: received.extend(SFSFramer().feed(peer.makefile("rb").read())))
+    reader.start()
+
+    def send(thread: int):
+        for number in range(50):
+            client.send_raw(SFSClient.compile_packet(SFSObject().putInt("t", thread).putInt("n", number)))
+
+    senders = [threading.Thread(target=send, args=(thread,)) for thread in range(4)]
+    for sender in senders:
+        sender.start()
+    for sender in senders:
+        sender.join()
+    client.close()
+    reader.join()
+    peer.close()
+
+    with SFSCaptureReader(path) as capture:
+        assert [bytes(item.data) for item in capture] == received
+        assert len(received) == 200
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+
+import pytest
+
+from pyfox2x.sfs_client import SFSClient
+from pyfox2x.sfs_client.async_client import AsyncSFSClient
+from pyfox2x.sfs_server import SFSMockServer
+from pyfox2x.sfs_types.SFSObject import SFSObject
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = SFSMockServer()
+    server.handlers["echo"] = lambda session, params: params
+    server.handlers["chunky"] = lambda session, params: [SFSObject().putUtfString("v", params.get("n") + str(number))
+                                                         for number in range(3)]
+    # answers without echoing the request id a correlated client adds
+    server.handlers["plain"] = lambda session, params: SFSObject().putInt("x", params.get("x"))
+    server.start_in_thread()
+    yield server
+    server.stop_thread()
+
+
+@pytest.fixture
+def client(server):
+    client = SFSClient()
+    client.connect("127.0.0.1", server.port)
+    yield client
+    client.close()
+
+
+def chunk_values(chunks) -> list:
+    return [chunk.get("v") for chunk in chunks]
+
+
+def test_request(client):
+    assert client.request("echo", SFSObject().putInt("x", 3)).result(5).get("x") == 3
+
+
+def test_pipelined_chunked_responses_are_not_mixed(client):
+    requests = [("chunky", SFSObject().putUtfString("n", name)) for name in "AB"]
+    results = [chunk_values(future.result(5)) for future in client.request_many(requests, parse_chunks=True)]
+    assert results == [["A0", "A1", "A2"], ["B0", "B1", "B2"]]
+
+
+def test_concurrent_chunked_responses_are_not_mixed(client):
+    results = {}
+
+    def request(name):
+        results[name] = chunk_values(client.request("chunky", SFSObject().putUtfString("n", name),
+                                                    parse_chunks=True).result(5))
+
+    threads = [threading.Thread(target=request, args=(name,)) for name in "CDEFG"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {name: [name + str(number) for number in range(3)] for name in "CDEFG"}
+
+
+def test_correlated_response_without_id(server):
+    client = SFSClient(correlation_key="rid")
+    client.connect("127.0.0.1", server.port)
+    try:
+        futures = client.request_many([("plain", SFSObject().putInt("x", number)) for number in range(3)])
+        assert [future.result(5).get("x") for future in futures] == [0, 1, 2]
+        assert client.request("echo", SFSObject().putInt("x", 4)).result(5).get("x") == 4
+    finally:
+        client.close()
+
+
+def test_async_chunked_responses(server):
+    async def main():
+        async with AsyncSFSClient(correlation_key="rid") as client:
+            await client.connect("127.0.0.1", server.port)
+            requests = [("chunky", SFSObject().putUtfString("n", name)) for name in "AB"]
+            chunked = await client.request_many(requests, parse_chunks=True)
+            plain = await asyncio.wait_for(client.request("plain", SFSObject().putInt("x", 7)), 5)
+            return [chunk_values(chunks) for chunks in chunked], plain.get("x")
+
+    assert asyncio.run(main()) == ([["A0", "A1", "A2"], ["B0", "B1", "B2"]], 7)
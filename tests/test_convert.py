@@ -0,0 +1,92 @@
+import collections
+import json
+
+import pytest
+
+from pyfox2x.sfs_types import convert
+from pyfox2x.sfs_types.SFSArray import SFSArray
+from pyfox2x.sfs_types.SFSObject import SFSObject
+
+from test_decoder import every_type
+
+
+def test_to_python_matches_the_json_text():
+    python_value = every_type().toPython()
+    assert python_value["byte_array"] == [1, 255]
+    assert python_value["sfs_array"] == [3, "x"]
+    assert python_value["sfs_object"] == {"b": True}
+    assert json.loads(every_type().getJsonDump()) == python_value
+
+
+def test_from_python_infers_types():
+    sfs_object = SFSObject.fromPython({"i": 1, "l": 1 << 40, "f": 0.5, "s": "x", "b": b"\x01", "ints": [1, 2],
+                                       "strings": ["a"], "mixed": [1, "a"], "o": {"n": None}})
+    assert [type_name for type_name, _ in sfs_object.getValue().values()] == \
+        ["int", "long", "double", "utf_string", "byte_array", "int_array", "utf_string_array", "sfs_array",
+         "sfs_object"]
+    assert isinstance(sfs_object.get("mixed"), SFSArray)
+    assert SFSObject.fromPython(sfs_object.toPython()).toPython() == sfs_object.toPython()
+
+
+def test_dumps_matches_json_dumps():
+    sfs_object = every_type().putDouble("nan", float("nan"))
+    for indent in (None, 2):
+        assert sfs_object.getJsonDump(indent) == json.dumps(sfs_object.toPython(), ensure_ascii=False, indent=indent)
+
+
+def test_fast_dumps_is_the_same_json():
+    sfs_object = every_type()
+    assert json.loads(sfs_object.getJsonDump(fast=True)) == json.loads(sfs_object.getJsonDump())
+    if convert.orjson is not None:
+        assert sfs_object.getJsonDump(fast=True) != sfs_object.getJsonDump()
+
+
+@pytest.fixture
+def plans(monkeypatch):
+    monkeypatch.setattr(convert, "_plans", collections.OrderedDict())
+    monkeypatch.setattr(convert, "PLAN_CACHE_SIZE", 2)
+    return convert._plans
+
+
+def test_plans_are_reused(plans):
+    first = SFSObject.fromPython({"a": 1, "b": "x"})
+    second = SFSObject.fromPython({"a": 2, "b": "y"})
+    assert len(plans) == 1
+    assert second.getValue()["a"] == ("int", 2)
+    assert first.getValue()["a"] == ("int", 1)
+    SFSObject.fromPython({"a": 1 << 40, "b": "y"})
+    assert len(plans) == 1
+    SFSObject.fromPython({"a": 1.5, "b": "y"})
+    assert len(plans) == 2
+
+
+def test_equal_hints_share_a_plan(plans):
+    for _ in range(3):
+        sfs_object = convert.from_python({"id": 1, "pos": [1, 2]}, {"id": "long", "pos": ["float"]})
+    assert len(plans) == 1
+    assert sfs_object.getValue()["id"] == ("long", 1)
+    convert.from_python({"id": 1, "pos": [1, 2]}, {"id": "short", "pos": ["float"]})
+    assert len(plans) == 2
+
+
+def test_least_recently_used_plan_is_dropped(plans):
+    SFSObject.fromPython({"a": 1})
+    SFSObject.fromPython({"b": 1})
+    SFSObject.fromPython({"a": 2})
+    SFSObject.fromPython({"c": 1})
+    assert [plan_key[0] for plan_key in plans] == [("a",), ("c",)]
+
+
+def test_hints_override_inferred_types(plans):
+    hints = {"id": "long", "pos": "float_array", "player": {"coins": "long"}, "monsters": [{"level": "short"}]}
+    sfs_object = convert.from_python({"id": 1, "pos": [1, 2], "player": {"coins": 5, "name": "x"},
+                                      "monsters": [{"level": 3}, {"level": 4}]}, hints)
+    assert sfs_object.getValue()["id"] == ("long", 1)
+    assert sfs_object.getValue()["pos"] == ("float_array", [1.0, 2.0])
+    assert sfs_object.get("player").getValue()["coins"] == ("long", 5)
+    assert sfs_object.get("player").getValue()["name"] == ("utf_string", "x")
+    monsters = sfs_object.get("monsters")
+    assert [monsters.get(index).getValue()["level"] for index in range(2)] == [("short", 3), ("short", 4)]
+    assert convert.from_python([1, 2], ["byte"]).getValue()[0] == ("byte", 1)
+    with pytest.raises(ValueError):
+        convert.from_python({"id": 1}, {"id": "integer"})
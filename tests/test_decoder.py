@@ -0,0 +1,95 @@
+import io
+import struct
+
+import pytest
+
+from pyfox2x.sfs_types.SFSArray import SFSArray
+from pyfox2x.sfs_types.SFSObject import SFSObject
+from pyfox2x.sfs_types.decoder import decompile_object
+
+
+def array_of(*adds) -> SFSArray:
+    # add* methods of SFSArray return None, so arrays are built from (method name, value) pairs
+    array = SFSArray()
+    for name, *value in adds:
+        getattr(array, name)(*value)
+    return array
+
+
+def every_type() -> SFSObject:
+    # One field of every wire type code, 0 (null) to 18 (sfs_object), in code order
+    return SFSObject() \
+        .putNull("null") \
+        .putBool("bool", True) \
+        .putByte("byte", -2) \
+        .putShort("short", -300) \
+        .putInt("int", 70000) \
+        .putLong("long", -(1 << 40)) \
+        .putFloat("float", 1.5) \
+        .putDouble("double", 2.25) \
+        .putUtfString("utf_string", "hiж") \
+        .putBoolArray("bool_array", [True, False]) \
+        .putByteArray("byte_array", bytearray(b"\x01\xff")) \
+        .putShortArray("short_array", [1, -2]) \
+        .putIntArray("int_array", [1, 2, 3]) \
+        .putLongArray("long_array", [1 << 40, -1]) \
+        .putFloatArray("float_array", [0.5]) \
+        .putDoubleArray("double_array", [0.25, 1e10]) \
+        .putUtfStringArray("utf_string_array", ["x", "yy"]) \
+        .putSFSArray("sfs_array", array_of(("addInt", 3), ("addUtfString", "x"))) \
+        .putSFSObject("sfs_object", SFSObject().putBool("b", True))
+
+
+def test_every_type_code_is_covered():
+    assert [type_name for type_name, _ in every_type().getValue().values()] == list(every_type().getValue())
+
+
+@pytest.mark.parametrize("decode", [
+    lambda data: SFSObject.decompile(data),
+    lambda data: SFSObject.decompile_conn(io.BytesIO(data)),
+])
+def test_object_round_trip(decode):
+    sfs_object = every_type()
+    assert dict(decode(sfs_object.compile()).getValue().items()) == dict(sfs_object.getValue().items())
+
+
+def test_array_round_trip():
+    array = array_of(("addNull",), ("addBool", False), ("addByte", -1), ("addShort", 2), ("addInt", -3),
+                     ("addLong", 1 << 40), ("addFloat", 0.5), ("addDouble", -1.25), ("addUtfString", "ж"),
+                     ("addBoolArray", [True]), ("addByteArray", bytearray(b"\x00")), ("addShortArray", [5]),
+                     ("addIntArray", [6]), ("addLongArray", [7]), ("addFloatArray", [8.5]),
+                     ("addDoubleArray", [9.5]), ("addUtfStringArray", ["a"]), ("addSFSArray", array_of(("addInt", 1))),
+                     ("addSFSObject", SFSObject().putInt("k", 1)))
+    decoded = SFSArray.decompile(array.compile())
+    assert list(decoded.getValue()) == list(array.getValue())
+
+
+def test_decompile_object_from_offset():
+    data = b"junk" + SFSObject().putInt("i", 1).compile() + b"tail"
+    decoded, end = decompile_object(bytearray(data), 4)
+    assert decoded.get("i") == 1
+    assert data[end:] == b"tail"
+
+
+def test_null_consumes_no_payload_byte():
+    decoded = SFSObject.decompile(b"\x12\x00\x02" b"\x00\x01n\x00" b"\x00\x01i\x04\x00\x00\x00\x01")
+    assert decoded.get("n") is None
+    assert decoded.get("i") == 1
+
+
+def test_byte_is_signed():
+    assert SFSObject.decompile(b"\x12\x00\x01\x00\x01b\x02\xff").get("b") == -1
+
+
+def test_double_is_big_endian():
+    assert SFSObject.decompile(b"\x12\x00\x01\x00\x01d\x07" + struct.pack(">d", 1.5)).get("d") == 1.5
+
+
+def test_long_array_items_are_8_bytes():
+    data = b"\x12\x00\x01\x00\x01l\x0d\x00\x02" + struct.pack(">qq", 1, -1)
+    assert SFSObject.decompile(data).get("l") == [1, -1]
+
+
+def test_unknown_type_code_raises():
+    with pytest.raises(ValueError):
+        SFSObject.decompile(b"\x12\x00\x01\x00\x01x\x63\x00")
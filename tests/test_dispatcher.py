@@ -0,0 +1,132 @@
+import gc
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from pyfox2x.sfs_client import SFSClient
+from pyfox2x.sfs_client.dispatcher import DispatchedPacket, PacketRouter
+from pyfox2x.sfs_server import SFSMockServer
+from pyfox2x.sfs_types.SFSObject import SFSObject
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = SFSMockServer()
+    server.handlers["echo"] = lambda session, params: params
+    server.start_in_thread()
+    yield server
+    server.stop_thread()
+
+
+@pytest.fixture
+def client(server):
+    client = SFSClient()
+    client.connect("127.0.0.1", server.port)
+    yield client
+    client.close()
+
+
+def packet(key) -> DispatchedPacket:
+    return DispatchedPacket(key, None, b"")
+
+
+def test_router_keeps_unawaited_packets():
+    router = PacketRouter(backlog=2)
+    for key in ("a", "b", "c"):
+        router.route(packet(key))
+    assert router.add_waiter(Future(), ("c",)).result(0).key == "c"
+    assert router.add_waiter(Future()).result(0).key == "b"
+    assert not router.add_waiter(Future(), ("a",)).done()
+
+
+def test_keyless_waiters_take_what_nobody_else_waits_for():
+    router = PacketRouter()
+    keyless = router.add_waiter(Future())
+    keyed = router.add_waiter(Future(), ("a",))
+    router.route(packet("a"))
+    assert keyed.result(0).key == "a"
+    assert not keyless.done()
+    router.route(packet("b"))
+    assert keyless.result(0).key == "b"
+
+
+def test_cancelled_waiters_are_skipped():
+    router = PacketRouter()
+    cancelled = router.add_waiter(Future(), ("a",))
+    waiting = router.add_waiter(Future(), ("a",))
+    cancelled.cancel()
+    router.route(packet("a"))
+    assert waiting.result(0).key == "a"
+
+
+def test_subscribers_and_close():
+    router = PacketRouter()
+    received = []
+    router.subscribe("a", received.append)
+    router.route(packet("a"))
+    router.unsubscribe("a", received.append)
+    router.route(packet("a"))
+    assert [item.key for item in received] == ["a"]
+    assert router.add_waiter(Future(), ("a",)).result(0).key == "a"
+
+    waiting = router.add_waiter(Future(), ("a",))
+    router.close(ConnectionError("closed"))
+    with pytest.raises(ConnectionError):
+        waiting.result(0)
+    with pytest.raises(ConnectionError):
+        router.add_waiter(Future()).result(0)
+
+
+def test_read_response_does_not_take_awaited_responses(server, client):
+    pending = client.dispatcher.expect()
+    response = client.dispatcher.expect("echo")
+    client.send_extension_request("echo", SFSObject().putInt("x", 1))
+    assert response.result(5).response.get("p").get("x") == 1
+    assert not pending.done()
+    server.sessions[max(server.sessions)].push("event", SFSObject().putInt("x", 2))
+    assert pending.result(5).key == "event"
+
+
+def test_read_response_only(server, client):
+    session = server.sessions[max(server.sessions)]
+    session.push("event", SFSObject().putInt("x", 1).putInt("y", 2))
+    response, packet = client.read_response(only=["p.x"])
+    assert list(response.get("p")) == ["x"]
+    assert packet != b""
+
+
+def test_undecodable_response_fails_its_waiter(server):
+    class BrokenClient(SFSClient):
+        def decompile_response(self, packet, only=None):
+            c, a, response = super().decompile_response(packet, only)
+            if c == 1 and response.get("c") == "echo" and response.get("p").get("x") == 0:
+                raise ValueError("broken")
+            return c, a, response
+
+    client = BrokenClient()
+    client.connect("127.0.0.1", server.port)
+    try:
+        broken = client.dispatcher.expect("echo")
+        client.send_extension_request("echo", SFSObject().putInt("x", 0))
+        with pytest.raises(ValueError):
+            broken.result(5)
+        client.send_extension_request("echo", SFSObject().putInt("x", 1))
+        assert client.wait_extension_response("echo", timeout=5).get("x") == 1
+    finally:
+        client.close()
+
+
+def test_dropped_client_closes_its_connection(server):
+    sessions = len(server.sessions)
+    client = SFSClient()
+    client.connect("127.0.0.1", server.port)
+    thread = client.dispatcher.thread
+    del client
+    gc.collect()
+    thread.join(5)
+    assert not thread.is_alive()
+    deadline = time.monotonic() + 5
+    while len(server.sessions) > sessions and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(server.sessions) == sessions
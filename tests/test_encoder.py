@@ -0,0 +1,39 @@
+import struct
+
+from pyfox2x.sfs_types.SFSArray import SFSArray
+from pyfox2x.sfs_types.SFSObject import SFSObject
+from pyfox2x.sfs_types.encoder import compile_into, compile_packet_into
+
+
+def test_null_consumes_no_payload_byte():
+    data = SFSObject().putNull("n").putInt("i", 1).compile()
+    assert data == b"\x12\x00\x02" b"\x00\x01n\x00" b"\x00\x01i\x04\x00\x00\x00\x01"
+
+
+def test_double_is_big_endian():
+    assert SFSObject().putDouble("d", 1.5).compile().endswith(b"\x07" + struct.pack(">d", 1.5))
+
+
+def test_nested_array_name_comes_before_type():
+    assert SFSObject().putSFSArray("a", SFSArray()).compile() == b"\x12\x00\x01\x00\x01a\x11\x00\x00"
+
+
+def test_string_length_counts_utf8_bytes():
+    assert SFSObject().putUtfString("s", "жж").compile().endswith(b"\x08\x00\x04" + "жж".encode("utf-8"))
+
+
+def test_compile_into_appends():
+    sfs_object = SFSObject().putInt("i", 1).putUtfString("s", "x")
+    buffer = bytearray(b"head")
+    compile_into(buffer, "sfs_object", sfs_object)
+    assert buffer == b"head" + sfs_object.compile()
+
+
+def test_packet_header_is_written_in_place():
+    small = SFSObject().putInt("i", 1)
+    packet = compile_packet_into(bytearray(b"head"), small)
+    assert packet == b"head\x80" + struct.pack(">H", len(small.compile())) + small.compile()
+
+    large = SFSObject().putByteArray("b", bytearray(70000))
+    packet = compile_packet_into(bytearray(), large)
+    assert packet == b"\x88" + struct.pack(">I", len(large.compile())) + large.compile()
@@ -0,0 +1,42 @@
+import io
+import json
+
+import pytest
+
+from pyfox2x.sfs_types.SFSArray import SFSArray
+from pyfox2x.sfs_types.SFSObject import SFSObject
+from pyfox2x.sfs_types.export import dump_json
+
+from test_decoder import every_type
+
+
+def dumped(source, **options) -> str:
+    file = io.BytesIO()
+    dump_json(source, file, buffer_size=16, **options)
+    return file.getvalue().decode("utf-8")
+
+
+def test_json_dump_matches_write_json_dump():
+    sfs_object = every_type().putDouble("nan", float("nan"))
+    file = io.BytesIO()
+    sfs_object.writeJsonDump(file)
+    assert file.getvalue().decode("utf-8") == sfs_object.getJsonDump()
+
+
+def test_compiled_bytes_are_written_in_place():
+    sfs_object = every_type()
+    assert dumped(sfs_object.compile()) == dumped(sfs_object) == sfs_object.getJsonDump()
+
+
+def test_ndjson_and_path():
+    items = SFSArray()
+    for number in range(3):
+        items.addSFSObject(SFSObject().putInt("k", number))
+    sfs_object = SFSObject().putSFSObject("player", SFSObject().putSFSArray("items", items))
+    for source in (sfs_object, sfs_object.compile()):
+        lines = dumped(source, ndjson=True, path="player.items").splitlines()
+        assert [json.loads(line) for line in lines] == [{"k": 0}, {"k": 1}, {"k": 2}]
+        assert json.loads(dumped(source, path="player.items.1")) == {"k": 1}
+        assert dumped(source, ndjson=True) == sfs_object.getJsonDump() + "\n"
+        with pytest.raises(KeyError):
+            dumped(source, path="player.missing")
@@ -0,0 +1,122 @@
+import random
+import socket
+import struct
+import zlib
+
+import pytest
+
+from pyfox2x.sfs_client import SFSClient
+from pyfox2x.sfs_client.framer import SFSFramer, split_frames
+from pyfox2x.sfs_types.SFSObject import SFSObject
+
+
+def packet(size: int) -> SFSObject:
+    rng = random.Random(size)
+    return SFSObject().putByte("c", 1).putShort("a", 12) \
+        .putByteArray("noise", bytearray(rng.randrange(256) for _ in range(size))) \
+        .putUtfString("text", "ab" * min(size, 1000))
+
+
+SIZES = (0, 10, 3000, 70000)
+# plain and compressed frames, the 70000 bytes ones with the 4-byte size header
+FRAMES = [SFSClient.compile_packet(packet(size), threshold) for size in SIZES for threshold in (None, 100)]
+BODIES = [packet(size).compile() for size in SIZES for _ in range(2)]
+
+
+def compressed_frame(body: bytes) -> bytes:
+    compressed = zlib.compress(body)
+    return b"\xa0" + struct.pack(">H", len(compressed)) + compressed
+
+
+def test_headers():
+    assert FRAMES[4][0] == 0x80
+    assert FRAMES[5][0] == 0xa0
+    assert FRAMES[6][0] == 0x88
+    assert SFSClient.compile_packet(packet(10), 1 << 20)[0] == 0x80
+
+
+def test_whole_stream():
+    assert SFSFramer().feed(b"".join(FRAMES)) == BODIES
+
+
+def test_byte_by_byte():
+    framer = SFSFramer(buffer_size=64)
+    bodies = []
+    for byte in b"".join(FRAMES):
+        bodies += framer.feed(bytes([byte]))
+    assert bodies == BODIES
+    assert framer.pending() == 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_chunk_boundaries(seed):
+    rng = random.Random(seed)
+    data = b"".join(FRAMES)
+    framer = SFSFramer(buffer_size=1024)
+    bodies, offset = [], 0
+    while offset < len(data):
+        size = rng.randrange(1, 5000)
+        bodies += framer.feed(data[offset:offset + size])
+        offset += size
+    assert bodies == BODIES
+
+
+@pytest.mark.parametrize("data", [b"\x00\x00\x01x", b"\xc0\x00\x00", b"\xa0\x00\x03abc"])
+def test_bad_frames(data):
+    with pytest.raises(ValueError):
+        SFSFramer().feed(data)
+    with pytest.raises(ValueError):
+        split_frames(data)
+
+
+def test_max_packet_size():
+    with pytest.raises(ValueError):
+        SFSFramer(max_packet_size=100).feed(FRAMES[4])
+    with pytest.raises(ValueError):
+        split_frames(FRAMES[4], max_packet_size=100)
+
+
+def test_inflated_size_is_capped():
+    bomb = compressed_frame(bytes(1 << 24))
+    assert len(bomb) < 20000
+    with pytest.raises(ValueError, match="Inflated"):
+        SFSFramer(max_packet_size=1 << 16).feed(bomb)
+    framer = SFSFramer(max_packet_size=1 << 16)
+    with pytest.raises(ValueError, match="Inflated"):
+        for offset in range(0, len(bomb), 1000):
+            framer.feed(bomb[offset:offset + 1000])
+    with pytest.raises(ValueError, match="Inflated"):
+        split_frames(bomb, max_packet_size=1 << 16)
+
+    exact = compressed_frame(bytes(1 << 16))
+    assert SFSFramer(max_packet_size=1 << 16).feed(exact) == [bytes(1 << 16)]
+    assert split_frames(exact, max_packet_size=1 << 16) == [bytes(1 << 16)]
+
+
+def test_split_frames():
+    data = b"".join(FRAMES)
+    assert split_frames(data) == BODIES
+    assert split_frames(memoryview(data + FRAMES[4][:7])) == BODIES
+
+
+def test_decode_and_views():
+    for views in (False, True):
+        decoded = SFSFramer(decode=SFSObject.decompile, views=views).feed(b"".join(FRAMES))
+        assert [item.get("noise") for item in decoded] == [SFSObject.decompile(body).get("noise") for body in BODIES]
+
+
+def test_receive_from_socket():
+    left, right = socket.socketpair()
+    try:
+        left.sendall(b"".join(FRAMES))
+        left.close()
+        framer = SFSFramer(buffer_size=256)
+        bodies = []
+        while True:
+            received = framer.receive(right)
+            if received is None:
+                break
+            bodies += received
+        assert bodies == BODIES
+    finally:
+        right.close()
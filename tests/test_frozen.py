@@ -0,0 +1,98 @@
+import hashlib
+
+import pytest
+
+from pyfox2x.sfs_types import encoder
+from pyfox2x.sfs_types.SFSObject import SFSObject
+from pyfox2x.sfs_types.frozen import FrozenSFSArray, FrozenSFSObject
+
+from test_decoder import array_of, every_type
+
+
+def setter_name(prefix: str, type_name: str) -> str:
+    # "utf_string" -> putUtfString, "sfs_array" -> putSFSArray
+    return prefix + "".join(part.capitalize() for part in type_name.split("_")).replace("Sfs", "SFS")
+
+
+def test_freeze_keeps_values():
+    frozen = every_type().freeze()
+    assert isinstance(frozen, FrozenSFSObject)
+    assert isinstance(frozen.get("sfs_array"), FrozenSFSArray)
+    assert isinstance(frozen.get("sfs_object"), FrozenSFSObject)
+    assert frozen.freeze() is frozen
+    assert frozen.compile() == every_type().compile()
+
+
+def test_hash_and_equality_are_stable():
+    frozen = every_type().freeze()
+    same = every_type().freeze()
+    assert frozen == same
+    assert hash(frozen) == hash(same) == hash(frozen)
+    assert {frozen: 1}[same] == 1
+    assert frozen != every_type().putInt("int", 1).freeze()
+    assert frozen != SFSObject("named", every_type()).freeze()
+    array = array_of(("addInt", 1), ("addUtfString", "x"))
+    assert array.freeze() == array_of(("addInt", 1), ("addUtfString", "x")).freeze()
+    assert hash(array.freeze()) == hash(array.freeze())
+
+
+def test_digest_matches_compile():
+    sfs_object = every_type()
+    assert sfs_object.freeze().getDigest() == hashlib.blake2b(sfs_object.compile()[1:], digest_size=16).hexdigest()
+    array = array_of(("addInt", 1), ("addSFSObject", SFSObject().putBool("b", True)))
+    assert array.freeze().getDigest() == hashlib.blake2b(array.compile()[1:], digest_size=16).hexdigest()
+
+
+def test_object_mutators_raise():
+    frozen = every_type().freeze()
+    for key, (type_name, value) in every_type().getValue().items():
+        arguments = (key,) if type_name == "null" else (key, value)
+        with pytest.raises(TypeError):
+            getattr(frozen, setter_name("put", type_name))(*arguments)
+    with pytest.raises(TypeError):
+        frozen.put("new", 1)
+    with pytest.raises(TypeError):
+        frozen.getValue()["int"] = ("int", 1)
+    with pytest.raises(TypeError):
+        del frozen.getValue()["int"]
+    with pytest.raises(TypeError):
+        frozen.get("sfs_object").putInt("b", 1)
+    assert frozen.compile() == every_type().compile()
+
+
+def test_array_mutators_raise():
+    frozen = array_of(("addInt", 1)).freeze()
+    for key, (type_name, value) in every_type().getValue().items():
+        arguments = () if type_name == "null" else (value,)
+        with pytest.raises(TypeError):
+            getattr(frozen, setter_name("add", type_name))(*arguments)
+        with pytest.raises(TypeError):
+            getattr(frozen, setter_name("add", type_name))(*arguments, index=0)
+    with pytest.raises(TypeError):
+        frozen.add(2)
+    with pytest.raises(TypeError):
+        frozen.getValue()[0] = ("int", 2)
+    with pytest.raises(TypeError):
+        frozen.getValue().insert(0, ("int", 2))
+    with pytest.raises(TypeError):
+        del frozen.getValue()[0]
+    assert frozen.compile() == array_of(("addInt", 1)).compile()
+
+
+def test_body_is_compiled_once(monkeypatch):
+    frozen = every_type().freeze()
+    calls = []
+    write_object_body = encoder.write_object_body
+
+    def counting(out, value):
+        calls.append(value)
+        write_object_body(out, value)
+
+    monkeypatch.setattr(encoder, "write_object_body", counting)
+    body = frozen.getBody()
+    parent = SFSObject().putSFSObject("a", frozen).putSFSObject("b", frozen)
+    for _ in range(3):
+        assert frozen.compile() == every_type().compile()
+        assert parent.compile() == SFSObject().putSFSObject("a", every_type()).putSFSObject("b", every_type()).compile()
+    assert frozen.getBody() is body
+    assert sum(value is frozen for value in calls) == 1
@@ -0,0 +1,43 @@
+from pyfox2x.sfs_types.SFSArray import SFSArray
+from pyfox2x.sfs_types.SFSObject import SFSObject
+from pyfox2x.sfs_types.lazy import LazySFSArray, LazySFSObject
+
+from test_decoder import every_type
+
+
+def test_lazy_round_trip():
+    sfs_object = every_type()
+    decoded = SFSObject.decompile(sfs_object.compile(), lazy=True)
+    assert isinstance(decoded, LazySFSObject)
+    assert dict(decoded.getValue().items()) == dict(sfs_object.getValue().items())
+
+
+def test_fields_are_decoded_on_access():
+    data = every_type().compile()
+    decoded = SFSObject.decompile(data, lazy=True)
+    assert list(decoded) == list(every_type())
+    assert decoded.get("int") == 70000
+    assert decoded.get("missing") is None
+    assert isinstance(decoded.get("sfs_array"), LazySFSArray)
+    assert decoded.get("sfs_array").get(1) == "x"
+    assert not decoded.isMaterialized()
+    assert decoded.compile() == data
+
+
+def test_changes_materialize():
+    data = every_type().compile()
+    decoded = SFSObject.decompile(data, lazy=True)
+    decoded.putInt("int", 1)
+    assert decoded.isMaterialized()
+    assert SFSObject.decompile(decoded.compile()).get("int") == 1
+    assert SFSObject.decompile(decoded.compile()).get("utf_string") == "hiж"
+
+
+def test_lazy_array():
+    array = SFSArray()
+    array.addInt(1)
+    array.addSFSObject(SFSObject().putInt("k", 2))
+    decoded = SFSArray.decompile(array.compile(), lazy=True)
+    assert len(decoded) == 2
+    assert decoded.get(1).get("k") == 2
+    assert decoded.compile() == array.compile()
@@ -0,0 +1,30 @@
+import pytest
+
+from pyfox2x.bench.load import DEFAULT_SCENARIO, run
+from pyfox2x.sfs_server import SFSMockServer
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = SFSMockServer()
+    server.handlers["ping"] = lambda session, params: params
+    server.handlers["silent"] = lambda session, params: None
+    server.start_in_thread()
+    yield server
+    server.stop_thread()
+
+
+def test_run_reports_latencies(server):
+    summary = run("127.0.0.1", server.port, dict(DEFAULT_SCENARIO, requests=[{"command": "ping", "repeat": 5}]), 2)
+    assert summary["commands"]["ping"]["requests"] == 10
+    assert summary["errors"] == {}
+
+
+def test_missing_responses_time_out(server):
+    scenario = dict(DEFAULT_SCENARIO, timeout=0.2, requests=[{"command": "silent", "repeat": 2}])
+    assert run("127.0.0.1", server.port, scenario, 2)["errors"] == {"silent": 4}
+
+
+def test_failed_sessions_are_counted(server):
+    scenario = {key: value for key, value in DEFAULT_SCENARIO.items() if key != "zone"}
+    assert run("127.0.0.1", server.port, scenario, 3)["errors"] == {"session": 3}
@@ -0,0 +1,37 @@
+import io
+
+import pytest
+
+from pyfox2x.sfs_types.SFSObject import SFSObject
+
+numpy = pytest.importorskip("numpy")
+
+
+def numeric_arrays() -> SFSObject:
+    return SFSObject() \
+        .putShortArray("short_array", [1, -2]) \
+        .putIntArray("int_array", [1, 2, 3]) \
+        .putLongArray("long_array", [1 << 40, -1]) \
+        .putFloatArray("float_array", [0.5, -1.5]) \
+        .putDoubleArray("double_array", [0.25, 1e10])
+
+
+@pytest.mark.parametrize("decode", [
+    lambda data: SFSObject.decompile(data, numpy_arrays=True),
+    lambda data: SFSObject.decompile_conn(io.BytesIO(data), numpy_arrays=True),
+    lambda data: SFSObject.decompile(data, numpy_arrays=True, lazy=True),
+])
+def test_numeric_arrays_are_read_only_views(decode):
+    sfs_object = numeric_arrays()
+    decoded = decode(sfs_object.compile())
+    for key in sfs_object:
+        value = decoded.get(key)
+        assert isinstance(value, numpy.ndarray)
+        assert not value.flags.writeable
+        assert value.tolist() == sfs_object.get(key)
+
+
+def test_numpy_arrays_are_encoded():
+    sfs_object = numeric_arrays()
+    decoded = SFSObject.decompile(sfs_object.compile(), numpy_arrays=True)
+    assert decoded.compile() == sfs_object.compile()
@@ -0,0 +1,51 @@
+import pytest
+
+from pyfox2x.sfs_client import SFSClient
+from pyfox2x.sfs_client.prepared import PreparedRequest
+from pyfox2x.sfs_types.SFSObject import SFSObject
+
+
+def envelope(command: str, params: SFSObject) -> SFSObject:
+    request = SFSObject().putUtfString("c", command).putInt("r", -1).putSFSObject("p", params)
+    return SFSObject().putByte("c", 1).putShort("a", 12).putSFSObject("p", request)
+
+
+def params(x: int = 1) -> SFSObject:
+    return SFSObject().putInt("x", x).putByte("b", 2).putDouble("d", 0.5).putUtfString("s", "text")
+
+
+def test_compile_matches_a_built_envelope():
+    prepared = PreparedRequest("move")
+    assert prepared.get_command() == "move"
+    assert prepared.compile(params()) == SFSClient.compile_packet(envelope("move", params()))
+    assert prepared.compile(params(), 10) == SFSClient.compile_packet(envelope("move", params()), 10)
+
+
+def test_set_param_rewrites_the_prepared_packet():
+    prepared = PreparedRequest("move", params())
+    prepared.set_param("x", 7)
+    prepared.set_param("d", -2.25)
+    expected = envelope("move", params(7).putDouble("d", -2.25))
+    packet = prepared.compile()
+    assert packet == SFSClient.compile_packet(expected)
+    assert dict(SFSObject.decompile(packet[3:]).getValue().items()) == dict(expected.getValue().items())
+    assert prepared.compile(compression_threshold=10) == SFSClient.compile_packet(expected, 10)
+
+
+def test_set_param_errors():
+    prepared = PreparedRequest("move", params())
+    packet = prepared.compile()
+    with pytest.raises(KeyError):
+        prepared.set_param("s", "other")
+    with pytest.raises(KeyError):
+        prepared.set_param("missing", 1)
+    with pytest.raises(ValueError, match="'b'"):
+        prepared.set_param("b", 300)
+    with pytest.raises(ValueError, match="'x'"):
+        prepared.set_param("x", 1 << 40)
+    assert prepared.compile() == packet
+
+
+def test_compile_without_params():
+    with pytest.raises(ValueError):
+        PreparedRequest("move").compile()
@@ -0,0 +1,30 @@
+from pyfox2x.sfs_types.SFSArray import SFSArray
+from pyfox2x.sfs_types.SFSObject import SFSObject
+
+
+def items_object() -> SFSObject:
+    items = SFSArray()
+    for number in range(5):
+        items.addSFSObject(SFSObject().putInt("k", number).putInt("j", -number))
+    return SFSObject().putUtfString("c", "cmd").putSFSArray("arr", items).putInt("z", 9)
+
+
+def test_projection_keeps_only_selected_paths():
+    projected = SFSObject.decompile(items_object().compile(), only=["c", "z"])
+    assert dict(projected.getValue().items()) == {"c": ("utf_string", "cmd"), "z": ("int", 9)}
+
+
+def test_projection_keeps_array_positions():
+    data = items_object().compile()
+    projected = SFSObject.decompile(data, only=["arr.2.k"])
+    assert list(projected) == ["arr"]
+    assert projected.get("arr").get(2).get("k") == 2
+    assert projected.get("arr").get(2).get("j") is None
+    assert projected.get("arr").get(0) is None
+    every = SFSObject.decompile(data, only=["arr.*.k"]).get("arr")
+    assert [every.get(position).get("k") for position in range(5)] == [0, 1, 2, 3, 4]
+
+
+def test_projection_of_missing_paths():
+    projected = SFSObject.decompile(items_object().compile(), only=["missing", "arr.9.k"])
+    assert "missing" not in projected
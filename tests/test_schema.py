@@ -0,0 +1,43 @@
+import pytest
+
+from pyfox2x.sfs_types.SFSObject import SFSObject
+from pyfox2x.sfs_types.schema import SFSSchema
+
+from test_decoder import array_of
+
+
+def test_schema_round_trip_and_fallback():
+    schema = SFSSchema({"a": "int", "s": "utf_string", "o": {"b": "bool"}, "arr": ["short"]})
+    sfs_object = SFSObject().putInt("a", 1).putUtfString("s", "x").putSFSObject("o", SFSObject().putBool("b", True)) \
+        .putSFSArray("arr", array_of(("addShort", 1), ("addShort", 2)))
+    assert schema.compile(sfs_object) == sfs_object.compile()
+    assert dict(schema.decompile(sfs_object.compile()).getValue().items()) == dict(sfs_object.getValue().items())
+
+    other = SFSObject().putInt("a", 1)
+    assert schema.compile(other) == other.compile()
+    assert dict(schema.decompile(other.compile()).getValue().items()) == dict(other.getValue().items())
+
+
+def test_schema_encoder_falls_back_on_key_order():
+    swapped = SFSObject().putUtfString("a", "x").putInt("b", 1)
+    assert SFSSchema({"b": "utf_string", "a": "int"}).compile(swapped) == swapped.compile()
+    same_types = SFSObject().putInt("b", 1).putInt("a", 2)
+    assert SFSSchema({"a": "int", "b": "int"}).compile(same_types) == same_types.compile()
+
+
+def test_infer_matches_the_object():
+    sfs_object = SFSObject().putInt("a", 1).putSFSArray("arr", array_of(("addSFSObject", SFSObject().putBool("b", True))))
+    schema = SFSSchema.infer(sfs_object)
+    assert schema.getFields() == {"a": "int", "arr": [{"b": "bool"}]}
+    assert schema.compile(sfs_object) == sfs_object.compile()
+
+
+@pytest.mark.parametrize("fields, name", [
+    ({"items": []}, "'items'"),
+    ({"items": ["int", "int"]}, "'items'"),
+    ({"o": {"x": "integer"}}, "'o.x'"),
+    ({"o": {"items": [{"x": []}]}}, "'o.items.*.x'"),
+])
+def test_invalid_fields_raise(fields, name):
+    with pytest.raises(ValueError, match=name):
+        SFSSchema(fields)
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from pyfox2x.sfs_client.sessions import SessionManager
+from pyfox2x.sfs_server import SFSMockServer
+from pyfox2x.sfs_types.SFSObject import SFSObject
+
+
+def test_session_blocking_reads_raise():
+    manager = SessionManager()
+    session = manager.connect("127.0.0.1", 1)
+    try:
+        for call in (lambda: session.request("echo", SFSObject()), lambda: session.request_many([]),
+                     lambda: session.wait_extension_response("echo"), lambda: session.wait_requests(["echo"]),
+                     session.read_response):
+            with pytest.raises(RuntimeError):
+                call()
+    finally:
+        manager.close()
+
+
+def test_sessions_share_one_thread():
+    server = SFSMockServer()
+    server.handlers["echo"] = lambda session, params: params
+    server.start_in_thread()
+    responses, closed = {}, []
+
+    def on_connect(session):
+        session.send_extension_request("echo", SFSObject().putInt("x", session.data["number"]))
+
+    def on_echo(session, item):
+        responses[session.data["number"]] = item.response.get("p").get("x")
+        session.close()
+
+    manager = SessionManager(on_connect=on_connect, on_close=lambda session, error: closed.append(error))
+    try:
+        for number in range(5):
+            session = manager.connect("127.0.0.1", server.port)
+            session.data["number"] = number
+            session.handlers["echo"] = on_echo
+        deadline = time.monotonic() + 5
+        while manager.sessions and time.monotonic() < deadline:
+            manager.poll(0.1)
+    finally:
+        manager.close()
+        server.stop_thread()
+    assert responses == {number: number for number in range(5)}
+    assert closed == [None] * 5
@@ -0,0 +1,32 @@
+import pytest
+
+from pyfox2x.sfs_types.SFSObject import SFSObject
+
+from test_decoder import array_of
+
+
+def test_field_positions_after_deletes():
+    sfs_object = SFSObject().putInt("a", 1).putUtfString("b", "x").putBool("c", True)
+    shared = SFSObject("", sfs_object)
+    view = sfs_object.getValue()
+    assert view["b"] == ("utf_string", "x")
+    del view["a"]
+    shared.putLong("d", 4)
+    assert shared.getValue()["c"] == ("bool", True)
+    assert view["d"] == ("long", 4)
+    assert "a" not in view
+    with pytest.raises(KeyError):
+        view["a"]
+    assert SFSObject.decompile(sfs_object.compile()).getValue()["c"] == ("bool", True)
+
+
+def test_replacing_a_field_keeps_its_position():
+    sfs_object = SFSObject().putInt("a", 1).putInt("b", 2)
+    sfs_object.putUtfString("a", "x")
+    assert list(sfs_object.getValue().items()) == [("a", ("utf_string", "x")), ("b", ("int", 2))]
+
+
+def test_array_items_keep_their_types():
+    array = array_of(("addInt", 1), ("addUtfString", "x"), ("addNull",))
+    assert list(array.getValue()) == [("int", 1), ("utf_string", "x"), ("null", None)]
+    assert array.get(1) == "x"
@@ -0,0 +1,37 @@
+import io
+import struct
+
+from pyfox2x.sfs_types import IntArray, LongArray, pack_array, unpack_array
+from pyfox2x.sfs_types.SFSArray import SFSArray
+from pyfox2x.sfs_types.SFSObject import SFSObject
+
+
+def test_pack_and_unpack_array():
+    for code in "hiqfd":
+        packed = pack_array(code, [1, -2, 3])
+        assert packed == struct.pack(f">3{code}", 1, -2, 3)
+        assert unpack_array(code, b"xx" + packed, 2, 3) == [1, -2, 3]
+
+
+def test_long_array_items_are_8_bytes():
+    data = SFSObject().putLongArray("l", [1, -1]).compile()
+    assert data.endswith(b"\x0d\x00\x02" + struct.pack(">qq", 1, -1))
+
+
+def test_long_array_decompile_conn_reads_8_bytes_per_item():
+    conn = io.BytesIO(b"\x00\x02" + struct.pack(">qq", 1 << 40, 2) + b"rest")
+    assert LongArray.decompile_conn(conn, decompile_name=False).getValue() == [1 << 40, 2]
+    assert conn.read() == b"rest"
+
+
+def test_array_counts_are_lengths():
+    assert IntArray("", [1, 2, 3]).compile() == b"\x0c\x00\x03" + struct.pack(">iii", 1, 2, 3)
+    array = SFSArray()
+    array.addInt(1)
+    assert SFSObject().putSFSArray("a", array).compile().endswith(b"\x11\x00\x01\x04\x00\x00\x00\x01")
+
+
+def test_float_rounding():
+    decoded = SFSObject.decompile(SFSObject().putFloat("f", 0.1).putFloatArray("fa", [0.1]).compile())
+    assert decoded.get("f") == 0.1
+    assert decoded.get("fa") == [0.1]